@@ -0,0 +1,222 @@
+"""
+K线（OHLCV）本地存储
+已收盘的K线按 交易对/周期/开盘时间 写入本地SQLite，只追加不修改；
+同时记录已经向上游查询过的时间段，重复或重叠的区间查询直接读本地，只向上游补齐缺口
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# 支持的K线周期 -> 毫秒
+INTERVALS = {
+    '1m': 60_000,
+    '5m': 300_000,
+    '15m': 900_000,
+    '30m': 1_800_000,
+    '1h': 3_600_000,
+    '4h': 14_400_000,
+    '1d': 86_400_000,
+}
+
+# 一根K线：(开盘时间毫秒, 开, 高, 低, 收, 成交量)
+Candle = Tuple[int, float, float, float, float, float]
+# K线加载函数：(交易对, 周期, 起始开盘时间, 结束开盘时间) -> ([Candle], error)，区间两端都包含
+CandleLoader = Callable[[str, str, int, int], Tuple[Optional[List[Candle]], Optional[str]]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candles (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    open_time INTEGER NOT NULL,
+    open REAL NOT NULL,
+    high REAL NOT NULL,
+    low REAL NOT NULL,
+    close REAL NOT NULL,
+    volume REAL NOT NULL,
+    source TEXT NOT NULL,
+    PRIMARY KEY (symbol, interval, open_time)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS coverage (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    start_time INTEGER NOT NULL,
+    end_time INTEGER NOT NULL,
+    PRIMARY KEY (symbol, interval, start_time)
+) WITHOUT ROWID;
+"""
+
+
+class CandleStore:
+    """本地K线存储
+
+    - 只保存已收盘的K线，写入使用 INSERT OR IGNORE，已有的K线不会被覆盖
+    - coverage 表记录向上游成功查询过的区间（包括该区间内没有成交、上游返回为空的情况），
+      相邻或重叠的区间写入时合并
+    - 每个线程使用独立的数据库连接，fork之后重新连接；多个worker进程共用同一个数据库文件（WAL模式）
+    - 数据库文件在第一次查询时才创建，导入模块、创建实例不访问磁盘
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+        # 统计计数器
+        self.queries = 0
+        self.local_queries = 0
+        self.gap_fetches = 0
+        self.fetched_candles = 0
+        self.saved_candles = 0
+        self.fetch_errors = 0
+        self.last_error = None
+
+    def _initialize(self):
+        """创建数据库文件和表结构（只执行一次）"""
+        with self._init_lock:
+            if self._initialized:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            conn.close()
+            self._initialized = True
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            if not self._initialized:
+                self._initialize()
+            # 自动提交模式，写入时显式开启事务
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _missing_ranges(self, symbol: str, interval: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """返回 [start, end] 中尚未向上游查询过的区间（按开盘时间，两端包含）"""
+        step = INTERVALS[interval]
+        covered = self._connection().execute(
+            'SELECT start_time, end_time FROM coverage WHERE symbol = ? AND interval = ? '
+            'AND end_time >= ? AND start_time <= ? ORDER BY start_time',
+            (symbol, interval, start, end)
+        ).fetchall()
+
+        missing = []
+        cursor = start
+        for covered_start, covered_end in covered:
+            if covered_start > cursor:
+                missing.append((cursor, covered_start - step))
+            cursor = max(cursor, covered_end + step)
+        if cursor <= end:
+            missing.append((cursor, end))
+        return missing
+
+    def _save(self, symbol: str, interval: str, source: str, candles: Sequence[Candle], start: int, end: int):
+        """写入K线并记录已覆盖区间（与相邻/重叠区间合并）"""
+        step = INTERVALS[interval]
+        conn = self._connection()
+        # 先取得写锁再读取已覆盖区间，避免多个进程同时合并区间
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            inserted = conn.executemany(
+                'INSERT OR IGNORE INTO candles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(symbol, interval, *candle, source) for candle in candles]
+            ).rowcount
+            overlapping = conn.execute(
+                'SELECT start_time, end_time FROM coverage WHERE symbol = ? AND interval = ? '
+                'AND end_time >= ? AND start_time <= ?',
+                (symbol, interval, start - step, end + step)
+            ).fetchall()
+            merged_start = min([start] + [row[0] for row in overlapping])
+            merged_end = max([end] + [row[1] for row in overlapping])
+            conn.execute(
+                'DELETE FROM coverage WHERE symbol = ? AND interval = ? AND end_time >= ? AND start_time <= ?',
+                (symbol, interval, start - step, end + step)
+            )
+            conn.execute('INSERT INTO coverage VALUES (?, ?, ?, ?)',
+                         (symbol, interval, merged_start, merged_end))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        self.saved_candles += max(0, inserted)
+
+    def _read(self, symbol: str, interval: str, start: int, end: int) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(
+            'SELECT open_time, open, high, low, close, volume, source FROM candles '
+            'WHERE symbol = ? AND interval = ? AND open_time BETWEEN ? AND ? ORDER BY open_time',
+            (symbol, interval, start, end)
+        ).fetchall()
+        return [
+            {'open_time': open_time, 'open': open_price, 'high': high, 'low': low, 'close': close,
+             'volume': volume, 'source': source}
+            for open_time, open_price, high, low, close, volume, source in rows
+        ]
+
+    def get_candles(self, symbol: str, interval: str, start: int, end: int,
+                    loaders: List[Tuple[str, CandleLoader]]) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """查询 [start, end] 内已收盘的K线（毫秒），缺口按顺序尝试各个数据源补齐
+
+        返回 (K线列表, error)；部分缺口补齐失败时仍返回已有的K线，error 说明失败原因
+        """
+        step = INTERVALS[interval]
+        start = start - start % step
+        # 只处理已收盘的K线：开盘时间 + 周期 <= 当前时间
+        last_closed = int(time.time() * 1000) // step * step - step
+        end = min(end - end % step, last_closed)
+        if end < start:
+            return [], None
+
+        self.queries += 1
+        missing = self._missing_ranges(symbol, interval, start, end)
+        if not missing:
+            self.local_queries += 1
+
+        errors = []
+        for gap_start, gap_end in missing:
+            gap_errors = []
+            for source_name, loader in loaders:
+                candles, error = loader(symbol, interval, gap_start, gap_end)
+                if candles is None:
+                    gap_errors.append(error)
+                    continue
+                candles = [candle for candle in candles if gap_start <= candle[0] <= gap_end]
+                self._save(symbol, interval, source_name, candles, gap_start, gap_end)
+                self.gap_fetches += 1
+                self.fetched_candles += len(candles)
+                break
+            else:
+                # 所有数据源都未能补齐这个缺口
+                self.fetch_errors += 1
+                errors.extend(gap_errors)
+
+        error = None
+        if errors:
+            error = "; ".join(errors)
+            self.last_error = error
+
+        candles = self._read(symbol, interval, start, end)
+        if not candles and error:
+            return None, error
+        return candles, error
+
+    def stats(self) -> Dict[str, Any]:
+        """返回存储统计信息（本进程的计数，不查询数据库）"""
+        return {
+            'path': self.path,
+            'saved_candles': self.saved_candles,
+            'queries': self.queries,
+            'local_queries': self.local_queries,
+            'gap_fetches': self.gap_fetches,
+            'fetched_candles': self.fetched_candles,
+            'fetch_errors': self.fetch_errors,
+            'last_error': self.last_error,
+        }
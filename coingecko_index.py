@@ -0,0 +1,181 @@
+"""
+CoinGecko 币种索引
+从 /coins/list 加载 symbol -> coin_id 映射并持久化到磁盘，避免每次查询都调用 /search
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+COINGECKO_API = "https://api.coingecko.com/api/v3"
+
+
+class CoinGeckoIndex:
+    """symbol -> coin_id 索引
+
+    - 启动时从磁盘加载，过期后在后台线程中从 /coins/list 刷新并写回磁盘
+    - 同一代码对应多个币种时（如各种跨链包装币），调用一次 /search
+      按市值排序取第一个候选，并把结果一起持久化（save_delay 秒后在后台写盘，期间新解析的结果合并为一次写入）
+    - 索引尚未加载成功时回退到 /search
+    """
+
+    def __init__(self, session_factory: Callable[[], requests.Session], path: str,
+                 refresh_interval: float = 86400, timeout: float = 10, save_delay: float = 5.0):
+        self.session_factory = session_factory
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self.save_delay = save_delay
+
+        self._coins: Dict[str, List[Tuple[str, str]]] = {}  # SYMBOL -> [(coin_id, name), ...]
+        self._resolved: Dict[str, Tuple[str, str]] = {}      # 有歧义的 SYMBOL -> (coin_id, name)
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._loaded_from_disk = False
+        self._dirty = False           # 有尚未写盘的解析结果
+        self._save_scheduled = False
+
+        # 统计计数器
+        self.refreshes = 0
+        self.search_calls = 0
+        self.last_error = None
+
+    def _load_from_disk(self):
+        self._loaded_from_disk = True
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            self._coins = {symbol: [tuple(coin) for coin in coins] for symbol, coins in stored['coins'].items()}
+            self._resolved = {symbol: tuple(coin) for symbol, coin in stored.get('resolved', {}).items()}
+            self._fetched_at = stored.get('fetched_at', 0.0)
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            self.last_error = f"索引文件损坏: {e}"
+
+    def _save_to_disk(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        stored = {
+            'fetched_at': self._fetched_at,
+            'coins': self._coins,
+            'resolved': self._resolved,
+        }
+        # 先写临时文件再替换，避免进程中断留下半个文件
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(stored, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def _flush(self):
+        """后台写入新解析的结果（由 lookup 延迟触发）"""
+        with self._lock:
+            self._save_scheduled = False
+            if not self._dirty:
+                return
+            try:
+                self._save_to_disk()
+            except OSError as e:
+                self.last_error = f"索引保存失败: {e}"
+
+    def refresh(self):
+        """从 /coins/list 重新拉取完整索引"""
+        try:
+            response = self.session_factory().get(f"{COINGECKO_API}/coins/list", timeout=max(self.timeout, 30))
+            response.raise_for_status()
+
+            coins: Dict[str, List[Tuple[str, str]]] = {}
+            for coin in response.json():
+                coins.setdefault(coin['symbol'].upper(), []).append((coin['id'], coin['name']))
+
+            with self._lock:
+                known_ids = {coin_id for candidates in coins.values() for coin_id, _ in candidates}
+                self._coins = coins
+                self._resolved = {symbol: coin for symbol, coin in self._resolved.items() if coin[0] in known_ids}
+                self._fetched_at = time.time()
+                self.refreshes += 1
+                self.last_error = None
+                self._save_to_disk()
+        except Exception as e:
+            self.last_error = f"索引刷新失败: {e}"
+        finally:
+            self._refreshing = False
+
+    def _ensure_fresh(self):
+        """首次使用时从磁盘加载；索引过期时启动后台刷新"""
+        if not self._loaded_from_disk:
+            with self._lock:
+                if not self._loaded_from_disk:
+                    self._load_from_disk()
+
+        if time.time() - self._fetched_at < self.refresh_interval or self._refreshing:
+            return
+
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name='coingecko-index', daemon=True).start()
+
+    def _search(self, symbol: str, candidate_ids=None) -> Optional[Tuple[str, str]]:
+        """调用 /search，返回按市值排序的第一个匹配币种"""
+        self.search_calls += 1
+        response = self.session_factory().get(f"{COINGECKO_API}/search", params={'query': symbol}, timeout=self.timeout)
+        response.raise_for_status()
+
+        for coin in response.json().get('coins', []):
+            if candidate_ids is None or coin['id'] in candidate_ids:
+                return coin['id'], coin['name']
+        return None
+
+    def lookup(self, symbol: str) -> Optional[Tuple[str, str]]:
+        """查找币种代码对应的 (coin_id, name)，找不到返回None"""
+        symbol = symbol.upper()
+        self._ensure_fresh()
+
+        if not self._coins:
+            # 索引尚不可用，临时回退到 /search
+            return self._search(symbol)
+
+        candidates = self._coins.get(symbol)
+        if not candidates:
+            return None
+        if len(candidates) == 1:
+            return candidates[0]
+
+        resolved = self._resolved.get(symbol)
+        if resolved is not None:
+            return resolved
+
+        candidate_ids = {coin_id for coin_id, _ in candidates}
+        resolved = self._search(symbol, candidate_ids) or candidates[0]
+        with self._lock:
+            self._resolved[symbol] = resolved
+            self._dirty = True
+            schedule = not self._save_scheduled
+            self._save_scheduled = True
+        if schedule:
+            # 不在请求路径上写盘，延迟后合并写入
+            timer = threading.Timer(self.save_delay, self._flush)
+            timer.daemon = True
+            timer.start()
+        return resolved
+
+    def stats(self):
+        """返回索引统计信息"""
+        return {
+            'symbols': len(self._coins),
+            'resolved': len(self._resolved),
+            'age': round(time.time() - self._fetched_at) if self._fetched_at else None,
+            'refreshes': self.refreshes,
+            'search_calls': self.search_calls,
+            'last_error': self.last_error,
+        }
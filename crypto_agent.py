@@ -4,6 +4,7 @@
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import re
 from datetime import datetime
@@ -11,8 +12,18 @@ from typing import Dict, Any, Optional, List
 from ai_intent_recognition import recognize_crypto_intent
 
 class CryptoAgent:
-    def __init__(self, api_base_url: str = "http://localhost:5000"):
+    def __init__(self, api_base_url: str = "http://localhost:5000", pool_size: int = 10,
+                 timeout: float = 10, batch_timeout: float = 30):
         self.base_url = api_base_url
+        self.timeout = timeout
+        self.batch_timeout = batch_timeout
+        
+        # 复用到价格服务的keep-alive连接，避免每次查询都新建连接
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
         self.supported_currencies = [
             'BTC', 'ETH', 'ADA', 'DOT', 'LINK', 'LTC', 'XRP', 
             'BNB', 'SOL', 'MATIC', 'AVAX', 'DOGE', 'SHIB', 'UNI', 'ATOM',
@@ -84,7 +95,7 @@ class CryptoAgent:
     def get_crypto_price(self, symbol: str) -> Dict[str, Any]:
         """获取加密货币价格信息"""
         try:
-            response = requests.get(f"{self.base_url}/api/crypto/{symbol}", timeout=10)
+            response = self.session.get(f"{self.base_url}/api/crypto/{symbol}", timeout=self.timeout)
             
             if response.status_code == 200:
                 return {
@@ -114,6 +125,39 @@ class CryptoAgent:
                 'error': f'查询失败: {str(e)}'
             }
     
+    def get_batch_prices(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """通过批量接口一次获取多个货币的价格信息
+
+        返回 {货币代码: get_crypto_price 同格式的结果}
+        """
+        try:
+            response = self.session.post(f"{self.base_url}/api/crypto/batch",
+                                         json={'symbols': symbols}, timeout=self.batch_timeout)
+            
+            if response.status_code != 200:
+                error_data = response.json() if response.headers.get('content-type') == 'application/json' else {}
+                error = error_data.get('error', f'HTTP {response.status_code}')
+                return {symbol: {'success': False, 'error': error} for symbol in symbols}
+            
+            data = response.json()
+            results = {}
+            for symbol in symbols:
+                info = data.get(symbol, {'error': '未返回数据'})
+                if 'error' in info:
+                    results[symbol] = {'success': False, 'error': info['error']}
+                else:
+                    results[symbol] = {'success': True, 'data': info}
+            return results
+                
+        except requests.exceptions.ConnectionError:
+            error = '无法连接到价格服务，请确保服务正在运行 (python price_service.py)'
+        except requests.exceptions.Timeout:
+            error = '请求超时，请稍后重试'
+        except Exception as e:
+            error = f'查询失败: {str(e)}'
+        
+        return {symbol: {'success': False, 'error': error} for symbol in symbols}
+    
     def format_price_response(self, data: Dict[str, Any]) -> str:
         """格式化价格响应为友好的文本"""
         if not data['success']:
@@ -135,11 +179,19 @@ class CryptoAgent:
    • 最低价: ${info['low_24h']:,.2f}
 
 📡 **数据源**: {info['source']}
-🕐 **更新时间**: {info['last_updated']}
+🕐 **更新时间**: {info['last_updated']}{self._format_age(info)}
         """.strip()
         
         return response
     
+    def _format_age(self, info: Dict[str, Any]) -> str:
+        """数据年龄说明：缓存的旧数据提示正在刷新"""
+        if 'age' not in info:
+            return ''
+        if info.get('stale'):
+            return f"（{info['age']:.0f}秒前的缓存数据，正在刷新）"
+        return f"（{info['age']:.0f}秒前）"
+    
     def process_query(self, query: str) -> str:
         """处理自然语言查询 - 使用AI意图识别"""
         query = query.strip()
@@ -191,25 +243,68 @@ class CryptoAgent:
         
         return response.strip()
     
+    def _format_price_line(self, symbol: str, result: Dict[str, Any]) -> str:
+        """格式化单个货币的一行价格摘要"""
+        if result['success']:
+            info = result['data']
+            change_emoji = "📈" if info['change_24h'] > 0 else "📉" if info['change_24h'] < 0 else "➡️"
+            return f"{info['symbol']}: {info['price_formatted']} {change_emoji} {info['change_formatted']}"
+        else:
+            return f"{symbol}: ❌ {result['error']}"
+    
     def get_multiple_prices(self, symbols: List[str]) -> str:
-        """批量查询多个货币价格"""
-        results = []
-        
-        for symbol in symbols:
-            result = self.get_crypto_price(symbol)
-            if result['success']:
-                info = result['data']
-                change_emoji = "📈" if info['change_24h'] > 0 else "📉" if info['change_24h'] < 0 else "➡️"
-                results.append(f"{info['symbol']}: {info['price_formatted']} {change_emoji} {info['change_formatted']}")
-            else:
-                results.append(f"{symbol}: ❌ {result['error']}")
+        """批量查询多个货币价格（通过批量接口一次查询）"""
+        batch_results = self.get_batch_prices(symbols)
+        results = [self._format_price_line(symbol, batch_results[symbol]) for symbol in symbols]
         
         return "🪙 **批量价格查询结果**:\n\n" + "\n".join(results)
     
+    def _get_market_data(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """请求价格服务的全市场接口（概览、排行榜），返回与 get_crypto_price 相同格式的结果"""
+        try:
+            response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+            data = response.json()
+            if response.status_code == 200:
+                return {'success': True, 'data': data}
+            return {'success': False, 'error': data.get('error', f'HTTP {response.status_code}')}
+        except requests.exceptions.ConnectionError:
+            return {'success': False, 'error': '无法连接到价格服务，请确保服务正在运行 (python price_service.py)'}
+        except requests.exceptions.Timeout:
+            return {'success': False, 'error': '请求超时，请稍后重试'}
+        except Exception as e:
+            return {'success': False, 'error': f'查询失败: {str(e)}'}
+    
+    def get_market_movers(self, by: str = 'change', order: str = 'desc', limit: int = 10) -> Dict[str, Any]:
+        """获取全市场排行榜（by: change/volume/range，order: desc/asc）"""
+        return self._get_market_data('/api/market/movers', {'by': by, 'order': order, 'limit': limit})
+    
+    def format_movers_response(self, result: Dict[str, Any], title: str) -> str:
+        """格式化排行榜为友好的文本"""
+        if not result['success']:
+            return f"❌ {result['error']}"
+        lines = [self._format_price_line(info['symbol'], {'success': True, 'data': info})
+                 for info in result['data']['results']]
+        return f"{title}:\n\n" + "\n".join(f"{i}. {line}" for i, line in enumerate(lines, 1))
+    
     def get_market_overview(self) -> str:
-        """获取市场概览"""
+        """获取市场概览：主要币种价格 + 全市场涨跌分布和涨跌幅榜"""
         major_coins = ['BTC', 'ETH', 'BNB', 'ADA', 'SOL']
-        return self.get_multiple_prices(major_coins)
+        sections = [self.get_multiple_prices(major_coins)]
+        
+        overview = self._get_market_data('/api/market/overview')
+        if not overview['success']:
+            # 全市场快照不可用时只返回主要币种
+            return sections[0]
+        
+        info = overview['data']
+        sections.append(
+            f"🌐 **全市场（{info['quote']}交易对）**: 共 {info['pairs']} 个，"
+            f"📈 上涨 {info['gainers']} 个，📉 下跌 {info['losers']} 个，"
+            f"平均涨跌 {info['average_change']:+.2f}%"
+        )
+        sections.append(self.format_movers_response(self.get_market_movers(limit=5), "🚀 **涨幅榜**"))
+        sections.append(self.format_movers_response(self.get_market_movers(order='asc', limit=5), "🔻 **跌幅榜**"))
+        return "\n\n".join(sections)
 
 # 创建全局agent实例
 crypto_agent = CryptoAgent()
@@ -235,6 +330,22 @@ def get_crypto_market_overview() -> str:
     """
     return crypto_agent.get_market_overview()
 
+def get_crypto_top_movers(order: str = 'desc', limit: int = 10, by: str = 'change') -> str:
+    """
+    Agent函数：获取全市场涨跌幅排行（回答"今天什么在涨"）
+    
+    Args:
+        order: "desc" 涨幅榜，"asc" 跌幅榜
+        limit: 返回数量
+        by: 排序指标，"change" 涨跌幅、"volume" 成交额、"range" 振幅
+    
+    Returns:
+        排行榜文本
+    """
+    titles = {'change': '涨幅榜' if order == 'desc' else '跌幅榜', 'volume': '成交额榜', 'range': '振幅榜'}
+    result = crypto_agent.get_market_movers(by=by, order=order, limit=limit)
+    return crypto_agent.format_movers_response(result, f"🚀 **{titles.get(by, by)}**")
+
 def batch_query_crypto(symbols: str) -> str:
     """
     Agent函数：批量查询多个加密货币价格
@@ -0,0 +1,196 @@
+"""
+交易所WebSocket行情订阅
+与交易所保持长连接，持续接收关注列表中交易对的行情推送，请求处理时直接读取内存数据；
+断线后自动重连并重新订阅，长时间没有消息时判定连接失效
+"""
+
+import random
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import websocket
+except ImportError:  # 可选依赖，未安装时不能启用WebSocket行情
+    websocket = None
+
+_TIMEOUT_ERRORS = (socket.timeout, TimeoutError) + ((websocket.WebSocketTimeoutException,) if websocket else ())
+
+# 构造订阅消息：接收交易对列表，返回需要发送的文本消息列表
+SubscribeMessages = Callable[[List[str]], List[str]]
+# 解析推送消息：接收一条文本消息，返回 {交易对: 结果字典}（心跳、订阅确认等返回空字典）
+ParseMessage = Callable[[str], Dict[str, Dict[str, Any]]]
+
+
+def _create_connection(url: str, timeout: float):
+    """建立WebSocket连接（需要 websocket-client 库）"""
+    if websocket is None:
+        raise RuntimeError("未安装 websocket-client 库（pip install websocket-client）")
+    return websocket.create_connection(url, timeout=timeout)
+
+
+class ExchangeFeed:
+    """单个交易所的行情订阅
+
+    - 后台线程维护连接，连接断开或超过 stale_after 秒没有收到行情数据时重连（指数退避 + 随机抖动）；
+      心跳回复和订阅确认不算行情数据，可以发现连接仍在但订阅已失效的情况
+    - 每次重连后重新发送订阅消息
+    - 每个交易对记录收到数据的时间，超过 stale_after 秒未更新的数据视为过期
+    """
+
+    def __init__(self, name: str, url: str, subscribe_messages: SubscribeMessages, parse_message: ParseMessage,
+                 watchlist: Iterable[str], stale_after: float = 30.0, ping_interval: float = 15.0,
+                 ping_message: Optional[str] = None, reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0,
+                 connect: Callable[[str, float], Any] = _create_connection):
+        self.name = name
+        self.url = url
+        self.subscribe_messages = subscribe_messages
+        self.parse_message = parse_message
+        self.watchlist = list(dict.fromkeys(watchlist))
+        self.stale_after = stale_after
+        self.ping_interval = ping_interval
+        self.ping_message = ping_message
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.connect = connect
+
+        self._entries: Dict[str, Tuple[float, Dict[str, Any]]] = {}  # 交易对 -> (接收时间, 数据)
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = None
+
+        # 统计计数器
+        self.connected = False
+        self.connects = 0
+        self.reconnects = 0
+        self.stale_reconnects = 0
+        self.messages = 0
+        self.parse_errors = 0
+        self.last_message_at = None
+        self.last_error = None
+
+    def _session(self):
+        """建立一次连接并持续接收消息，连接失效时抛出异常"""
+        conn = self.connect(self.url, self.ping_interval)
+        self._conn = conn
+        try:
+            for message in self.subscribe_messages(self.watchlist):
+                conn.send(message)
+            self.connected = True
+            self.connects += 1
+            last_data = time.monotonic()
+
+            while not self._stop.is_set():
+                try:
+                    message = conn.recv()
+                except _TIMEOUT_ERRORS:
+                    # 接收超时：超过 stale_after 没有行情数据就重连，否则发送心跳
+                    if time.monotonic() - last_data > self.stale_after:
+                        self.stale_reconnects += 1
+                        raise ConnectionError(f"{self.stale_after:g}秒内没有收到行情数据")
+                    if self.ping_message is not None:
+                        conn.send(self.ping_message)
+                    else:
+                        conn.ping()
+                    continue
+
+                if not message:
+                    raise ConnectionError("连接已被服务端关闭")
+
+                received_at = time.monotonic()
+                self.last_message_at = received_at
+                self.messages += 1
+                try:
+                    results = self.parse_message(message)
+                except (KeyError, ValueError, TypeError, ZeroDivisionError) as e:
+                    self.parse_errors += 1
+                    self.last_error = f"消息解析失败: {e}"
+                    continue
+
+                if results:
+                    last_data = received_at
+                    entries = dict(self._entries)
+                    for symbol_pair, data in results.items():
+                        entries[symbol_pair] = (received_at, data)
+                    self._entries = entries
+                elif received_at - last_data > self.stale_after:
+                    # 只收到心跳等非行情消息，订阅可能已失效
+                    self.stale_reconnects += 1
+                    raise ConnectionError(f"{self.stale_after:g}秒内没有收到行情数据")
+        finally:
+            self.connected = False
+            self._conn = None
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self._session()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+            if self._stop.is_set():
+                break
+
+            # 连接维持了较长时间说明不是持续性故障，退避时间从头开始
+            if time.monotonic() - started > self.max_reconnect_delay:
+                delay = self.reconnect_delay
+            self.reconnects += 1
+            self._stop.wait(delay + random.uniform(0, delay / 2))
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def start(self):
+        """启动后台订阅线程（重复调用无副作用）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f'feed-{self.name.lower()}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止订阅并关闭连接"""
+        self._stop.set()
+        conn = self._conn
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=self.ping_interval)
+
+    def get(self, symbol_pair: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """读取交易对的最新数据，返回 (数据, 年龄秒数)；没有数据或数据已过期返回None"""
+        entry = self._entries.get(symbol_pair)
+        if entry is None:
+            return None
+        received_at, data = entry
+        age = time.monotonic() - received_at
+        if age > self.stale_after:
+            return None
+        return data, age
+
+    def stats(self) -> Dict[str, Any]:
+        """返回订阅统计信息"""
+        now = time.monotonic()
+        ages = [now - received_at for received_at, _ in self._entries.values()]
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'connected': self.connected,
+            'url': self.url,
+            'watchlist': len(self.watchlist),
+            'entries': len(self._entries),
+            'stale_entries': sum(1 for age in ages if age > self.stale_after),
+            'connects': self.connects,
+            'reconnects': self.reconnects,
+            'stale_reconnects': self.stale_reconnects,
+            'messages': self.messages,
+            'parse_errors': self.parse_errors,
+            'last_message_age': round(now - self.last_message_at, 3) if self.last_message_at else None,
+            'last_error': self.last_error,
+        }
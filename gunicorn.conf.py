@@ -0,0 +1,48 @@
+"""
+价格服务的Gunicorn配置
+生产环境多进程部署使用，通常通过 python serve.py 启动，也可直接运行：
+    gunicorn -c gunicorn.conf.py price_service:app
+
+所有参数都可以通过环境变量覆盖。
+注意：缓存、熔断器、后台轮询等状态在每个worker进程内独立维护，
+多个worker之间不共享（需要共享缓存和上游限流额度时配置 REDIS_URL）。
+"""
+
+import multiprocessing
+import os
+
+# 服务模式：flask（gthread worker）或 async（Uvicorn worker，运行 price_service_async:app）
+SERVICE_MODE = os.environ.get('SERVICE_MODE', 'flask').lower()
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+if SERVICE_MODE == 'async':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    # 上游请求以I/O等待为主，每个worker使用多线程处理并发请求
+    worker_class = 'gthread'
+    threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# 预加载应用：master进程导入一次代码，worker fork后共享只读内存；
+# 启用时 kill -HUP 只会替换worker而不会重新加载代码
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# 上游数据源在最坏情况下需要依次等待多个超时，worker超时需要留出余量
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# 处理一定数量请求后平滑替换worker，0表示不限制
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    """后台线程不会跨fork保留，在每个worker进程中重新启动"""
+    from price_service import start_background_workers
+    start_background_workers()
@@ -0,0 +1,108 @@
+"""
+上游HTTP连接池
+为每个数据源维护独立的keep-alive会话，复用TCP/TLS连接并统一重试策略
+"""
+
+import threading
+from typing import Any, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class ProviderSessionPool:
+    """按数据源划分的连接池
+
+    每个数据源（OKX、Binance、CoinGecko...）一个 requests.Session，
+    会话挂载带连接池和重试/退避策略的 HTTPAdapter，供所有请求线程共享。
+    """
+
+    def __init__(self, pool_size: int = 10, retries: int = 2, backoff: float = 0.3):
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def _create_session(self) -> requests.Session:
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            # 读超时不重试：上游已收到请求但迟迟不应答时，重试只会成倍放大等待时间，
+            # 应尽快改用下一个数据源
+            read=0,
+            backoff_factor=self.backoff,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False,  # 重试耗尽后返回最后一次响应，由调用方检查状态码
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Connection': 'keep-alive'})
+        return session
+
+    def get(self, provider: str) -> requests.Session:
+        """获取数据源对应的会话（首次使用时创建）"""
+        session = self._sessions.get(provider)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(provider)
+                if session is None:
+                    session = self._create_session()
+                    self._sessions[provider] = session
+        return session
+
+    def close(self):
+        """关闭所有会话及其连接"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回各数据源的连接池统计
+
+        - connections_created: 新建的TCP/TLS连接数
+        - requests: 经由连接池发出的请求数（含重试）
+        - reuse_ratio: 复用已有连接的请求占比
+        - open_connections: 当前保持在池中、可被复用的keep-alive连接数
+        """
+        result = {
+            'pool_size': self.pool_size,
+            'retries': self.retries,
+            'backoff': self.backoff,
+            'providers': {},
+        }
+
+        with self._lock:
+            sessions = list(self._sessions.items())
+
+        for provider, session in sessions:
+            created = requests_made = open_connections = 0
+            hosts = set()
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    hosts.add(pool.host)
+                    created += pool.num_connections
+                    requests_made += pool.num_requests
+                    if pool.pool is not None:
+                        # 队列中未建立的连接槽位以None占位
+                        open_connections += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+
+            result['providers'][provider] = {
+                'hosts': sorted(hosts),
+                'connections_created': created,
+                'requests': requests_made,
+                'open_connections': open_connections,
+                'reuse_ratio': round(1 - created / requests_made, 4) if requests_made else 0.0,
+            }
+
+        return result
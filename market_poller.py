@@ -0,0 +1,115 @@
+"""
+后台行情轮询
+按固定周期（带随机抖动）刷新关注列表中的交易对，请求处理时直接读取内存快照
+"""
+
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# 批量获取函数：接收交易对列表，返回 {交易对: 结果字典}
+FetchMany = Callable[[List[str]], Dict[str, Dict[str, Any]]]
+
+
+def _fetched_at(data: Any, polled_at: float) -> float:
+    """数据自身的获取时间（Unix秒）"""
+    updated_at = getattr(data, 'updated_at', None)
+    if updated_at:
+        return updated_at
+    if isinstance(data, dict) and data.get('age') is not None:
+        return polled_at - data['age']
+    return polled_at
+
+
+class MarketPoller:
+    """关注列表的后台轮询器
+
+    快照为只读字典，每轮轮询结束后整体替换引用，读取方无需加锁。
+    每个条目记录数据自身的获取时间（Ticker 的 updated_at：交易所推送的接收时间、全市场快照的加载时间等；
+    缓存返回的结果按其 age 推算；都没有时按本轮轮询时间），读取时一并返回数据的年龄（秒）。
+    """
+
+    def __init__(self, fetch_many: FetchMany, watchlist: Iterable[str], interval: float = 5.0,
+                 jitter: float = 1.0):
+        self.fetch_many = fetch_many
+        self.watchlist = list(dict.fromkeys(watchlist))
+        self.interval = interval
+        self.jitter = jitter
+
+        self._entries: Dict[str, Tuple[float, Dict[str, Any]]] = {}  # 交易对 -> (获取时间（Unix秒）, 数据)
+        self._stop = threading.Event()
+        self._thread = None
+
+        # 统计计数器
+        self.polls = 0
+        self.errors = 0
+        self.last_duration = None
+        self.last_error = None
+
+    def poll_once(self):
+        """执行一轮轮询"""
+        started = time.monotonic()
+        try:
+            results = self.fetch_many(self.watchlist)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            return
+
+        polled_at = time.time()
+        entries = dict(self._entries)
+        for symbol_pair, data in results.items():
+            # 推送和快照中的数据在本轮轮询之前就已获取，按数据自身的时间计算年龄
+            entries[symbol_pair] = (_fetched_at(data, polled_at), data)
+        self._entries = entries
+
+        self.polls += 1
+        self.last_duration = round(time.monotonic() - started, 3)
+        missing = len(self.watchlist) - len(results)
+        self.last_error = f"{missing} 个交易对本轮未获取到数据" if missing else None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll_once()
+            # 加入随机抖动，避免多个实例同时请求上游
+            self._stop.wait(self.interval + random.uniform(0, self.jitter))
+
+    def start(self):
+        """启动后台轮询线程（重复调用无副作用）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='market-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台轮询线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + self.jitter)
+
+    def get(self, symbol_pair: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """读取快照中的交易对，返回 (数据, 年龄秒数)，没有数据返回None"""
+        entry = self._entries.get(symbol_pair)
+        if entry is None:
+            return None
+        fetched_at, data = entry
+        return data, max(0.0, time.time() - fetched_at)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回轮询统计信息"""
+        now = time.time()
+        ages = [now - fetched_at for fetched_at, _ in self._entries.values()]
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'watchlist': len(self.watchlist),
+            'entries': len(self._entries),
+            'interval': self.interval,
+            'jitter': self.jitter,
+            'polls': self.polls,
+            'errors': self.errors,
+            'last_duration': self.last_duration,
+            'oldest_age': round(max(ages), 3) if ages else None,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,103 @@
+"""
+全市场行情快照
+每个刷新周期只调用一次交易所的批量行情接口，结果原地写入列式行情表（见 market_table.py）
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from market_table import MarketTable
+
+# 批量加载函数返回 ({交易对: 结果字典}, error)
+BulkLoader = Callable[[], Tuple[Optional[Dict[str, Dict[str, Any]]], Optional[str]]]
+
+
+class MarketSnapshot:
+    """按刷新周期懒加载的全市场快照
+
+    - 快照过期后由第一个请求负责刷新，其余请求继续读取旧快照
+    - 还没有任何快照时，其余请求等待刷新完成
+    - 刷新失败后同样等待一个刷新周期再重试，避免每个请求都打到上游
+    - 快照超过 max_age 仍未刷新成功时视为不可用
+    - 本轮数据源未覆盖的交易对保留在表中，超过 max_age 后不再返回
+    """
+
+    def __init__(self, loaders: List[Tuple[str, BulkLoader]], refresh_interval: float = 5.0,
+                 max_age: Optional[float] = None, table: Optional[MarketTable] = None):
+        self.loaders = loaders
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age if max_age is not None else refresh_interval * 6
+        self._table = table if table is not None else MarketTable()
+        self._table.max_age = self.max_age
+        self._source = None
+        self._fetched_at = 0.0
+        self._last_attempt = 0.0
+        self._refresh_lock = threading.Lock()
+
+        # 统计计数器
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error = None
+
+    def _is_due(self) -> bool:
+        return time.monotonic() - self._last_attempt >= self.refresh_interval
+
+    def _refresh(self):
+        """依次尝试各个批量数据源，使用第一个成功的结果"""
+        self._last_attempt = time.monotonic()
+        errors = []
+        for source_name, loader in self.loaders:
+            index, error = loader()
+            if index:
+                self._table.update(index.values())
+                self._source = source_name
+                self._fetched_at = time.monotonic()
+                self.refreshes += 1
+                self.last_error = None
+                return
+            errors.append(f"{source_name}: {error}")
+
+        self.failures += 1
+        self.last_error = "; ".join(errors)
+
+    def _current(self) -> Mapping[str, Any]:
+        if not self._fetched_at or time.monotonic() - self._fetched_at > self.max_age:
+            return {}
+        return self._table
+
+    def get_index(self) -> Mapping[str, Any]:
+        """返回当前快照（MarketTable，按交易对读取 Ticker），不可用时返回空字典；必要时触发刷新"""
+        if not self._is_due():
+            return self._current()
+
+        if self._refresh_lock.acquire(blocking=False):
+            try:
+                if self._is_due():
+                    self._refresh()
+            finally:
+                self._refresh_lock.release()
+        elif not self._fetched_at:
+            # 首次加载时等待正在进行的刷新完成
+            with self._refresh_lock:
+                pass
+
+        return self._current()
+
+    def get(self, symbol_pair: str) -> Optional[Dict[str, Any]]:
+        """从快照中查询单个交易对"""
+        return self.get_index().get(symbol_pair)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回快照统计信息"""
+        return {
+            'size': len(self._table),
+            'source': self._source,
+            'age': round(time.monotonic() - self._fetched_at, 3) if self._fetched_at else None,
+            'refresh_interval': self.refresh_interval,
+            'max_age': self.max_age,
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'table': self._table.stats(),
+        }
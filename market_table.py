@@ -0,0 +1,297 @@
+"""
+全市场行情列式存储
+交易对索引 + 连续的数值数组（价格、开盘价、涨跌幅、最高、最低、成交量），
+刷新时原地更新，涨跌幅排行、条件筛选、市场概览等查询直接按列扫描；
+涨跌幅/成交额/振幅排行榜在写入时增量维护
+"""
+
+import bisect
+import heapq
+import threading
+import time
+from array import array
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from ticker import Ticker, split_symbol_pair
+
+# 排序/筛选支持的指标
+METRICS = ('change', 'volume', 'range')
+
+
+class TopK:
+    """增量维护的前K名（按行号记录）
+
+    写入一行时只调整这一行在榜单中的位置（O(K)）；只有榜单成员跌出榜单、
+    无法确定谁来补位时才标记为需要重建，下次读取时全表扫描一次。
+    """
+
+    def __init__(self, capacity: int, ascending: bool = False):
+        self.capacity = capacity
+        self.ascending = ascending
+        self._ranked: List[tuple] = []  # (排序值, 行号)，排序值越小排名越靠前
+        self._members: Dict[int, float] = {}
+        self.dirty = True
+        self.rebuilds = 0
+
+    def _score(self, value: float) -> float:
+        return value if self.ascending else -value
+
+    def _remove(self, row: int):
+        score = self._members.pop(row)
+        del self._ranked[bisect.bisect_left(self._ranked, (score, row))]
+
+    def _insert(self, row: int, score: float):
+        bisect.insort(self._ranked, (score, row))
+        self._members[row] = score
+
+    def offer(self, row: int, value: float, eligible: bool = True):
+        """某一行的指标值发生变化"""
+        if self.dirty:
+            return  # 等待重建
+        full = len(self._ranked) >= self.capacity
+        score = self._score(value)
+
+        if row in self._members:
+            self._remove(row)
+            if not full:
+                # 榜单未满说明所有符合条件的行都在榜上
+                if eligible:
+                    self._insert(row, score)
+            elif eligible and self._ranked and score <= self._ranked[-1][0]:
+                self._insert(row, score)
+            else:
+                # 成员跌出榜单，榜单外谁来补位需要重新扫描
+                self.dirty = True
+            return
+
+        if not eligible:
+            return
+        if not full:
+            self._insert(row, score)
+        elif score < self._ranked[-1][0]:
+            self._insert(row, score)
+            _, evicted_row = self._ranked.pop()
+            del self._members[evicted_row]
+
+    def rebuild(self, rows: Iterable[int], key: Callable[[int], float]):
+        """全表扫描重建榜单"""
+        pick = heapq.nsmallest if self.ascending else heapq.nlargest
+        self._ranked = sorted((self._score(key(row)), row) for row in pick(self.capacity, rows, key=key))
+        self._members = {row: score for score, row in self._ranked}
+        self.dirty = False
+        self.rebuilds += 1
+
+    def rows(self) -> List[int]:
+        return [row for _, row in self._ranked]
+
+
+class MarketTable(Mapping):
+    """列式行情表
+
+    - 每个交易对占一行，行号由 symbol -> row 索引定位；新交易对追加到末尾，已有交易对原地覆盖
+    - 超过 max_age 秒没有更新的行（如已下架或本轮数据源未覆盖）不参与查询
+    - 实现只读映射接口：table['BTC/USDT'] 按需从各列组装 Ticker，可以直接替代 {交易对: Ticker} 字典
+    """
+
+    def __init__(self, max_age: Optional[float] = None, ranked_quote: str = 'USDT', top_capacity: int = 100,
+                 ranked_min_turnover: float = 0.0):
+        self.max_age = max_age
+        self.ranked_quote = ranked_quote.upper()
+        self.ranked_min_turnover = ranked_min_turnover
+        self._rows: Dict[str, int] = {}
+        self._symbols: List[str] = []
+        self._sources: List[str] = []
+        self.price = array('d')
+        self.open_24h = array('d')
+        self.change_24h = array('d')
+        self.high_24h = array('d')
+        self.low_24h = array('d')
+        self.volume = array('d')
+        self.updated_at = array('d')
+        self._lock = threading.RLock()
+
+        # 排行榜只覆盖一个报价货币（默认USDT）且成交额达到 ranked_min_turnover 的交易对
+        self._metric_keys = {metric: self._metric_key(metric) for metric in METRICS}
+        self._top = {(metric, ascending): TopK(top_capacity, ascending)
+                     for metric in METRICS for ascending in (False, True)}
+
+    def _columns(self):
+        return (self.price, self.open_24h, self.change_24h, self.high_24h, self.low_24h, self.volume,
+                self.updated_at)
+
+    def update(self, tickers: Iterable[Ticker]) -> int:
+        """写入一批行情（原地更新），返回写入的行数"""
+        count = 0
+        with self._lock:
+            for ticker in tickers:
+                change = ticker.change_24h
+                open_24h = ticker.price / (1 + change / 100) if change > -100 else 0.0
+                values = (ticker.price, open_24h, change, ticker.high_24h, ticker.low_24h,
+                          ticker.volume or 0.0, ticker.updated_at)
+
+                row = self._rows.get(ticker.symbol)
+                if row is None:
+                    row = len(self._symbols)
+                    self._rows[ticker.symbol] = row
+                    self._symbols.append(ticker.symbol)
+                    self._sources.append(ticker.source)
+                    for column, value in zip(self._columns(), values):
+                        column.append(value)
+                else:
+                    self._sources[row] = ticker.source
+                    for column, value in zip(self._columns(), values):
+                        column[row] = value
+                self._offer(row)
+                count += 1
+        return count
+
+    def _eligible(self, row: int) -> bool:
+        """该行是否参与排行榜"""
+        return (self.price[row] > 0 and self._symbols[row].endswith(f"/{self.ranked_quote}")
+                and self._metric_keys['volume'](row) >= self.ranked_min_turnover)
+
+    def _offer(self, row: int):
+        eligible = self._eligible(row)
+        for (metric, _), top in self._top.items():
+            top.offer(row, self._metric_keys[metric](row), eligible)
+
+    def _live_rows(self) -> List[int]:
+        """未过期且价格有效的行号"""
+        cutoff = time.time() - self.max_age if self.max_age else 0.0
+        return [row for row, (price, updated_at) in enumerate(zip(self.price, self.updated_at))
+                if price > 0 and updated_at >= cutoff]
+
+    def _is_live(self, row: int, cutoff: float) -> bool:
+        return self.price[row] > 0 and self.updated_at[row] >= cutoff
+
+    def _ticker(self, row: int) -> Ticker:
+        symbol = self._symbols[row]
+        base_symbol, quote_symbol = split_symbol_pair(symbol)
+        return Ticker(
+            symbol=symbol,
+            name=base_symbol,
+            price=self.price[row],
+            change_24h=self.change_24h[row],
+            quote_currency=quote_symbol,
+            high_24h=self.high_24h[row],
+            low_24h=self.low_24h[row],
+            volume=self.volume[row],
+            source=self._sources[row],
+            updated_at=self.updated_at[row]
+        )
+
+    def _metric_key(self, metric: str):
+        """返回按行号取指标值的函数"""
+        if metric == 'change':
+            return self.change_24h.__getitem__
+        if metric == 'volume':
+            # 不同币种的基础货币成交量不可比，按成交额（价格 × 成交量）排序
+            price, volume = self.price, self.volume
+            return lambda row: price[row] * volume[row]
+        if metric == 'range':
+            high, low = self.high_24h, self.low_24h
+            return lambda row: (high[row] - low[row]) / low[row] * 100 if low[row] > 0 else 0.0
+        raise ValueError(f"不支持的排序指标: {metric}（可选 {', '.join(METRICS)}）")
+
+    def _filter_quote(self, rows: List[int], quote: Optional[str]) -> List[int]:
+        if not quote:
+            return rows
+        suffix = f"/{quote.upper()}"
+        symbols = self._symbols
+        return [row for row in rows if symbols[row].endswith(suffix)]
+
+    def top(self, n: int, metric: str = 'change', ascending: bool = False, quote: Optional[str] = None,
+            min_volume: float = 0.0) -> List[Ticker]:
+        """按指标取前N名（不对整表排序）"""
+        with self._lock:
+            key = self._metric_key(metric)
+            rows = self._filter_quote(self._live_rows(), quote)
+            if min_volume:
+                turnover = self._metric_key('volume')
+                rows = [row for row in rows if turnover(row) >= min_volume]
+            pick = heapq.nsmallest if ascending else heapq.nlargest
+            return [self._ticker(row) for row in pick(n, rows, key=key)]
+
+    def movers(self, n: int, metric: str = 'change', ascending: bool = False, quote: Optional[str] = None,
+               min_volume: Optional[float] = None) -> List[Ticker]:
+        """排行榜查询：条件与增量维护的榜单一致时直接读取榜单，否则退化为按列扫描"""
+        quote = (quote or self.ranked_quote).upper()
+        top = self._top.get((metric, ascending))
+        if (top is None or quote != self.ranked_quote or n > top.capacity
+                or (min_volume is not None and min_volume != self.ranked_min_turnover)):
+            return self.top(n, metric, ascending, quote=quote, min_volume=min_volume or 0.0)
+
+        with self._lock:
+            cutoff = time.time() - self.max_age if self.max_age else 0.0
+            if not top.dirty:
+                ranked = top.rows()
+                rows = [row for row in ranked if self._is_live(row, cutoff)]
+                if len(rows) >= n or len(rows) == len(ranked):
+                    return [self._ticker(row) for row in rows[:n]]
+
+            # 榜单待重建，或过期的行太多导致不够N名
+            top.rebuild((row for row in self._live_rows() if self._eligible(row)), self._metric_keys[metric])
+            return [self._ticker(row) for row in top.rows()[:n]]
+
+    def screen(self, min_change: Optional[float] = None, max_change: Optional[float] = None,
+               min_volume: Optional[float] = None, quote: Optional[str] = None,
+               limit: Optional[int] = None) -> List[Ticker]:
+        """按条件筛选交易对，结果按涨跌幅从高到低排列"""
+        with self._lock:
+            change = self.change_24h
+            turnover = self._metric_key('volume')
+            rows = self._filter_quote(self._live_rows(), quote)
+            if min_change is not None:
+                rows = [row for row in rows if change[row] >= min_change]
+            if max_change is not None:
+                rows = [row for row in rows if change[row] <= max_change]
+            if min_volume is not None:
+                rows = [row for row in rows if turnover(row) >= min_volume]
+            rows.sort(key=change.__getitem__, reverse=True)
+            if limit is not None:
+                rows = rows[:limit]
+            return [self._ticker(row) for row in rows]
+
+    def overview(self, quote: Optional[str] = None) -> Dict[str, Any]:
+        """市场概览：涨跌家数、平均/中位涨跌幅、总成交额"""
+        with self._lock:
+            rows = self._filter_quote(self._live_rows(), quote)
+            changes = sorted(self.change_24h[row] for row in rows)
+            turnover = self._metric_key('volume')
+            count = len(changes)
+            return {
+                'pairs': count,
+                'gainers': sum(1 for change in changes if change > 0),
+                'losers': sum(1 for change in changes if change < 0),
+                'unchanged': sum(1 for change in changes if change == 0),
+                'average_change': round(sum(changes) / count, 4) if count else None,
+                'median_change': round(changes[count // 2], 4) if count else None,
+                'total_turnover': round(sum(turnover(row) for row in rows), 2),
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        """返回行情表统计信息"""
+        return {
+            'rows': len(self._symbols),
+            'ranked_quote': self.ranked_quote,
+            'ranked_min_turnover': self.ranked_min_turnover,
+            'top_capacity': next(iter(self._top.values())).capacity,
+            'top_rebuilds': sum(top.rebuilds for top in self._top.values()),
+        }
+
+    def __getitem__(self, symbol_pair: str) -> Ticker:
+        with self._lock:
+            row = self._rows[symbol_pair]
+            if self.price[row] <= 0 or (self.max_age and self.updated_at[row] < time.time() - self.max_age):
+                raise KeyError(symbol_pair)
+            return self._ticker(row)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            symbols = [self._symbols[row] for row in self._live_rows()]
+        return iter(symbols)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._live_rows())
@@ -0,0 +1,441 @@
+"""
+价格缓存模块
+为价格服务提供线程安全的内存TTL缓存（LRU淘汰 + 并发未命中合并），
+以及可选的Redis共享二级缓存（多个worker/副本之间共享，分布式single-flight）
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ticker import to_json_default
+
+
+class _InflightCall:
+    """正在进行中的上游请求，供同一键的并发请求等待复用"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.exception = None
+        self.age = 0.0
+
+
+class TickerCache:
+    """线程安全的TTL缓存
+
+    - 以标准化交易对（如 BTC/USDT）为键
+    - 超过 max_size 时按LRU淘汰最久未使用的条目
+    - 同一键的并发未命中只触发一次上游请求（single-flight）
+    - stale_ttl > 0 时启用 stale-while-revalidate：条目超过 ttl（软过期）后再保留 stale_ttl 秒，
+      期间 get_or_revalidate() 立即返回旧数据并在后台刷新，超过 ttl + stale_ttl（硬过期）才阻塞等待上游
+    """
+
+    def __init__(self, ttl: float = 10.0, max_size: int = 1024, stale_ttl: float = 0.0):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stale_ttl = max(0.0, stale_ttl)
+        self._entries = OrderedDict()  # key -> (软过期时间, value, 写入时间)
+        self._inflight: Dict[str, _InflightCall] = {}
+        self._lock = threading.Lock()
+
+        # 统计计数器
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self.stale_hits = 0
+        self.revalidations = 0
+
+    def _entry_locked(self, key: str) -> Optional[Tuple[Any, float, bool]]:
+        """在持有锁的情况下读取未硬过期的条目，返回 (value, 数据年龄, 是否已软过期)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value, stored_at = entry
+        now = time.monotonic()
+        if expires_at + self.stale_ttl <= now:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return value, now - stored_at, expires_at <= now
+
+    def _get_locked(self, key: str) -> Optional[Any]:
+        """在持有锁的情况下读取未过期的条目"""
+        entry = self._entry_locked(key)
+        if entry is None or entry[2]:
+            return None
+        return entry[0]
+
+    def _set_locked(self, key: str, value: Any, ttl: Optional[float] = None, age: float = 0.0):
+        """在持有锁的情况下写入条目，并按LRU淘汰超出容量的部分
+
+        age 为写入时数据已有的年龄（如从L2读回的条目）
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl + self.stale_ttl <= 0 or self.ttl <= 0 or self.max_size <= 0:
+            return
+
+        now = time.monotonic()
+        self._entries[key] = (now + ttl, value, now - age)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，未命中或已过期返回None"""
+        with self._lock:
+            value = self._get_locked(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def lookup(self, key: str) -> Optional[Tuple[Any, float, bool]]:
+        """读取缓存（包括已软过期的条目），返回 (value, 数据年龄, 是否已软过期)，不计入命中统计"""
+        with self._lock:
+            return self._entry_locked(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, age: float = 0.0):
+        """写入缓存，ttl 为该条目的有效期（不超过缓存的默认TTL）"""
+        with self._lock:
+            self._set_locked(key, value, ttl, age)
+
+    def get_or_load(self, key: str, loader: Callable[[], tuple]) -> Tuple[Any, Optional[str]]:
+        """读取缓存，未命中时调用loader加载
+
+        loader 返回 (data, error) 元组，只有成功的结果才会写入缓存；
+        也可以返回 (data, error, ttl) 指定该条目剩余的有效期，或 (data, error, ttl, age) 同时指定数据年龄。
+        同一键的并发未命中会等待第一个请求的结果，而不是各自请求上游。
+        """
+        data, error, _, _ = self.get_or_revalidate(key, loader)
+        return data, error
+
+    def get_or_revalidate(self, key: str, loader: Callable[[], tuple],
+                          executor: Optional[Executor] = None) -> Tuple[Any, Optional[str], float, bool]:
+        """与 get_or_load 相同，另外返回 (数据年龄, 是否为旧数据)
+
+        指定 executor 时，软过期的条目立即返回（标记为旧数据），同时在 executor 中刷新（同一键只刷新一次）；
+        未指定时软过期的条目按未命中处理。
+        """
+        with self._lock:
+            entry = self._entry_locked(key)
+            if entry is not None:
+                value, age, stale = entry
+                if not stale:
+                    self.hits += 1
+                    return value, None, age, False
+                if executor is not None:
+                    self.stale_hits += 1
+                    if key not in self._inflight:
+                        call = _InflightCall()
+                        self._inflight[key] = call
+                        self.revalidations += 1
+                        executor.submit(self._revalidate, key, call, loader)
+                    return value, None, age, True
+
+            call = self._inflight.get(key)
+            if call is None:
+                call = _InflightCall()
+                self._inflight[key] = call
+                is_leader = True
+                self.misses += 1
+            else:
+                is_leader = False
+                self.coalesced += 1
+
+        if not is_leader:
+            call.event.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result + (call.age, False)
+
+        return self._run_loader(key, call, loader) + (call.age, False)
+
+    def load(self, key: str, loader: Callable[[], tuple]) -> Tuple[Any, Optional[str], float]:
+        """未命中时加载并写入缓存，返回 (data, error, 数据年龄)
+
+        不合并进程内的并发请求，供自行合并的调用方使用（如异步服务）；两级缓存时仍通过L2和分布式锁在副本之间合并
+        """
+        result = self._load_shared(key, loader)
+        ttl = result[2] if len(result) > 2 else None
+        age = result[3] if len(result) > 3 else 0.0
+        if result[0]:
+            with self._lock:
+                self._set_locked(key, result[0], ttl, age)
+        return result[0], result[1], age
+
+    def _load_shared(self, key: str, loader: Callable[[], tuple]) -> tuple:
+        """本地缓存没有共享层，直接调用loader"""
+        return loader()
+
+    def _run_loader(self, key: str, call: _InflightCall, loader: Callable[[], tuple]) -> tuple:
+        """执行加载并唤醒等待同一键的请求，成功的结果写入缓存"""
+        ttl = None
+        try:
+            result = loader()
+            if len(result) > 2:
+                ttl = result[2]
+            if len(result) > 3:
+                call.age = result[3]
+            call.result = (result[0], result[1])
+            return call.result
+        except Exception as e:
+            call.exception = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if call.result is not None and call.result[0]:
+                    self._set_locked(key, call.result[0], ttl, call.age)
+            call.event.set()
+
+    def _revalidate(self, key: str, call: _InflightCall, loader: Callable[[], tuple]):
+        """后台刷新软过期的条目；失败时保留旧数据直到硬过期"""
+        try:
+            self._run_loader(key, call, loader)
+        except Exception:
+            pass
+
+    def clear(self):
+        """清空缓存（不影响统计计数）"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'stale_ttl': self.stale_ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'coalesced': self.coalesced,
+                'stale_hits': self.stale_hits,
+                'revalidations': self.revalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class InProcessRedis:
+    """进程内的Redis替身，只实现共享缓存用到的命令（get / set(nx, px) / delete）
+
+    用于测试以及 REDIS_URL=memory:// 的单进程场景
+    """
+
+    def __init__(self):
+        self._data = {}  # key -> (过期时间, value)
+        self._lock = threading.Lock()
+
+    def _alive_locked(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key):
+        with self._lock:
+            return self._alive_locked(key)
+
+    def set(self, key, value, nx=False, px=None):
+        with self._lock:
+            if nx and self._alive_locked(key) is not None:
+                return None
+            expires_at = time.monotonic() + px / 1000 if px else None
+            self._data[key] = (expires_at, value.encode() if isinstance(value, str) else value)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+
+class TieredTickerCache(TickerCache):
+    """本地内存(L1) + Redis(L2) 两级缓存
+
+    - L2条目记录过期时间和写入时间，写回L1时只保留剩余有效期并保留数据年龄，避免多级缓存叠加导致数据过旧；
+      L2只提供未过期的条目，软过期后的旧数据只保留在各副本的L1中
+    - L1未命中时先查L2；L2也未命中时通过 SET NX 抢占分布式锁，
+      只有持锁的副本请求上游，其他副本轮询L2等待结果
+    - Redis不可用时退化为只使用L1
+    - L2中的 Ticker 以 to_dict() 的结果保存，从L2读回的是字典（同样支持按键读取）
+    """
+
+    def __init__(self, redis_client, ttl: float = 10.0, max_size: int = 1024, namespace: str = 'ticker',
+                 lock_timeout: float = 15.0, poll_interval: float = 0.05, stale_ttl: float = 0.0):
+        super().__init__(ttl=ttl, max_size=max_size, stale_ttl=stale_ttl)
+        self.redis = redis_client
+        self.namespace = namespace
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+
+        # L2统计计数器
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        self.lock_waits = 0
+
+    def _data_key(self, key: str) -> str:
+        return f"crypto:{self.namespace}:{key}"
+
+    def _lock_key(self, key: str) -> str:
+        return f"crypto:lock:{self.namespace}:{key}"
+
+    def _l2_get(self, key: str) -> Optional[Tuple[Any, float, float]]:
+        """读取L2中未过期的条目，返回 (value, 剩余有效期, 数据年龄)"""
+        try:
+            raw = self.redis.get(self._data_key(key))
+        except Exception:
+            self.l2_errors += 1
+            return None
+
+        if raw is None:
+            self.l2_misses += 1
+            return None
+
+        entry = json.loads(raw)
+        remaining = entry['expires_at'] - time.time()
+        if remaining <= 0:
+            self.l2_misses += 1
+            return None
+
+        self.l2_hits += 1
+        return entry['value'], remaining, max(0.0, time.time() - entry.get('stored_at', time.time()))
+
+    def _l2_set(self, key: str, value: Any, ttl: Optional[float] = None, age: float = 0.0):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        now = time.time()
+        payload = json.dumps({'value': value, 'expires_at': now + ttl, 'stored_at': now - age}, ensure_ascii=False,
+                             default=to_json_default)
+        try:
+            self.redis.set(self._data_key(key), payload, px=int(ttl * 1000))
+        except Exception:
+            self.l2_errors += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存：先查L1，再查L2"""
+        value = super().get(key)
+        if value is not None:
+            return value
+
+        entry = self._l2_get(key)
+        if entry is None:
+            return None
+
+        value, remaining, age = entry
+        super().set(key, value, remaining, age)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, age: float = 0.0):
+        """同时写入L1和L2"""
+        super().set(key, value, ttl, age)
+        self._l2_set(key, value, ttl, age)
+
+    def _load_shared(self, key: str, loader: Callable[[], tuple]) -> tuple:
+        """L1未命中后的加载流程：L2 -> 分布式锁 -> 上游"""
+        deadline = time.monotonic() + self.lock_timeout
+        lock_key = self._lock_key(key)
+        token = uuid.uuid4().hex
+        waited = False
+
+        while True:
+            entry = self._l2_get(key)
+            if entry is not None:
+                value, remaining, age = entry
+                return value, None, remaining, age
+
+            try:
+                acquired = self.redis.set(lock_key, token, nx=True, px=int(self.lock_timeout * 1000))
+            except Exception:
+                self.l2_errors += 1
+                return loader()
+
+            if acquired:
+                break
+
+            if time.monotonic() >= deadline:
+                # 持锁副本迟迟没有结果，不再等待
+                return loader()
+
+            if not waited:
+                waited = True
+                self.lock_waits += 1
+            time.sleep(self.poll_interval)
+
+        try:
+            result = loader()
+            if result[0]:
+                self._l2_set(key, result[0])
+            return result
+        finally:
+            # 只释放自己持有的锁（先比较再删除，非原子；最坏情况下多一次上游请求）
+            try:
+                current = self.redis.get(lock_key)
+                if current is not None and (current.decode() if isinstance(current, bytes) else current) == token:
+                    self.redis.delete(lock_key)
+            except Exception:
+                self.l2_errors += 1
+
+    def get_or_revalidate(self, key: str, loader: Callable[[], tuple],
+                          executor: Optional[Executor] = None) -> Tuple[Any, Optional[str], float, bool]:
+        """进程内合并并发未命中（及后台刷新）后，再在副本之间通过Redis合并"""
+        return super().get_or_revalidate(key, lambda: self._load_shared(key, loader), executor)
+
+    def stats(self) -> Dict[str, Any]:
+        result = super().stats()
+        result.update({
+            'backend': 'redis',
+            'l2_hits': self.l2_hits,
+            'l2_misses': self.l2_misses,
+            'l2_errors': self.l2_errors,
+            'lock_waits': self.lock_waits,
+        })
+        return result
+
+
+def create_redis_client(redis_url: Optional[str]):
+    """根据 REDIS_URL 创建Redis客户端；未配置或不可用时返回None
+
+    memory:// 使用进程内替身（仅用于测试/单进程）
+    """
+    if not redis_url:
+        return None
+    if redis_url.startswith('memory://'):
+        return InProcessRedis()
+
+    try:
+        import redis
+    except ImportError:
+        print("⚠️  已配置 REDIS_URL 但未安装 redis 库（pip install redis），使用本地缓存")
+        return None
+
+    return redis.Redis.from_url(redis_url, socket_timeout=1, socket_connect_timeout=1)
+
+
+def create_ticker_cache(redis_client, ttl: float, max_size: int, namespace: str,
+                        stale_ttl: float = 0.0) -> TickerCache:
+    """有Redis客户端时创建两级缓存，否则创建本地缓存"""
+    if redis_client is None:
+        return TickerCache(ttl=ttl, max_size=max_size, stale_ttl=stale_ttl)
+    return TieredTickerCache(redis_client, ttl=ttl, max_size=max_size, namespace=namespace, stale_ttl=stale_ttl)
@@ -0,0 +1,80 @@
+"""
+多数据源共识价格
+将多个数据源同时返回的行情合并为一个成交额加权的共识价格，剔除偏离中位数过大的报价，
+并给出数据源之间的价差和每个数据源的数据延迟
+"""
+
+import statistics
+from typing import Any, Dict, List
+
+from ticker import Ticker, split_symbol_pair
+
+
+def _weights(tickers: List[Ticker]) -> List[float]:
+    """每个数据源的权重：24小时成交额（价格 × 成交量）
+
+    CoinGecko 等没有成交量的数据源本身就是聚合价格，使用其他数据源权重的中位数
+    """
+    turnovers = [ticker.price * ticker.volume if ticker.volume else None for ticker in tickers]
+    known = [turnover for turnover in turnovers if turnover]
+    fallback = statistics.median(known) if known else 1.0
+    return [turnover if turnover else fallback for turnover in turnovers]
+
+
+def build_consensus(symbol_pair: str, tickers: List[Ticker], max_deviation: float = 1.0,
+                    min_sources_for_rejection: int = 3) -> Dict[str, Any]:
+    """合并多个数据源的行情，返回与单一数据源相同结构的结果，另附 consensus 字段
+
+    - max_deviation: 报价偏离所有报价中位数超过该百分比时视为异常并剔除
+    - 数据源少于 min_sources_for_rejection 个时无法判断哪一方异常，不做剔除，只报告价差
+    """
+    median_price = statistics.median(ticker.price for ticker in tickers)
+    weights = _weights(tickers)
+    deviations = [(ticker.price - median_price) / median_price * 100 if median_price else 0.0
+                  for ticker in tickers]
+    outliers = [len(tickers) >= min_sources_for_rejection and abs(deviation) > max_deviation
+                for deviation in deviations]
+    if all(outliers):
+        # 报价分散到没有任何一方接近中位数，无法判断哪一方异常
+        outliers = [False] * len(tickers)
+
+    kept, sources = [], []
+    for ticker, weight, deviation, outlier in zip(tickers, weights, deviations, outliers):
+        if not outlier:
+            kept.append((ticker, weight))
+        sources.append({
+            'source': ticker.source,
+            'price': ticker.price,
+            'weight': round(weight, 2),
+            'deviation_pct': round(deviation, 4),
+            'staleness': round(ticker.staleness, 3),
+            'outlier': outlier,
+        })
+
+    total_weight = sum(weight for _, weight in kept)
+    price = sum(ticker.price * weight for ticker, weight in kept) / total_weight
+    change_24h = sum(ticker.change_24h * weight for ticker, weight in kept) / total_weight
+    prices = [ticker.price for ticker, _ in kept]
+    lows = [ticker.low_24h for ticker, _ in kept if ticker.low_24h]
+
+    merged = Ticker(
+        symbol=symbol_pair,
+        name=split_symbol_pair(symbol_pair)[0],
+        price=price,
+        change_24h=change_24h,
+        quote_currency=kept[0][0].quote_currency,
+        high_24h=max(ticker.high_24h for ticker, _ in kept),
+        low_24h=min(lows) if lows else 0,
+        volume=sum(ticker.volume or 0 for ticker, _ in kept),
+        source='Consensus'
+    )
+
+    result = merged.to_dict()
+    result['consensus'] = {
+        'sources_used': len(kept),
+        'sources_rejected': len(tickers) - len(kept),
+        'spread_pct': round((max(prices) - min(prices)) / price * 100, 4),
+        'max_staleness': max(source['staleness'] for source in sources if not source['outlier']),
+        'sources': sources,
+    }
+    return result
@@ -3,39 +3,214 @@
 提供REST API接口供Agent调用
 """
 
-from flask import Flask, render_template, request, jsonify
-import requests
+from flask import Flask, Response, render_template, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+import json
 import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from datetime import datetime
+from price_cache import create_redis_client, create_ticker_cache
+from market_snapshot import MarketSnapshot
+from market_table import METRICS, MarketTable
+from http_pool import ProviderSessionPool
+from provider_health import ProviderHealth
+from provider_registry import Provider, ProviderRegistry
+from rate_limiter import RateLimiter
+from price_consensus import build_consensus
+from coingecko_index import CoinGeckoIndex
+from market_poller import MarketPoller
+from exchange_feed import ExchangeFeed
+from price_stream import PriceStreamHub
+from candle_store import INTERVALS as CANDLE_INTERVALS, CandleStore
+from tick_journal import TickJournal
+from replay_provider import ReplayProvider
+from ticker import Ticker, split_symbol_pair, to_json_default
+
+class TickerJSONProvider(DefaultJSONProvider):
+    """jsonify 遇到 Ticker 时通过 to_dict() 序列化"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Ticker):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
 
 app = Flask(__name__)
+app.json = TickerJSONProvider(app)
+# 保持批量查询结果与请求中的货币顺序一致
+app.json.sort_keys = False
 
 # 生产环境配置
 DEBUG_MODE = os.environ.get('FLASK_ENV') != 'production'
 
+# 上游请求配置：超时（秒）、每个数据源的连接池大小、重试次数与退避系数
+API_TIMEOUT = float(os.environ.get('API_TIMEOUT', 10))
+UPSTREAM_POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', 10))
+UPSTREAM_RETRIES = int(os.environ.get('UPSTREAM_RETRIES', 2))
+UPSTREAM_BACKOFF = float(os.environ.get('UPSTREAM_BACKOFF', 0.3))
+
+provider_sessions = ProviderSessionPool(
+    pool_size=UPSTREAM_POOL_SIZE, retries=UPSTREAM_RETRIES, backoff=UPSTREAM_BACKOFF
+)
+
+# CoinGecko币种索引：持久化文件路径与刷新周期（秒）
+COINGECKO_INDEX_PATH = os.environ.get('COINGECKO_INDEX_PATH', os.path.join('data', 'coingecko_index.json'))
+COINGECKO_INDEX_REFRESH = float(os.environ.get('COINGECKO_INDEX_REFRESH', 86400))
+
+coingecko_index = CoinGeckoIndex(
+    session_factory=lambda: provider_sessions.get('CoinGecko'),
+    path=COINGECKO_INDEX_PATH,
+    refresh_interval=COINGECKO_INDEX_REFRESH,
+    timeout=API_TIMEOUT
+)
+
+# 数据源调度策略：sequential（按优先级依次尝试）、hedged（当前数据源超过对冲延迟未返回时并行请求下一个）
+# 或 parallel（同时请求所有数据源，取最先成功的结果）
+FETCH_STRATEGY = os.environ.get('FETCH_STRATEGY', 'sequential').lower()
+HEDGE_DELAY = float(os.environ.get('HEDGE_DELAY', 1.0))
+HEDGE_LATENCY_MULTIPLIER = float(os.environ.get('HEDGE_LATENCY_MULTIPLIER', 3))  # 超过预期延迟的倍数时启动对冲请求
+HEDGE_MAX_WORKERS = int(os.environ.get('HEDGE_MAX_WORKERS', 32))
+
+# 共识价格模式（?mode=consensus）：同时请求所有数据源，在截止时间内返回的结果合并为成交额加权价格
+CONSENSUS_TIMEOUT = float(os.environ.get('CONSENSUS_TIMEOUT', 3))
+CONSENSUS_MAX_DEVIATION = float(os.environ.get('CONSENSUS_MAX_DEVIATION', 1.0))  # 偏离中位数的百分比
+
+hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix='hedge')
+
+# 数据源熔断配置：滚动窗口（秒）、最少样本数、错误率与p95延迟阈值、熔断冷却时间（秒）
+provider_health = ProviderHealth(
+    window=float(os.environ.get('BREAKER_WINDOW', 60)),
+    min_requests=int(os.environ.get('BREAKER_MIN_REQUESTS', 5)),
+    error_rate_threshold=float(os.environ.get('BREAKER_ERROR_RATE', 0.5)),
+    p95_latency_threshold=float(os.environ.get('BREAKER_P95_LATENCY', 5)),
+    cooldown=float(os.environ.get('BREAKER_COOLDOWN', 30)),
+)
+
+# 行情缓存配置（秒 / 条目数）：超过 CACHE_TTL（软过期）后立即返回旧数据并在后台刷新，
+# 超过 CACHE_HARD_TTL（硬过期）才等待上游；CACHE_HARD_TTL 不大于 CACHE_TTL 时不返回旧数据
+CACHE_TTL = float(os.environ.get('CACHE_TTL', 10))
+CACHE_HARD_TTL = float(os.environ.get('CACHE_HARD_TTL', 60))
+CACHE_MAX_SIZE = int(os.environ.get('CACHE_MAX_SIZE', 1024))
+CACHE_REFRESH_WORKERS = int(os.environ.get('CACHE_REFRESH_WORKERS', 4))
+
+# 可选的Redis共享缓存（L2），多个worker/副本之间共享行情并合并上游请求
+REDIS_URL = os.environ.get('REDIS_URL')
+
+redis_client = create_redis_client(REDIS_URL)
+price_cache = create_ticker_cache(redis_client, ttl=CACHE_TTL, max_size=CACHE_MAX_SIZE, namespace='ticker',
+                                  stale_ttl=CACHE_HARD_TTL - CACHE_TTL)
+refresh_executor = ThreadPoolExecutor(max_workers=CACHE_REFRESH_WORKERS, thread_name_prefix='refresh')
+
+# 负缓存：所有数据源都确认不存在的交易对，在较短的有效期内直接返回"未找到"
+NEGATIVE_CACHE_TTL = float(os.environ.get('NEGATIVE_CACHE_TTL', 60))
+NEGATIVE_CACHE_MAX_SIZE = int(os.environ.get('NEGATIVE_CACHE_MAX_SIZE', 4096))
+
+negative_cache = create_ticker_cache(redis_client, ttl=NEGATIVE_CACHE_TTL, max_size=NEGATIVE_CACHE_MAX_SIZE,
+                                     namespace='notfound')
+
+# 上游限流：每个数据源按注册时声明的请求速率（次/秒）限流，RATE_LIMITS 可覆盖（如 CoinGecko=0.2,OKX=5）；
+# 配置 REDIS_URL 时所有worker共享额度。超出额度的请求最多排队 RATE_LIMIT_WAIT 秒，0 表示立即改用下一个数据源
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMITS = os.environ.get('RATE_LIMITS', '')
+RATE_LIMIT_WAIT = float(os.environ.get('RATE_LIMIT_WAIT', 0))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', 1))  # 突发容量（按秒计的额度）
+
+rate_limiter = RateLimiter(redis_client, burst_seconds=RATE_LIMIT_BURST)
+
+# 批量查询配置：并发线程数 / 整批截止时间（秒）
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 8))
+BATCH_TIMEOUT = float(os.environ.get('BATCH_TIMEOUT', 15))
+
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix='batch')
+
+# 后台轮询配置：关注列表（逗号分隔，默认为常见币种）、轮询周期与抖动（秒）、
+# 快照数据超过 POLLER_STALE_AFTER 秒后请求改为实时查询
+POLLER_ENABLED = os.environ.get('POLLER_ENABLED', 'false').lower() == 'true'
+POLLER_WATCHLIST = os.environ.get('POLLER_WATCHLIST', '')
+POLLER_INTERVAL = float(os.environ.get('POLLER_INTERVAL', 5))
+POLLER_JITTER = float(os.environ.get('POLLER_JITTER', 1))
+POLLER_STALE_AFTER = float(os.environ.get('POLLER_STALE_AFTER', 30))
+
+# 交易所WebSocket行情订阅配置（需要 websocket-client 库），订阅关注列表（POLLER_WATCHLIST）中的交易对
+WS_FEED_ENABLED = os.environ.get('WS_FEED_ENABLED', 'false').lower() == 'true'
+WS_FEED_PROVIDERS = os.environ.get('WS_FEED_PROVIDERS', 'OKX,Binance')
+WS_FEED_STALE_AFTER = float(os.environ.get('WS_FEED_STALE_AFTER', 30))
+WS_FEED_OKX_URL = os.environ.get('WS_FEED_OKX_URL', 'wss://ws.okx.com:8443/ws/v5/public')
+WS_FEED_BINANCE_URL = os.environ.get('WS_FEED_BINANCE_URL', 'wss://stream.binance.com:9443/stream')
+
+# 全市场快照配置：批量查询优先从批量行情接口的快照中读取
+SNAPSHOT_ENABLED = os.environ.get('SNAPSHOT_ENABLED', 'true').lower() == 'true'
+SNAPSHOT_REFRESH_INTERVAL = float(os.environ.get('SNAPSHOT_REFRESH_INTERVAL', 5))
+
+# 全市场筛选配置（基于全市场快照）
+SCREENER_DEFAULT_LIMIT = int(os.environ.get('SCREENER_DEFAULT_LIMIT', 50))
+SCREENER_MAX_LIMIT = int(os.environ.get('SCREENER_MAX_LIMIT', 500))
+# 涨跌幅/成交额/振幅排行榜：在快照刷新时增量维护，只覆盖该报价货币、成交额达到门槛的交易对
+MOVERS_QUOTE = os.environ.get('MOVERS_QUOTE', 'USDT').upper()
+MOVERS_TOP_CAPACITY = int(os.environ.get('MOVERS_TOP_CAPACITY', 100))
+MOVERS_MIN_TURNOVER = float(os.environ.get('MOVERS_MIN_TURNOVER', 0))
+
+# 行情推送配置：同一交易对的所有订阅者共享一次轮询
+STREAM_INTERVAL = float(os.environ.get('STREAM_INTERVAL', 2))
+STREAM_HEARTBEAT = float(os.environ.get('STREAM_HEARTBEAT', 15))
+STREAM_MAX_SUBSCRIPTIONS = int(os.environ.get('STREAM_MAX_SUBSCRIPTIONS', 20))
+STREAM_MAX_CONNECTIONS = int(os.environ.get('STREAM_MAX_CONNECTIONS', 100))
+
+# K线查询配置：已收盘的K线写入本地SQLite，重复或重叠的区间查询只向上游补齐缺口
+CANDLE_DB_PATH = os.environ.get('CANDLE_DB_PATH', os.path.join('data', 'candles.db'))
+CANDLE_DEFAULT_LIMIT = int(os.environ.get('CANDLE_DEFAULT_LIMIT', 100))
+CANDLE_MAX_LIMIT = int(os.environ.get('CANDLE_MAX_LIMIT', 1000))
+
+candle_store = CandleStore(CANDLE_DB_PATH)
+
+# 行情记录日志（可选）：记录数据源返回的每一条行情，用于回放和回测
+TICK_JOURNAL_ENABLED = os.environ.get('TICK_JOURNAL_ENABLED', 'false').lower() == 'true'
+TICK_JOURNAL_DIR = os.environ.get('TICK_JOURNAL_DIR', os.path.join('data', 'ticks'))
+TICK_JOURNAL_SEGMENT_RECORDS = int(os.environ.get('TICK_JOURNAL_SEGMENT_RECORDS', 65536))
+TICK_JOURNAL_COMMIT_INTERVAL = float(os.environ.get('TICK_JOURNAL_COMMIT_INTERVAL', 0.05))
+# 是否记录全市场快照（每次刷新数千条）
+TICK_JOURNAL_SNAPSHOTS = os.environ.get('TICK_JOURNAL_SNAPSHOTS', 'true').lower() == 'true'
+
+# 回放数据源（可选）：行情记录日志目录或录制的推送消息文件（.jsonl），用于压测和离线开发
+REPLAY_SOURCE = os.environ.get('REPLAY_SOURCE', '')
+REPLAY_SPEED = float(os.environ.get('REPLAY_SPEED', 1))  # 回放倍速，0 表示固定返回最后一条行情
+REPLAY_LOOP = os.environ.get('REPLAY_LOOP', 'true').lower() == 'true'
+REPLAY_LATENCY = float(os.environ.get('REPLAY_LATENCY', 0))  # 每次查询的模拟延迟（秒）
+REPLAY_ONLY = os.environ.get('REPLAY_ONLY', 'true').lower() == 'true'  # 只使用回放数据源，不访问交易所
+
+tick_journal = TickJournal(TICK_JOURNAL_DIR, segment_records=TICK_JOURNAL_SEGMENT_RECORDS,
+                           commit_interval=TICK_JOURNAL_COMMIT_INTERVAL)
+
+def record_ticks(tickers):
+    """把数据源返回的行情写入行情记录日志（非阻塞，未启用时忽略）"""
+    if TICK_JOURNAL_ENABLED:
+        tick_journal.append_many(ticker for ticker in tickers if isinstance(ticker, Ticker))
+
+# 常见交易对映射
+COMMON_PAIRS = {
+    'BTC': 'BTC/USDT',
+    'ETH': 'ETH/USDT', 
+    'ADA': 'ADA/USDT',
+    'DOT': 'DOT/USDT',
+    'LINK': 'LINK/USDT',
+    'LTC': 'LTC/USDT',
+    'XRP': 'XRP/USDT',
+    'BNB': 'BNB/USDT',
+    'SOL': 'SOL/USDT',
+    'MATIC': 'MATIC/USDT',
+    'AVAX': 'AVAX/USDT',
+    'DOGE': 'DOGE/USDT',
+    'SHIB': 'SHIB/USDT',
+    'UNI': 'UNI/USDT',
+    'ATOM': 'ATOM/USDT'
+}
+
 def normalize_symbol(input_symbol):
     """标准化货币代码输入"""
     input_symbol = input_symbol.strip().upper()
     
-    # 常见交易对映射
-    common_pairs = {
-        'BTC': 'BTC/USDT',
-        'ETH': 'ETH/USDT', 
-        'ADA': 'ADA/USDT',
-        'DOT': 'DOT/USDT',
-        'LINK': 'LINK/USDT',
-        'LTC': 'LTC/USDT',
-        'XRP': 'XRP/USDT',
-        'BNB': 'BNB/USDT',
-        'SOL': 'SOL/USDT',
-        'MATIC': 'MATIC/USDT',
-        'AVAX': 'AVAX/USDT',
-        'DOGE': 'DOGE/USDT',
-        'SHIB': 'SHIB/USDT',
-        'UNI': 'UNI/USDT',
-        'ATOM': 'ATOM/USDT'
-    }
-    
     # 无效输入检查
     invalid_inputs = ['OKX', 'BINANCE', 'HUOBI', 'COINBASE', 'KRAKEN']
     if input_symbol in invalid_inputs:
@@ -46,50 +221,100 @@ def normalize_symbol(input_symbol):
         return input_symbol
     
     # 如果是常见币种，返回对应的USDT交易对
-    if input_symbol in common_pairs:
-        return common_pairs[input_symbol]
+    if input_symbol in COMMON_PAIRS:
+        return COMMON_PAIRS[input_symbol]
     
     # 默认添加/USDT
     return f"{input_symbol}/USDT"
 
+def _parse_okx_ticker(symbol_pair, ticker_data):
+    """将OKX行情数据转换为统一的结果格式"""
+    base_symbol, quote_symbol = split_symbol_pair(symbol_pair)
+    
+    price = float(ticker_data['last'])
+    open_24h = float(ticker_data['open24h'])
+    # 计算24小时涨跌幅
+    change_24h = ((price - open_24h) / open_24h) * 100
+    
+    return Ticker(
+        symbol=symbol_pair,
+        name=base_symbol,
+        price=price,
+        change_24h=change_24h,
+        quote_currency=quote_symbol,
+        high_24h=float(ticker_data['high24h']),
+        low_24h=float(ticker_data['low24h']),
+        volume=float(ticker_data['vol24h']),
+        source='OKX',
+        source_time=float(ticker_data['ts']) / 1000 if ticker_data.get('ts') else None
+    )
+
+def _parse_binance_ticker(symbol_pair, data):
+    """将Binance行情数据转换为统一的结果格式"""
+    base_symbol, quote_symbol = split_symbol_pair(symbol_pair)
+    
+    return Ticker(
+        symbol=symbol_pair,
+        name=base_symbol,
+        price=float(data['lastPrice']),
+        change_24h=float(data['priceChangePercent']),
+        quote_currency=quote_symbol,
+        high_24h=float(data['highPrice']),
+        low_24h=float(data['lowPrice']),
+        volume=float(data['volume']),
+        source='Binance',
+        source_time=float(data['closeTime']) / 1000 if data.get('closeTime') else None
+    )
+
+# 交易所对"交易对不存在"的应答：OKX 业务码 51001；Binance HTTP 400 + 错误码 -1121
+OKX_INSTRUMENT_NOT_FOUND = '51001'
+BINANCE_INVALID_SYMBOL = -1121
+
+def _response_body(response):
+    """读取JSON应答体，不是JSON对象时返回空字典"""
+    try:
+        body = response.json()
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+def _okx_failure(response, okx_symbol):
+    """OKX请求失败时的错误信息
+
+    只有交易对不存在才返回"未找到"（会写入负缓存、不计为数据源故障），限流（429）、5xx、系统繁忙等按普通错误处理
+    """
+    body = _response_body(response)
+    code = str(body.get('code', ''))
+    if code == OKX_INSTRUMENT_NOT_FOUND or (response.status_code == 200 and code == '0'):
+        return f"OKX API: 未找到交易对 {okx_symbol}"
+    if response.status_code != 200:
+        return f"OKX API: 请求失败 HTTP {response.status_code}"
+    return f"OKX API: 请求失败 code {code}: {body.get('msg', '')}"
+
+def _binance_failure(response, binance_symbol):
+    """Binance请求失败时的错误信息，只有 HTTP 400 且错误码为 -1121（无效交易对）才返回"未找到"错误"""
+    if response.status_code == 400 and _response_body(response).get('code') == BINANCE_INVALID_SYMBOL:
+        return f"Binance API: 未找到交易对 {binance_symbol}"
+    return f"Binance API: 请求失败 HTTP {response.status_code}"
+
 def get_crypto_data_okx(symbol_pair):
     """使用OKX API获取数据"""
     try:
-        base_symbol = symbol_pair.split('/')[0]
-        quote_symbol = symbol_pair.split('/')[1] if '/' in symbol_pair else 'USDT'
+        base_symbol, quote_symbol = split_symbol_pair(symbol_pair)
         
         # OKX API格式：BTC-USDT
         okx_symbol = f"{base_symbol}-{quote_symbol}"
         
         # 获取24小时价格统计
         ticker_url = "https://www.okx.com/api/v5/market/ticker"
-        response = requests.get(ticker_url, params={'instId': okx_symbol}, timeout=10)
+        response = provider_sessions.get('OKX').get(ticker_url, params={'instId': okx_symbol}, timeout=API_TIMEOUT)
         
         if response.status_code == 200:
             data = response.json()
             if data.get('code') == '0' and data.get('data'):
-                ticker_data = data['data'][0]
-                price = float(ticker_data['last'])
-                open_24h = float(ticker_data['open24h'])
-                # 计算24小时涨跌幅
-                change_24h = ((price - open_24h) / open_24h) * 100
-                
-                return {
-                    'symbol': symbol_pair,
-                    'name': base_symbol,
-                    'price': price,
-                    'price_formatted': f"${price:,.2f}" if quote_symbol in ['USDT', 'USD'] else f"{price:,.6f} {quote_symbol}",
-                    'change_24h': change_24h,
-                    'change_formatted': f"{change_24h:+.2f}%",
-                    'quote_currency': quote_symbol,
-                    'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'high_24h': float(ticker_data['high24h']),
-                    'low_24h': float(ticker_data['low24h']),
-                    'volume': float(ticker_data['vol24h']),
-                    'source': 'OKX'
-                }, None
-        
-        return None, f"OKX API: 未找到交易对 {okx_symbol}"
+                return _parse_okx_ticker(symbol_pair, data['data'][0]), None
+        
+        return None, _okx_failure(response, okx_symbol)
         
     except Exception as e:
         return None, f"OKX API错误: {str(e)}"
@@ -97,151 +322,557 @@ def get_crypto_data_okx(symbol_pair):
 def get_crypto_data_binance(symbol_pair):
     """使用Binance API获取数据"""
     try:
-        base_symbol = symbol_pair.split('/')[0]
-        quote_symbol = symbol_pair.split('/')[1] if '/' in symbol_pair else 'USDT'
+        base_symbol, quote_symbol = split_symbol_pair(symbol_pair)
         
         # Binance API格式：BTCUSDT
         binance_symbol = f"{base_symbol}{quote_symbol}"
         
         # 获取24小时价格统计
         ticker_url = "https://api.binance.com/api/v3/ticker/24hr"
-        response = requests.get(ticker_url, params={'symbol': binance_symbol}, timeout=10)
+        response = provider_sessions.get('Binance').get(ticker_url, params={'symbol': binance_symbol}, timeout=API_TIMEOUT)
         
         if response.status_code == 200:
-            data = response.json()
-            price = float(data['lastPrice'])
-            change_percent = float(data['priceChangePercent'])
+            return _parse_binance_ticker(symbol_pair, response.json()), None
+        
+        return None, _binance_failure(response, binance_symbol)
+        
+    except Exception as e:
+        return None, f"Binance API错误: {str(e)}"
+
+def get_bulk_tickers_okx():
+    """使用OKX批量行情接口一次获取全部现货交易对"""
+    try:
+        ticker_url = "https://www.okx.com/api/v5/market/tickers"
+        response = provider_sessions.get('OKX').get(ticker_url, params={'instType': 'SPOT'}, timeout=API_TIMEOUT)
+        
+        if response.status_code != 200:
+            return None, f"OKX API: 批量行情请求失败 HTTP {response.status_code}"
+        
+        data = response.json()
+        if data.get('code') != '0' or not data.get('data'):
+            return None, "OKX API: 批量行情返回为空"
+        
+        index = {}
+        for ticker_data in data['data']:
+            # OKX格式 BTC-USDT -> BTC/USDT
+            symbol_pair = ticker_data.get('instId', '').replace('-', '/')
+            try:
+                ticker = _parse_okx_ticker(symbol_pair, ticker_data)
+            except (KeyError, ValueError, ZeroDivisionError):
+                continue  # 跳过刚上线或数据不完整的交易对
+            if ticker.price > 0:
+                index[symbol_pair] = ticker
+        
+        return index, None
+        
+    except Exception as e:
+        return None, f"OKX API错误: {str(e)}"
+
+# Binance交易对没有分隔符，按常见报价货币后缀拆分（较长的后缀优先匹配）
+BINANCE_QUOTE_ASSETS = ('FDUSD', 'USDT', 'USDC', 'BUSD', 'TUSD', 'BTC', 'ETH', 'BNB', 'EUR', 'TRY')
+
+def _split_binance_symbol(binance_symbol):
+    """Binance格式 BTCUSDT -> BTC/USDT，无法识别报价货币时返回None"""
+    quote_symbol = next((q for q in BINANCE_QUOTE_ASSETS if binance_symbol.endswith(q)), None)
+    if not quote_symbol or binance_symbol == quote_symbol:
+        return None
+    return f"{binance_symbol[:-len(quote_symbol)]}/{quote_symbol}"
+
+def get_bulk_tickers_binance():
+    """使用Binance批量行情接口一次获取全部交易对"""
+    try:
+        ticker_url = "https://api.binance.com/api/v3/ticker/24hr"
+        response = provider_sessions.get('Binance').get(ticker_url, timeout=API_TIMEOUT)
+        
+        if response.status_code != 200:
+            return None, f"Binance API: 批量行情请求失败 HTTP {response.status_code}"
+        
+        index = {}
+        for data in response.json():
+            symbol_pair = _split_binance_symbol(data.get('symbol', ''))
+            if not symbol_pair:
+                continue
             
-            return {
-                'symbol': symbol_pair,
-                'name': base_symbol,
-                'price': price,
-                'price_formatted': f"${price:,.2f}" if quote_symbol in ['USDT', 'USD'] else f"{price:,.6f} {quote_symbol}",
-                'change_24h': change_percent,
-                'change_formatted': f"{change_percent:+.2f}%",
-                'quote_currency': quote_symbol,
-                'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'high_24h': float(data['highPrice']),
-                'low_24h': float(data['lowPrice']),
-                'volume': float(data['volume']),
-                'source': 'Binance'
-            }, None
-        
-        return None, f"Binance API: 未找到交易对 {binance_symbol}"
+            try:
+                ticker = _parse_binance_ticker(symbol_pair, data)
+            except (KeyError, ValueError):
+                continue
+            if ticker.price > 0:  # 已下架的交易对价格为0
+                index[symbol_pair] = ticker
+        
+        return index, None
         
     except Exception as e:
         return None, f"Binance API错误: {str(e)}"
 
-def get_crypto_data_coingecko(symbol_pair):
-    """使用CoinGecko API获取数据"""
+# K线周期 -> OKX bar参数（日线使用UTC零点开盘，与Binance一致）
+OKX_CANDLE_BARS = {'1m': '1m', '5m': '5m', '15m': '15m', '30m': '30m', '1h': '1H', '4h': '4H', '1d': '1Dutc'}
+OKX_CANDLE_PAGE_SIZE = 100
+BINANCE_CANDLE_PAGE_SIZE = 1000
+
+def get_candles_okx(symbol_pair, interval, start, end):
+    """使用OKX历史K线接口获取 [start, end]（开盘时间，毫秒）内已收盘的K线"""
     try:
-        base_symbol = symbol_pair.split('/')[0]
-        quote_symbol = symbol_pair.split('/')[1] if '/' in symbol_pair else 'USDT'
-        
-        # 使用CoinGecko API搜索币种
-        search_url = "https://api.coingecko.com/api/v3/search"
-        search_response = requests.get(search_url, params={'query': base_symbol}, timeout=10)
-        search_response.raise_for_status()
-        search_results = search_response.json().get('coins', [])
-        
-        if not search_results:
-            return None, f"CoinGecko: 未找到 '{base_symbol}' 相关的加密货币"
-        
-        coin_id = search_results[0]['id']
-        coin_name = search_results[0]['name']
-        
-        # 获取详细价格数据
-        price_url = f"https://api.coingecko.com/api/v3/coins/{coin_id}"
-        price_response = requests.get(price_url, timeout=10)
-        price_response.raise_for_status()
-        coin_data = price_response.json()
-        
-        market_data = coin_data.get('market_data', {})
-        if not market_data:
-            return None, "CoinGecko: 无法获取市场数据"
-        
-        current_price = market_data.get('current_price', {})
-        price_change_24h = market_data.get('price_change_percentage_24h', 0)
-        
-        # 根据报价货币选择价格
-        quote_currency = quote_symbol.lower()
-        if quote_currency == 'usdt':
-            quote_currency = 'usd'  # CoinGecko使用USD而不是USDT
-        
-        price = current_price.get(quote_currency, current_price.get('usd', 0))
-        
-        if price == 0:
-            return None, f"CoinGecko: 无法获取 {symbol_pair} 的价格信息"
-        
-        return {
-            'symbol': symbol_pair,
-            'name': coin_name,
-            'price': price,
-            'price_formatted': f"${price:,.2f}" if quote_currency in ['usd', 'usdt'] else f"{price:,.6f} {quote_symbol}",
-            'change_24h': price_change_24h,
-            'change_formatted': f"{price_change_24h:+.2f}%",
-            'quote_currency': quote_symbol,
-            'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'high_24h': market_data.get('high_24h', {}).get(quote_currency, 0),
-            'low_24h': market_data.get('low_24h', {}).get(quote_currency, 0),
-            'market_cap': market_data.get('market_cap', {}).get(quote_currency, 0),
-            'source': 'CoinGecko'
-        }, None
+        base_symbol, quote_symbol = split_symbol_pair(symbol_pair)
+        okx_symbol = f"{base_symbol}-{quote_symbol}"
+
+        # 接口按时间倒序分页：after 返回早于该时间的K线，before 返回晚于该时间的K线
+        candles_url = "https://www.okx.com/api/v5/market/history-candles"
+        candles = []
+        after = end + 1
+        while True:
+            response = provider_sessions.get('OKX').get(candles_url, params={
+                'instId': okx_symbol, 'bar': OKX_CANDLE_BARS[interval], 'after': after, 'before': start - 1,
+                'limit': OKX_CANDLE_PAGE_SIZE
+            }, timeout=API_TIMEOUT)
+            data = _response_body(response)
+            if response.status_code != 200 or data.get('code') != '0':
+                return None, _okx_failure(response, okx_symbol)
+
+            rows = data.get('data') or []
+            # [ts, o, h, l, c, vol, volCcy, volCcyQuote, confirm]
+            candles.extend((int(row[0]), float(row[1]), float(row[2]), float(row[3]), float(row[4]), float(row[5]))
+                           for row in rows)
+            if len(rows) < OKX_CANDLE_PAGE_SIZE or int(rows[-1][0]) <= start:
+                break
+            after = int(rows[-1][0])
+
+        candles.sort()
+        return candles, None
+
+    except Exception as e:
+        return None, f"OKX API错误: {str(e)}"
+
+def get_candles_binance(symbol_pair, interval, start, end):
+    """使用Binance K线接口获取 [start, end]（开盘时间，毫秒）内已收盘的K线"""
+    try:
+        base_symbol, quote_symbol = split_symbol_pair(symbol_pair)
+        binance_symbol = f"{base_symbol}{quote_symbol}"
+
+        candles_url = "https://api.binance.com/api/v3/klines"
+        candles = []
+        while start <= end:
+            response = provider_sessions.get('Binance').get(candles_url, params={
+                'symbol': binance_symbol, 'interval': interval, 'startTime': start, 'endTime': end,
+                'limit': BINANCE_CANDLE_PAGE_SIZE
+            }, timeout=API_TIMEOUT)
+            if response.status_code != 200:
+                return None, _binance_failure(response, binance_symbol)
+
+            rows = response.json()
+            # [openTime, open, high, low, close, volume, closeTime, ...]
+            candles.extend((int(row[0]), float(row[1]), float(row[2]), float(row[3]), float(row[4]), float(row[5]))
+                           for row in rows)
+            if len(rows) < BINANCE_CANDLE_PAGE_SIZE:
+                break
+            start = int(rows[-1][0]) + 1
+
+        return candles, None
+
+    except Exception as e:
+        return None, f"Binance API错误: {str(e)}"
+
+def _okx_feed_subscribe(symbol_pairs):
+    """OKX tickers频道订阅消息"""
+    args = [{'channel': 'tickers', 'instId': pair.replace('/', '-')} for pair in symbol_pairs]
+    return [json.dumps({'op': 'subscribe', 'args': args})]
+
+def _parse_okx_feed_message(message):
+    """解析OKX推送消息，行情字段与REST接口一致"""
+    if message == 'pong':
+        return {}
+    payload = json.loads(message)
+    if payload.get('event') == 'error':
+        raise ValueError(f"OKX订阅失败: {payload.get('msg')}")
+    
+    results = {}
+    for ticker_data in payload.get('data', []):
+        symbol_pair = ticker_data['instId'].replace('-', '/')
+        results[symbol_pair] = _parse_okx_ticker(symbol_pair, ticker_data)
+    return results
+
+def _binance_feed_subscribe(symbol_pairs):
+    """Binance 24小时行情流订阅消息"""
+    streams = [f"{pair.replace('/', '').lower()}@ticker" for pair in symbol_pairs]
+    return [json.dumps({'method': 'SUBSCRIBE', 'params': streams, 'id': 1})]
+
+def _parse_binance_feed_message(message):
+    """解析Binance推送消息，字段缩写映射为REST接口的字段名"""
+    payload = json.loads(message)
+    data = payload.get('data', payload)  # 组合流外层为 {"stream": ..., "data": ...}
+    if not isinstance(data, dict) or data.get('e') != '24hrTicker':
+        return {}  # 订阅确认等消息
+    
+    symbol_pair = _split_binance_symbol(data['s'])
+    if not symbol_pair:
+        return {}
+    return {symbol_pair: _parse_binance_ticker(symbol_pair, {
+        'lastPrice': data['c'],
+        'priceChangePercent': data['P'],
+        'highPrice': data['h'],
+        'lowPrice': data['l'],
+        'volume': data['v'],
+        'closeTime': data['C']
+    })}
+
+# CoinGecko支持的计价货币（USDT按USD计价）
+COINGECKO_QUOTES = ('USDT', 'USD', 'BTC', 'ETH', 'BNB', 'EUR', 'GBP', 'JPY', 'CNY', 'KRW', 'HKD', 'SGD', 'AUD',
+                    'CAD', 'CHF', 'INR', 'BRL', 'RUB', 'TRY')
+
+def _coingecko_vs_currency(quote_symbol):
+    """报价货币转换为CoinGecko的计价货币"""
+    quote_currency = quote_symbol.lower()
+    if quote_currency == 'usdt':
+        quote_currency = 'usd'  # CoinGecko使用USD而不是USDT
+    return quote_currency
+
+def _parse_iso_timestamp(value):
+    """ISO 8601 时间（如 2024-01-01T12:00:00.000Z）转换为Unix秒，格式无法识别时返回None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+def _parse_coingecko_market(symbol_pair, market):
+    """将CoinGecko /coins/markets 数据转换为统一的结果格式"""
+    _, quote_symbol = split_symbol_pair(symbol_pair)
+    
+    return Ticker(
+        symbol=symbol_pair,
+        name=market['name'],
+        price=market.get('current_price') or 0,
+        change_24h=market.get('price_change_percentage_24h') or 0,
+        quote_currency=quote_symbol,
+        high_24h=market.get('high_24h') or 0,
+        low_24h=market.get('low_24h') or 0,
+        market_cap=market.get('market_cap') or 0,
+        source='CoinGecko',
+        source_time=_parse_iso_timestamp(market.get('last_updated'))
+    )
+
+def get_crypto_data_coingecko_many(symbol_pairs):
+    """使用CoinGecko一次请求获取多个交易对的数据
+
+    返回 ({交易对: 结果字典}, error)，找不到的交易对不会出现在结果中
+    """
+    try:
+        # 按计价货币分组，同一计价货币的币种合并为一次请求
+        groups = {}
+        for symbol_pair in symbol_pairs:
+            base_symbol, quote_symbol = split_symbol_pair(symbol_pair)
+            coin = coingecko_index.lookup(base_symbol)
+            if coin:
+                groups.setdefault(_coingecko_vs_currency(quote_symbol), []).append((symbol_pair, coin[0]))
+        
+        results = {}
+        for vs_currency, pairs in groups.items():
+            markets_url = "https://api.coingecko.com/api/v3/coins/markets"
+            params = {'vs_currency': vs_currency, 'ids': ','.join(sorted({coin_id for _, coin_id in pairs}))}
+            response = provider_sessions.get('CoinGecko').get(markets_url, params=params, timeout=API_TIMEOUT)
+            response.raise_for_status()
+            
+            markets = {market['id']: market for market in response.json()}
+            for symbol_pair, coin_id in pairs:
+                market = markets.get(coin_id)
+                if market and market.get('current_price'):
+                    results[symbol_pair] = _parse_coingecko_market(symbol_pair, market)
+        
+        if not results:
+            return None, f"CoinGecko: 未找到 {', '.join(symbol_pairs)} 相关的加密货币"
+        
+        return results, None
         
     except Exception as e:
         return None, f"CoinGecko API错误: {str(e)}"
 
-def get_crypto_data(symbol_pair):
-    """获取加密货币数据，使用多个API源"""
+def get_crypto_data_coingecko(symbol_pair):
+    """使用CoinGecko API获取数据"""
+    base_symbol, _ = split_symbol_pair(symbol_pair)
     
-    # API源列表，按优先级排序
-    api_sources = [
-        ("OKX", get_crypto_data_okx),
-        ("Binance", get_crypto_data_binance),
-        ("CoinGecko", get_crypto_data_coingecko),
-    ]
+    results, error = get_crypto_data_coingecko_many([symbol_pair])
+    if results and symbol_pair in results:
+        return results[symbol_pair], None
     
-    last_error = None
-    all_errors = []
-    not_found_count = 0  # 统计"未找到"错误的数量
+    if error and "未找到" not in error:
+        return None, error
     
-    # 尝试每个API源
-    for source_name, api_func in api_sources:
+    return None, f"CoinGecko: 未找到 '{base_symbol}' 相关的加密货币"
+
+def _journaled_bulk_loader(loader):
+    """批量行情加载函数包装：成功时把全部行情写入行情记录日志"""
+    def load():
+        index, error = loader()
+        if index and TICK_JOURNAL_SNAPSHOTS:
+            record_ticks(index.values())
+        return index, error
+    return load
+
+def _journaled_feed_parser(parse_message):
+    """推送消息解析函数包装：解析出的行情写入行情记录日志"""
+    def parse(message):
+        results = parse_message(message)
+        record_ticks(results.values())
+        return results
+    return parse
+
+def _create_okx_feed():
+    return ExchangeFeed('OKX', WS_FEED_OKX_URL, _okx_feed_subscribe,
+                        _journaled_feed_parser(_parse_okx_feed_message),
+                        watchlist, stale_after=WS_FEED_STALE_AFTER, ping_message='ping')
+
+def _create_binance_feed():
+    return ExchangeFeed('Binance', WS_FEED_BINANCE_URL, _binance_feed_subscribe,
+                        _journaled_feed_parser(_parse_binance_feed_message),
+                        watchlist, stale_after=WS_FEED_STALE_AFTER)
+
+def _parse_recorded_message(message):
+    """解析录制的交易所推送消息（OKX或Binance格式），无法识别的消息返回空字典"""
+    for parse_message in (_parse_okx_feed_message, _parse_binance_feed_message):
         try:
+            results = parse_message(message)
+        except (KeyError, ValueError, TypeError, AttributeError, ZeroDivisionError):
+            continue
+        if results:
+            return results
+    return {}
+
+def _create_replay_provider():
+    """按 REPLAY_SOURCE 创建回放数据源：目录为行情记录日志，文件为录制的推送消息"""
+    if not REPLAY_SOURCE:
+        return None
+    options = {'speed': REPLAY_SPEED, 'loop': REPLAY_LOOP, 'latency': REPLAY_LATENCY}
+    if os.path.isdir(REPLAY_SOURCE):
+        return ReplayProvider.from_journal(REPLAY_SOURCE, **options)
+    return ReplayProvider.from_messages(REPLAY_SOURCE, _parse_recorded_message, **options)
+
+replay_provider = _create_replay_provider()
+# 只使用回放数据源时不访问任何交易所
+replay_only = replay_provider is not None and REPLAY_ONLY
+
+# 数据源注册表：新增数据源在这里注册即可，调度策略按能力、报价货币、健康评分和预期延迟选择
+provider_registry = ProviderRegistry(provider_health)
+
+if not replay_only:
+    provider_registry.register(Provider(
+        'OKX', fetch_one=get_crypto_data_okx, bulk=get_bulk_tickers_okx, stream=_create_okx_feed,
+        rate_limit=10, expected_latency=0.3, priority=10
+    ))
+    provider_registry.register(Provider(
+        'Binance', fetch_one=get_crypto_data_binance, bulk=get_bulk_tickers_binance, stream=_create_binance_feed,
+        rate_limit=20, expected_latency=0.3, priority=20
+    ))
+    # CoinGecko免费接口限流较严，只支持法币和主流币计价（不支持USDC等稳定币）
+    provider_registry.register(Provider(
+        'CoinGecko', fetch_one=get_crypto_data_coingecko, fetch_many=get_crypto_data_coingecko_many,
+        rate_limit=0.5, quotes=COINGECKO_QUOTES, expected_latency=1.0, priority=30
+    ))
+
+if replay_provider is not None:
+    # 回放数据源：单独使用，或作为最后的备用数据源（不参与健康排序）
+    provider_registry.register(Provider(
+        replay_provider.name, fetch_one=replay_provider.get, fetch_many=replay_provider.get_many,
+        bulk=replay_provider.bulk, expected_latency=max(REPLAY_LATENCY, 0.01), priority=1000,
+        fallback=not replay_only, live=False
+    ))
+
+def _apply_rate_limits(overrides):
+    """按 RATE_LIMITS（名称=次/秒，逗号分隔）覆盖数据源声明的请求速率，0 表示不限"""
+    for item in overrides.replace(' ', '').split(','):
+        name, _, rate = item.partition('=')
+        provider = provider_registry.get(name)
+        if provider is not None and rate:
+            provider.rate_limit = float(rate) or None
+
+_apply_rate_limits(RATE_LIMITS)
+
+def _call_source(source_name, api_func, symbol_pair):
+    """调用单个API源
+
+    返回 (data, failure)，失败时 failure 为 (错误摘要, 错误信息, 是否为"未找到"错误)
+    """
+    breaker = provider_health.breaker(source_name)
+    if not breaker.allow_request():
+        error_msg = f"{source_name} API已熔断，暂时跳过"
+        if DEBUG_MODE:
+            print(f"⛔ {error_msg}")  # 调试信息
+        return None, (error_msg, error_msg, False)
+    
+    # 超出限流额度时不发出注定被拒绝（429）的请求，直接改用下一个数据源
+    provider = provider_registry.get(source_name)
+    rate = provider.rate_limit if provider is not None and RATE_LIMIT_ENABLED else None
+    if not rate_limiter.acquire(source_name, rate, timeout=RATE_LIMIT_WAIT):
+        breaker.release()
+        error_msg = f"{source_name} API请求超出限流额度，暂时跳过"
+        if DEBUG_MODE:
+            print(f"🚦 {error_msg}")  # 调试信息
+        return None, (error_msg, error_msg, False)
+    
+    started = time.monotonic()
+    try:
+        if DEBUG_MODE:
+            print(f"尝试 {source_name} API...")  # 调试信息
+        data, error = api_func(symbol_pair)
+        if data:
+            breaker.record(True, time.monotonic() - started)
+            # 单个交易对返回 Ticker，批量查询返回 {交易对: Ticker}；非实时数据源（回放）的行情不重复记录
+            if provider is None or provider.live:
+                record_ticks([data] if isinstance(data, Ticker) else data.values())
             if DEBUG_MODE:
-                print(f"尝试 {source_name} API...")  # 调试信息
-            data, error = api_func(symbol_pair)
-            if data:
-                if DEBUG_MODE:
-                    print(f"✅ {source_name} API成功")  # 调试信息
-                return data, None
-            else:
-                if DEBUG_MODE:
-                    print(f"❌ {source_name} API失败: {error}")  # 调试信息
-                all_errors.append(f"{source_name}: {error}")
-                
-                # 检查是否是"未找到交易对"的错误
-                if "未找到交易对" in error or "未找到" in error:
-                    not_found_count += 1
-                
-                last_error = error
-        except Exception as e:
-            error_msg = f"{source_name} API异常: {str(e)}"
+                print(f"✅ {source_name} API成功")  # 调试信息
+            return data, None
+        
+        if DEBUG_MODE:
+            print(f"❌ {source_name} API失败: {error}")  # 调试信息
+        # 数据源明确应答"交易对不存在"不算故障；限流、5xx 等其他失败计入熔断器的错误率
+        not_found = "未找到" in error
+        breaker.record(not_found, time.monotonic() - started)
+        return None, (f"{source_name}: {error}", error, not_found)
+    except Exception as e:
+        breaker.record(False, time.monotonic() - started)
+        error_msg = f"{source_name} API异常: {str(e)}"
+        if DEBUG_MODE:
+            print(f"❌ {error_msg}")  # 调试信息
+        return None, (error_msg, error_msg, False)
+
+def _fetch_sequential(symbol_pair, providers):
+    """按优先级依次尝试每个数据源"""
+    failures = []
+    for provider in providers:
+        data, failure = _call_source(provider.name, provider.fetch_one, symbol_pair)
+        if data:
+            return data, failures
+        failures.append(failure)
+    return None, failures
+
+def _hedge_delay(provider):
+    """对冲延迟：数据源超过预期延迟的 HEDGE_LATENCY_MULTIPLIER 倍仍未返回时启动下一个，最长 HEDGE_DELAY"""
+    return min(HEDGE_DELAY, provider.expected_latency * HEDGE_LATENCY_MULTIPLIER)
+
+def _fetch_hedged(symbol_pair, providers, parallel=False):
+    """对冲请求：当前数据源超过对冲延迟未返回时并行启动下一个数据源
+
+    parallel 为 True 时一开始就同时请求所有数据源。
+    取第一个成功的结果，其余尚未开始的请求会被取消；
+    已在进行中的请求无法中断，其结果会被丢弃。
+    """
+    remaining = list(providers)
+    pending = set()
+    failures = []
+    
+    def launch_next():
+        provider = remaining.pop(0)
+        pending.add(hedge_executor.submit(_call_source, provider.name, provider.fetch_one, symbol_pair))
+        return provider
+    
+    latest = launch_next()
+    while parallel and remaining:
+        launch_next()
+    while pending:
+        # 还有备用数据源时最多等待对冲延迟，否则等待剩余请求结束
+        delay = _hedge_delay(latest)
+        done, _ = wait(pending, timeout=delay if remaining else None, return_when=FIRST_COMPLETED)
+        
+        if not done:
             if DEBUG_MODE:
-                print(f"❌ {error_msg}")  # 调试信息
-            all_errors.append(error_msg)
-            last_error = error_msg
+                print(f"⏱️ {latest.name} {delay:g}秒内未返回，启动对冲请求")  # 调试信息
+            latest = launch_next()
             continue
+        
+        for future in done:
+            pending.discard(future)
+            data, failure = future.result()
+            if data:
+                for other in pending:
+                    other.cancel()
+                return data, failures
+            failures.append(failure)
+        
+        # 有数据源失败时立即尝试下一个，无需等待对冲延迟
+        if remaining and len(pending) == 0:
+            latest = launch_next()
+    
+    return None, failures
+
+def _fetch_consensus(symbol_pair, providers):
+    """同时请求所有数据源，收集 CONSENSUS_TIMEOUT 内成功返回的结果
+
+    返回 ([各数据源结果], failures)；超时未返回的请求继续在后台完成（仍计入健康统计），结果丢弃
+    """
+    futures = {hedge_executor.submit(_call_source, provider.name, provider.fetch_one, symbol_pair): provider.name
+               for provider in providers}
+    done, not_done = wait(futures, timeout=CONSENSUS_TIMEOUT)
+    
+    results, failures = [], []
+    for future, source_name in futures.items():
+        if future in not_done:
+            error_msg = f"{source_name} API超时: {CONSENSUS_TIMEOUT:g}秒内未返回"
+            failures.append((error_msg, error_msg, False))
+            continue
+        data, failure = future.result()
+        if data:
+            results.append(data)
+        else:
+            failures.append(failure)
+    return results, failures
+
+def get_crypto_data(symbol_pair, strategy=None):
+    """获取加密货币数据，使用多个API源
+
+    strategy: 'sequential'（默认，按优先级依次尝试）、'hedged'（对冲请求）、
+    'parallel'（同时请求所有数据源，取最先成功的结果）
+    或 'consensus'（同时请求所有数据源并合并为共识价格），未指定时使用 FETCH_STRATEGY 配置
+    """
+    
+    # 最近确认不存在的交易对直接返回，不访问上游
+    not_found_error = negative_cache.get(symbol_pair)
+    if not_found_error:
+        return None, not_found_error
+    
+    # 从注册表选择支持该交易对报价货币的数据源，按优先级和观测到的健康评分排序，熔断中的数据源在调用时跳过
+    providers = provider_registry.select(symbol_pair)
+    if not providers:
+        _, quote_symbol = split_symbol_pair(symbol_pair)
+        return None, f"没有支持 {quote_symbol} 计价的数据源"
+    
+    strategy = strategy or FETCH_STRATEGY
+    if strategy == 'consensus':
+        results, failures = _fetch_consensus(symbol_pair, providers)
+        if results:
+            data = build_consensus(symbol_pair, results, max_deviation=CONSENSUS_MAX_DEVIATION)
+            # 未参与合并的数据源（失败、超时、熔断）及原因
+            data['consensus']['unavailable'] = [summary for summary, _, _ in failures]
+            return data, None
+        return _summarize_failures(symbol_pair, failures)
+    
+    if strategy in ('hedged', 'parallel'):
+        data, failures = _fetch_hedged(symbol_pair, providers, parallel=strategy == 'parallel')
+    else:
+        data, failures = _fetch_sequential(symbol_pair, providers)
+    
+    if data:
+        return data, None
+    
+    return _summarize_failures(symbol_pair, failures)
+
+def _summarize_failures(symbol_pair, failures):
+    """分析所有数据源的失败原因，返回合适的错误信息"""
+    all_errors = [summary for summary, _, _ in failures]
+    last_error = failures[-1][1] if failures else None
+    not_found_count = sum(1 for _, _, not_found in failures if not_found)  # 统计"未找到"错误的数量
     
     # 分析错误类型并返回合适的错误信息
     if DEBUG_MODE:
         print(f"所有API都失败，错误列表: {all_errors}")  # 调试信息
     
-    base_symbol = symbol_pair.split('/')[0]
+    base_symbol, _ = split_symbol_pair(symbol_pair)
     
     # 如果大部分API都返回"未找到"错误，说明是无效的货币代码
     if not_found_count >= 2:
-        return None, f"抱歉，没有找到 '{base_symbol}' 相关的加密货币。请检查货币代码是否正确，或尝试使用其他常见币种如 BTC、ETH、ADA 等。"
+        error = f"抱歉，没有找到 '{base_symbol}' 相关的加密货币。请检查货币代码是否正确，或尝试使用其他常见币种如 BTC、ETH、ADA 等。"
+        negative_cache.set(symbol_pair, error)
+        return None, error
     
     # 如果是网络相关错误
     network_errors = ["timeout", "连接", "网络", "Connection", "Max retries"]
@@ -253,30 +884,248 @@ def get_crypto_data(symbol_pair):
     # 其他错误
     return None, f"数据获取失败：{last_error}"
 
+# 全市场快照按注册表中支持批量行情的数据源依次加载，实时数据源的结果写入行情记录日志
+market_snapshot = MarketSnapshot(
+    [(provider.name, _journaled_bulk_loader(provider.bulk) if provider.live else provider.bulk)
+     for provider in provider_registry.select(capability='bulk')],
+    refresh_interval=SNAPSHOT_REFRESH_INTERVAL,
+    table=MarketTable(ranked_quote=MOVERS_QUOTE, top_capacity=MOVERS_TOP_CAPACITY,
+                      ranked_min_turnover=MOVERS_MIN_TURNOVER)
+)
+
+def _with_age(data, age, stale=False):
+    """返回附带数据年龄（秒）和是否为旧数据（已软过期、正在后台刷新）的结果"""
+    return dict(data, age=round(age, 3), stale=stale)
+
+def _ticker_with_age(ticker):
+    """未经缓存直接返回的 Ticker（全市场快照、批量查询），按其获取时间计算数据年龄"""
+    return _with_age(ticker, time.time() - ticker.updated_at)
+
+def get_cached_crypto_data(symbol_pair, strategy=None):
+    """带缓存的数据获取，同一交易对的并发请求只访问一次上游
+
+    缓存软过期后立即返回旧数据（stale 为 True）并在后台刷新，结果附带数据年龄 age
+    """
+    if strategy == 'consensus':
+        # 共识价格与单一数据源的结果分开缓存
+        key, loader = f"{symbol_pair}@consensus", lambda: get_crypto_data(symbol_pair, strategy='consensus')
+    else:
+        key, loader = symbol_pair, lambda: get_crypto_data(symbol_pair)
+    data, error, age, stale = price_cache.get_or_revalidate(key, loader, refresh_executor)
+    if not data:
+        return data, error
+    return _with_age(data, age, stale), None
+
+def fetch_watchlist(symbol_pairs):
+    """后台轮询使用：优先读取交易所推送和全市场快照，都未覆盖的交易对经由缓存逐个查询
+    （与接口请求共享缓存、并发合并和负缓存）"""
+    results = {}
+    for symbol_pair in symbol_pairs:
+        streamed = get_streamed_crypto_data(symbol_pair)
+        if streamed:
+            results[symbol_pair] = streamed[0]
+    
+    missing = [pair for pair in symbol_pairs if pair not in results]
+    snapshot = market_snapshot.get_index() if SNAPSHOT_ENABLED and missing else {}
+    results.update({pair: snapshot[pair] for pair in missing if pair in snapshot})
+    for symbol_pair in symbol_pairs:
+        if symbol_pair not in results:
+            data, _ = get_cached_crypto_data(symbol_pair)
+            if data:
+                results[symbol_pair] = data
+    return results
+
+watchlist = list(dict.fromkeys(
+    [normalize_symbol(symbol) for symbol in POLLER_WATCHLIST.split(',') if normalize_symbol(symbol)]
+    if POLLER_WATCHLIST.strip() else COMMON_PAIRS.values()
+))
+
+market_poller = MarketPoller(
+    fetch_watchlist,
+    watchlist,
+    interval=POLLER_INTERVAL,
+    jitter=POLLER_JITTER
+)
+
+# 按 WS_FEED_PROVIDERS 为注册表中支持实时推送的数据源创建订阅
+exchange_feeds = [provider.stream() for provider in provider_registry.select(capability='stream')
+                  if provider.name.lower() in WS_FEED_PROVIDERS.lower().replace(' ', '').split(',')]
+
+def get_streamed_crypto_data(symbol_pair):
+    """从交易所推送读取交易对（不做任何I/O），返回 (数据, 年龄秒数)；没有未过期的数据返回None"""
+    if not WS_FEED_ENABLED:
+        return None
+    for feed in exchange_feeds:
+        entry = feed.get(symbol_pair)
+        if entry is not None:
+            return entry
+    return None
+
+price_stream = PriceStreamHub(fetch_watchlist, interval=STREAM_INTERVAL)
+
+def start_background_workers():
+    """启动后台线程（行情轮询、交易所行情订阅、行情记录日志等）
+
+    线程不会跨fork保留，多进程部署时由每个worker进程在fork之后调用（见 gunicorn.conf.py）
+    """
+    if POLLER_ENABLED:
+        market_poller.start()
+    if WS_FEED_ENABLED:
+        for feed in exchange_feeds:
+            feed.start()
+    if TICK_JOURNAL_ENABLED:
+        tick_journal.start()
+
+def get_polled_crypto_data(symbol_pair):
+    """从后台行情（交易所推送、轮询快照）读取数据（不做任何I/O），附带数据年龄；没有足够新的数据返回None"""
+    streamed = get_streamed_crypto_data(symbol_pair)
+    if streamed:
+        data, age = streamed
+        return _with_age(data, age)
+    if not POLLER_ENABLED:
+        return None
+    entry = market_poller.get(symbol_pair)
+    if entry is None or entry[1] > POLLER_STALE_AFTER:
+        return None
+    data, age = entry
+    return _with_age(data, age)
+
 @app.route('/health')
 def health_check():
     """健康检查端点"""
     return jsonify({
         'status': 'healthy',
         'service': 'crypto-price-service',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'worker_pid': os.getpid(),
+        'cache': price_cache.stats(),
+        'negative_cache': negative_cache.stats(),
+        'snapshot': market_snapshot.stats() if SNAPSHOT_ENABLED else None,
+        'upstream_pools': provider_sessions.stats(),
+        'fetch_strategy': FETCH_STRATEGY,
+        'providers': provider_health.stats(),
+        'provider_registry': provider_registry.stats(),
+        'rate_limits': rate_limiter.stats() if RATE_LIMIT_ENABLED else None,
+        'coingecko_index': coingecko_index.stats(),
+        'poller': market_poller.stats() if POLLER_ENABLED else None,
+        'feeds': {feed.name: feed.stats() for feed in exchange_feeds} if WS_FEED_ENABLED else None,
+        'stream': price_stream.stats(),
+        'candles': candle_store.stats(),
+        'tick_journal': tick_journal.stats() if TICK_JOURNAL_ENABLED else None,
+        'replay': replay_provider.stats() if replay_provider is not None else None
     })
 
 @app.route('/api/crypto/<symbol>')
 def api_crypto(symbol):
-    """API接口，返回JSON数据"""
+    """API接口，返回JSON数据
+
+    ?mode=consensus 返回多个数据源合并后的共识价格（附 consensus 字段：各数据源报价、权重、价差、数据延迟）
+    """
     normalized_symbol = normalize_symbol(symbol)
     
     if normalized_symbol is None:
         return jsonify({'error': f"'{symbol}' 不是有效的加密货币代码"}), 400
     
-    data, error = get_crypto_data(normalized_symbol)
+    mode = request.args.get('mode')
+    if mode == 'consensus':
+        data, error = get_cached_crypto_data(normalized_symbol, strategy='consensus')
+        if error:
+            return jsonify({'error': error}), 400
+        return jsonify(data)
+    if mode:
+        return jsonify({'error': f"不支持的查询模式: {mode}（可选 consensus）"}), 400
+    
+    # 后台轮询快照足够新时直接返回，否则实时查询
+    polled = get_polled_crypto_data(normalized_symbol)
+    if polled:
+        return jsonify(polled)
+    
+    data, error = get_cached_crypto_data(normalized_symbol)
     
     if error:
         return jsonify({'error': error}), 400
     
     return jsonify(data)
 
+def _timestamp_arg(name):
+    """读取可选的时间参数（Unix秒、毫秒或ISO 8601），返回毫秒；格式错误时抛出ValueError"""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        timestamp = float(value)
+    except ValueError:
+        timestamp = _parse_iso_timestamp(value)
+        if timestamp is None:
+            raise ValueError(f"参数 {name} 必须是Unix时间戳或ISO 8601时间")
+    # 大于1e11视为毫秒时间戳
+    return int(timestamp if timestamp > 1e11 else timestamp * 1000)
+
+@app.route('/api/crypto/<symbol>/candles')
+def api_crypto_candles(symbol):
+    """K线查询，如 /api/crypto/BTC/candles?interval=1h&start=2024-01-01T00:00:00Z&limit=24
+
+    只返回已收盘的K线；未指定 start/end 时返回最近 limit 根
+    """
+    normalized_symbol = normalize_symbol(symbol)
+    if normalized_symbol is None:
+        return jsonify({'error': f"'{symbol}' 不是有效的加密货币代码"}), 400
+    
+    interval = request.args.get('interval', '1h').lower()
+    if interval not in CANDLE_INTERVALS:
+        return jsonify({'error': f"参数 interval 只能是 {', '.join(CANDLE_INTERVALS)}"}), 400
+    try:
+        start = _timestamp_arg('start')
+        end = _timestamp_arg('end')
+        limit = int(_float_arg('limit') or CANDLE_DEFAULT_LIMIT)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    limit = max(1, min(limit, CANDLE_MAX_LIMIT))
+    step = CANDLE_INTERVALS[interval]
+    latest = start is None
+    if latest:
+        end = end if end is not None else int(time.time() * 1000)
+        start = end - limit * step
+    elif end is None:
+        end = start + (limit - 1) * step
+    if end < start:
+        return jsonify({'error': "参数 end 不能早于 start"}), 400
+    # 查询最近K线时区间由 limit（已限制在上限内）决定，多取的一根会在下面截掉；
+    # 只校验调用方显式指定的区间
+    if not latest and (end - start) // step >= CANDLE_MAX_LIMIT:
+        return jsonify({'error': f"查询区间最多包含 {CANDLE_MAX_LIMIT} 根K线"}), 400
+    
+    candles, error = candle_store.get_candles(normalized_symbol, interval, start, end, [
+        ("OKX", get_candles_okx),
+        ("Binance", get_candles_binance),
+    ])
+    if candles is None:
+        return jsonify({'error': error}), 400
+    if latest:
+        candles = candles[-limit:]
+    
+    result = {
+        'symbol': normalized_symbol,
+        'interval': interval,
+        'count': len(candles),
+        # 区间涨跌幅：第一根开盘价到最后一根收盘价
+        'change_pct': round((candles[-1]['close'] - candles[0]['open']) / candles[0]['open'] * 100, 4)
+        if candles and candles[0]['open'] else None,
+        'candles': candles
+    }
+    if error:
+        # 部分缺口补齐失败，返回本地已有的K线
+        result['warning'] = error
+    return jsonify(result)
+
+def _result_before(future, deadline):
+    """在截止时间（time.monotonic()）前等待 future 的结果，超时返回 None（任务继续在后台完成）"""
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FuturesTimeoutError:
+        return None
+
 @app.route('/api/crypto/batch', methods=['POST'])
 def api_crypto_batch():
     """批量查询API"""
@@ -287,27 +1136,207 @@ def api_crypto_batch():
         if not symbols:
             return jsonify({'error': '货币代码列表不能为空'}), 400
         
+        # 整批请求（包括下面的快照和合并查询）共享一个截止时间
+        deadline = time.monotonic() + BATCH_TIMEOUT
+        normalized = {symbol: normalize_symbol(symbol) for symbol in symbols}
+        
+        # 优先使用后台轮询快照（无I/O）
+        prefetched = {}
+        for pair in normalized.values():
+            polled = get_polled_crypto_data(pair) if pair else None
+            if polled:
+                prefetched[pair] = polled
+        
+        # 其次从全市场快照读取，一次上游请求即可覆盖整批货币
+        missing = [pair for pair in normalized.values() if pair and pair not in prefetched]
+        snapshot = {}
+        if SNAPSHOT_ENABLED and missing:
+            snapshot = _result_before(batch_executor.submit(market_snapshot.get_index), deadline) or {}
+        prefetched.update({pair: _ticker_with_age(snapshot[pair]) for pair in missing if pair in snapshot})
+        
+        # 快照未覆盖的货币多半只在CoinGecko上有行情，合并为一次请求（注册表中首个支持多个查询的数据源）
+        leftovers = sorted({pair for pair in normalized.values()
+                            if pair and pair not in prefetched and negative_cache.get(pair) is None})
+        many_providers = provider_registry.select(capability='many') if snapshot and leftovers else []
+        if many_providers:
+            provider = many_providers[0]
+            pairs = [pair for pair in leftovers if provider.supports(pair, 'many')]
+            if pairs:
+                future = batch_executor.submit(_call_source, provider.name, provider.fetch_many, pairs)
+                # 截止时间前未返回时，这些货币留给下面逐个查询（同样只等待剩余时间）
+                many_results = _result_before(future, deadline)
+                if many_results:
+                    data, _ = many_results
+                    prefetched.update({pair: _ticker_with_age(ticker) for pair, ticker in (data or {}).items()})
+        
+        # 仍未获取到的货币并发逐个查询，只等待截止时间前剩余的时间
+        futures = {}
+        for symbol in symbols:
+            normalized_symbol = normalized[symbol]
+            if normalized_symbol and normalized_symbol not in prefetched and symbol not in futures:
+                futures[symbol] = batch_executor.submit(get_cached_crypto_data, normalized_symbol)
+        
+        wait(futures.values(), timeout=max(0.0, deadline - time.monotonic()))
+        
+        # 按请求顺序组装结果，超时的货币单独返回超时错误
         results = {}
         for symbol in symbols:
-            normalized_symbol = normalize_symbol(symbol)
-            if normalized_symbol:
-                data, error = get_crypto_data(normalized_symbol)
+            normalized_symbol = normalized[symbol]
+            future = futures.get(symbol)
+            if normalized_symbol in prefetched:
+                results[symbol] = prefetched[normalized_symbol]
+            elif future is None:
+                results[symbol] = {'error': f"'{symbol}' 不是有效的加密货币代码"}
+            elif not future.done():
+                future.cancel()
+                results[symbol] = {'error': f"查询超时：{BATCH_TIMEOUT:g}秒内未获取到 '{symbol}' 的数据"}
+            else:
+                data, error = future.result()
                 if data:
                     results[symbol] = data
                 else:
                     results[symbol] = {'error': error}
-            else:
-                results[symbol] = {'error': f"'{symbol}' 不是有效的加密货币代码"}
         
         return jsonify(results)
         
     except Exception as e:
         return jsonify({'error': f'批量查询失败: {str(e)}'}), 500
 
+def _get_market_table():
+    """返回全市场行情表，快照未启用或不可用时返回 (None, error)"""
+    if not SNAPSHOT_ENABLED:
+        return None, "全市场快照未启用（SNAPSHOT_ENABLED=false）"
+    table = market_snapshot.get_index()
+    if not table:
+        return None, f"全市场快照暂不可用：{market_snapshot.last_error or '尚未加载'}"
+    return table, None
+
+def _float_arg(name):
+    """读取可选的数值查询参数，格式错误时抛出ValueError"""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"参数 {name} 必须是数字")
+
+@app.route('/api/market/overview')
+def api_market_overview():
+    """市场概览：全市场涨跌家数、平均涨跌幅、总成交额"""
+    table, error = _get_market_table()
+    if error:
+        return jsonify({'error': error}), 503
+    
+    quote = request.args.get('quote', 'USDT').upper()
+    snapshot_stats = market_snapshot.stats()
+    return jsonify(dict(
+        quote=quote,
+        source=snapshot_stats['source'],
+        age=snapshot_stats['age'],
+        **table.overview(quote=quote)
+    ))
+
+@app.route('/api/market/movers')
+def api_market_movers():
+    """全市场排行榜，如 /api/market/movers?by=change&order=desc&limit=10
+
+    by: change（24小时涨跌幅）、volume（成交额）、range（24小时振幅）；order: desc（默认）或 asc
+    """
+    table, error = _get_market_table()
+    if error:
+        return jsonify({'error': error}), 503
+    
+    by = request.args.get('by', 'change').lower()
+    order = request.args.get('order', 'desc').lower()
+    if by not in METRICS:
+        return jsonify({'error': f"参数 by 只能是 {', '.join(METRICS)}"}), 400
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': "参数 order 只能是 asc 或 desc"}), 400
+    try:
+        min_volume = _float_arg('min_volume')
+        limit = int(_float_arg('limit') or 10)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    quote = request.args.get('quote', MOVERS_QUOTE).upper()
+    results = table.movers(max(1, min(limit, SCREENER_MAX_LIMIT)), metric=by, ascending=order == 'asc',
+                           quote=quote, min_volume=min_volume)
+    return jsonify({'by': by, 'order': order, 'quote': quote, 'count': len(results), 'results': results})
+
+@app.route('/api/market/screener')
+def api_market_screener():
+    """按条件筛选全市场交易对，如 /api/market/screener?min_change=10&min_volume=1000000"""
+    table, error = _get_market_table()
+    if error:
+        return jsonify({'error': error}), 503
+    
+    try:
+        min_change = _float_arg('min_change')
+        max_change = _float_arg('max_change')
+        min_volume = _float_arg('min_volume')
+        limit = int(_float_arg('limit') or SCREENER_DEFAULT_LIMIT)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    quote = request.args.get('quote', 'USDT').upper()
+    results = table.screen(min_change=min_change, max_change=max_change, min_volume=min_volume,
+                           quote=quote, limit=max(1, min(limit, SCREENER_MAX_LIMIT)))
+    return jsonify({'quote': quote, 'count': len(results), 'results': results})
+
+@app.route('/api/stream')
+def api_stream():
+    """行情推送（Server-Sent Events），如 /api/stream?symbols=BTC,ETH
+
+    价格变化时推送 price 事件；没有更新时定期发送心跳注释保持连接
+    """
+    symbols = [symbol.strip() for symbol in request.args.get('symbols', '').split(',') if symbol.strip()]
+    if not symbols:
+        return jsonify({'error': '货币代码列表不能为空'}), 400
+    if len(symbols) > STREAM_MAX_SUBSCRIPTIONS:
+        return jsonify({'error': f"每个连接最多订阅 {STREAM_MAX_SUBSCRIPTIONS} 个交易对"}), 400
+    
+    symbol_pairs = []
+    for symbol in symbols:
+        normalized_symbol = normalize_symbol(symbol)
+        if normalized_symbol is None:
+            return jsonify({'error': f"'{symbol}' 不是有效的加密货币代码"}), 400
+        symbol_pairs.append(normalized_symbol)
+    
+    # 每个推送连接在整个生命周期内占用一个worker线程，限制单个进程的连接数
+    if price_stream.connections >= STREAM_MAX_CONNECTIONS:
+        return jsonify({'error': '推送连接数已达上限，请稍后重试'}), 503
+    
+    subscription = price_stream.subscribe(symbol_pairs)
+    
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                updates = subscription.get(timeout=STREAM_HEARTBEAT)
+                if not updates:
+                    yield ": keepalive\n\n"
+                    continue
+                for symbol_pair, data in updates:
+                    payload = json.dumps(data, ensure_ascii=False, default=to_json_default)
+                    yield f"event: price\nid: {symbol_pair}\ndata: {payload}\n\n"
+        finally:
+            # 客户端断开后生成器被关闭，取消订阅
+            subscription.close()
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 if __name__ == '__main__':
     # 支持Heroku等云平台的端口配置
     port = int(os.environ.get('PORT', 5000))
     print(f"🚀 加密货币价格服务启动在端口 {port}")
     print(f"🌐 API地址: http://localhost:{port}/api/crypto/<symbol>")
     print(f"💊 健康检查: http://localhost:{port}/health")
+    print(f"📡 行情推送: http://localhost:{port}/api/stream?symbols=BTC,ETH")
+    print(f"📈 市场概览: http://localhost:{port}/api/market/overview")
+    print("⚠️  当前为单进程开发服务器，生产环境请使用: python serve.py")
+    start_background_workers()
     app.run(host='0.0.0.0', port=port, debug=DEBUG_MODE)
\ No newline at end of file
@@ -0,0 +1,519 @@
+"""
+加密货币价格查询服务（异步版本）
+基于ASGI（Starlette + httpx），与Flask版本提供相同的接口，
+所有上游请求共享一个事件循环，不再为每个等待中的请求占用一个线程
+
+启动方式：
+    python price_service_async.py
+    uvicorn price_service_async:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+try:
+    import httpx
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse as _JSONResponse
+    from starlette.routing import Route
+except ImportError as e:
+    raise ImportError("异步服务模式需要额外依赖，请运行: pip install -r requirements-async.txt") from e
+
+from price_service import (
+    API_TIMEOUT, BATCH_TIMEOUT, CONSENSUS_MAX_DEVIATION, CONSENSUS_TIMEOUT, DEBUG_MODE, FETCH_STRATEGY,
+    POLLER_ENABLED, RATE_LIMIT_ENABLED, RATE_LIMIT_WAIT, TICK_JOURNAL_ENABLED, UPSTREAM_POOL_SIZE,
+    UPSTREAM_RETRIES, WS_FEED_ENABLED,
+    _binance_failure, _coingecko_vs_currency, _hedge_delay, _okx_failure, _parse_binance_ticker,
+    _parse_coingecko_market, _parse_okx_ticker, _summarize_failures, _with_age,
+    coingecko_index, exchange_feeds, get_polled_crypto_data, market_poller,
+    negative_cache, normalize_symbol, price_cache, provider_health, provider_registry, rate_limiter,
+    record_ticks, redis_client, replay_provider, start_background_workers, tick_journal,
+)
+from price_consensus import build_consensus
+from ticker import split_symbol_pair, to_json_default
+
+class JSONResponse(_JSONResponse):
+    """与Flask版本相同：遇到 Ticker 时通过 to_dict() 序列化"""
+
+    def render(self, content):
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(',', ':'),
+                          default=to_json_default).encode('utf-8')
+
+# 每个数据源一个异步客户端，在事件循环中复用keep-alive连接
+_clients = {}
+
+def get_client(provider):
+    """获取数据源对应的异步HTTP客户端（首次使用时创建）"""
+    client = _clients.get(provider)
+    if client is None:
+        limits = httpx.Limits(max_connections=UPSTREAM_POOL_SIZE, max_keepalive_connections=UPSTREAM_POOL_SIZE)
+        transport = httpx.AsyncHTTPTransport(limits=limits, retries=UPSTREAM_RETRIES)
+        client = httpx.AsyncClient(transport=transport, timeout=API_TIMEOUT)
+        _clients[provider] = client
+    return client
+
+# 配置Redis时，缓存加载（读L2、等待分布式锁）在专用线程池中执行，
+# 上游请求仍在事件循环中完成
+_load_executor = ThreadPoolExecutor(max_workers=UPSTREAM_POOL_SIZE, thread_name_prefix='async-load')
+
+async def _run_blocking(func, *args):
+    """调用可能访问Redis的函数（缓存、限流）
+
+    配置了Redis时放到线程池中执行，避免阻塞事件循环
+    """
+    if redis_client is None:
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+def _describe_error(e):
+    """把httpx异常转换为与同步版本一致、可被网络错误识别的描述"""
+    if isinstance(e, httpx.TimeoutException):
+        return f"timeout ({type(e).__name__})"
+    if isinstance(e, httpx.TransportError):
+        return f"Connection error ({type(e).__name__}: {e})"
+    return str(e)
+
+async def get_crypto_data_okx(symbol_pair):
+    """使用OKX API获取数据"""
+    try:
+        base_symbol, quote_symbol = split_symbol_pair(symbol_pair)
+        okx_symbol = f"{base_symbol}-{quote_symbol}"
+
+        ticker_url = "https://www.okx.com/api/v5/market/ticker"
+        response = await get_client('OKX').get(ticker_url, params={'instId': okx_symbol})
+
+        if response.status_code == 200:
+            data = response.json()
+            if data.get('code') == '0' and data.get('data'):
+                return _parse_okx_ticker(symbol_pair, data['data'][0]), None
+
+        return None, _okx_failure(response, okx_symbol)
+
+    except Exception as e:
+        return None, f"OKX API错误: {_describe_error(e)}"
+
+async def get_crypto_data_binance(symbol_pair):
+    """使用Binance API获取数据"""
+    try:
+        base_symbol, quote_symbol = split_symbol_pair(symbol_pair)
+        binance_symbol = f"{base_symbol}{quote_symbol}"
+
+        ticker_url = "https://api.binance.com/api/v3/ticker/24hr"
+        response = await get_client('Binance').get(ticker_url, params={'symbol': binance_symbol})
+
+        if response.status_code == 200:
+            return _parse_binance_ticker(symbol_pair, response.json()), None
+
+        return None, _binance_failure(response, binance_symbol)
+
+    except Exception as e:
+        return None, f"Binance API错误: {_describe_error(e)}"
+
+async def get_crypto_data_coingecko(symbol_pair):
+    """使用CoinGecko API获取数据"""
+    try:
+        base_symbol, quote_symbol = split_symbol_pair(symbol_pair)
+
+        # 索引查询可能需要访问磁盘或 /search，放到线程池中执行
+        loop = asyncio.get_running_loop()
+        coin = await loop.run_in_executor(None, coingecko_index.lookup, base_symbol)
+        if coin is None:
+            return None, f"CoinGecko: 未找到 '{base_symbol}' 相关的加密货币"
+
+        markets_url = "https://api.coingecko.com/api/v3/coins/markets"
+        params = {'vs_currency': _coingecko_vs_currency(quote_symbol), 'ids': coin[0]}
+        response = await get_client('CoinGecko').get(markets_url, params=params)
+        response.raise_for_status()
+
+        markets = response.json()
+        if not markets or not markets[0].get('current_price'):
+            return None, f"CoinGecko: 无法获取 {symbol_pair} 的价格信息"
+
+        return _parse_coingecko_market(symbol_pair, markets[0]), None
+
+    except Exception as e:
+        return None, f"CoinGecko API错误: {_describe_error(e)}"
+
+async def get_crypto_data_replay(symbol_pair):
+    """回放数据源（模拟延迟不阻塞事件循环）"""
+    if replay_provider.latency:
+        await asyncio.sleep(replay_provider.latency)
+    return replay_provider.lookup(symbol_pair)
+
+# 注册表中数据源对应的异步实现；没有异步实现的数据源在线程池中调用其同步 fetch_one
+ASYNC_FETCHERS = {
+    'OKX': get_crypto_data_okx,
+    'Binance': get_crypto_data_binance,
+    'CoinGecko': get_crypto_data_coingecko,
+}
+if replay_provider is not None:
+    ASYNC_FETCHERS[replay_provider.name] = get_crypto_data_replay
+
+def _async_fetch_one(provider):
+    fetcher = ASYNC_FETCHERS.get(provider.name)
+    if fetcher is not None:
+        return fetcher
+
+    async def fetch(symbol_pair):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, provider.fetch_one, symbol_pair)
+    return fetch
+
+async def _acquire_rate_limit(source_name, rate):
+    """与 RateLimiter.acquire 相同，但排队等待令牌时不阻塞事件循环"""
+    deadline = time.monotonic() + RATE_LIMIT_WAIT
+    waited = 0.0
+    while True:
+        wait = await _run_blocking(rate_limiter.try_acquire, source_name, rate)
+        if wait <= 0:
+            rate_limiter.record(source_name, True, waited)
+            return True
+        if time.monotonic() + wait > deadline:
+            rate_limiter.record(source_name, False, waited)
+            return False
+        await asyncio.sleep(wait)
+        waited += wait
+
+async def _call_source(source_name, api_func, symbol_pair):
+    """调用单个API源，返回值与同步版本的 _call_source 相同"""
+    breaker = provider_health.breaker(source_name)
+    if not breaker.allow_request():
+        error_msg = f"{source_name} API已熔断，暂时跳过"
+        return None, (error_msg, error_msg, False)
+
+    provider = provider_registry.get(source_name)
+    rate = provider.rate_limit if provider is not None and RATE_LIMIT_ENABLED else None
+    try:
+        if rate and not await _acquire_rate_limit(source_name, rate):
+            breaker.release()
+            error_msg = f"{source_name} API请求超出限流额度，暂时跳过"
+            return None, (error_msg, error_msg, False)
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+
+    started = time.monotonic()
+    try:
+        data, error = await api_func(symbol_pair)
+    except asyncio.CancelledError:
+        # 对冲请求中被取消的调用没有结果，不计入健康统计
+        breaker.release()
+        raise
+    except Exception as e:
+        breaker.record(False, time.monotonic() - started)
+        error_msg = f"{source_name} API异常: {str(e)}"
+        return None, (error_msg, error_msg, False)
+
+    if data:
+        breaker.record(True, time.monotonic() - started)
+        if provider is None or provider.live:
+            record_ticks([data])
+        if DEBUG_MODE:
+            print(f"✅ {source_name} API成功")  # 调试信息
+        return data, None
+
+    if DEBUG_MODE:
+        print(f"❌ {source_name} API失败: {error}")  # 调试信息
+    # 数据源明确应答"交易对不存在"不算故障；限流、5xx 等其他失败计入熔断器的错误率
+    not_found = "未找到" in error
+    breaker.record(not_found, time.monotonic() - started)
+    return None, (f"{source_name}: {error}", error, not_found)
+
+async def _fetch_sequential(symbol_pair, providers):
+    """按优先级依次尝试每个数据源"""
+    failures = []
+    for provider in providers:
+        data, failure = await _call_source(provider.name, _async_fetch_one(provider), symbol_pair)
+        if data:
+            return data, failures
+        failures.append(failure)
+    return None, failures
+
+async def _fetch_hedged(symbol_pair, providers, parallel=False):
+    """对冲请求：当前数据源超过对冲延迟未返回时并行启动下一个数据源
+    （parallel 时同时启动全部），取第一个成功结果并取消其余请求"""
+    remaining = list(providers)
+    pending = set()
+    failures = []
+
+    def launch_next():
+        provider = remaining.pop(0)
+        pending.add(asyncio.ensure_future(_call_source(provider.name, _async_fetch_one(provider), symbol_pair)))
+        return provider
+
+    latest = launch_next()
+    while parallel and remaining:
+        launch_next()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, timeout=_hedge_delay(latest) if remaining else None,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                latest = launch_next()
+                continue
+
+            for task in done:
+                pending.discard(task)
+                data, failure = task.result()
+                if data:
+                    return data, failures
+                failures.append(failure)
+
+            if remaining and not pending:
+                latest = launch_next()
+
+        return None, failures
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def _fetch_consensus(symbol_pair, providers):
+    """同时请求所有数据源，收集 CONSENSUS_TIMEOUT 内成功返回的结果
+
+    返回 ([各数据源结果], failures)；
+    超时未返回的请求继续在后台完成（仍计入健康统计），结果丢弃
+    """
+    tasks = {asyncio.ensure_future(_call_source(provider.name, _async_fetch_one(provider), symbol_pair)): provider.name
+             for provider in providers}
+    _, pending = await asyncio.wait(tasks, timeout=CONSENSUS_TIMEOUT)
+
+    results, failures = [], []
+    for task, source_name in tasks.items():
+        if task in pending:
+            error_msg = f"{source_name} API超时: {CONSENSUS_TIMEOUT:g}秒内未返回"
+            failures.append((error_msg, error_msg, False))
+            continue
+        data, failure = task.result()
+        if data:
+            results.append(data)
+        else:
+            failures.append(failure)
+    return results, failures
+
+async def get_crypto_data(symbol_pair, strategy=None):
+    """获取加密货币数据，使用多个API源（异步版本，strategy 与同步版本相同）"""
+    not_found_error = await _run_blocking(negative_cache.get, symbol_pair)
+    if not_found_error:
+        return None, not_found_error
+
+    providers = provider_registry.select(symbol_pair)
+    if not providers:
+        _, quote_symbol = split_symbol_pair(symbol_pair)
+        return None, f"没有支持 {quote_symbol} 计价的数据源"
+
+    strategy = strategy or FETCH_STRATEGY
+    if strategy == 'consensus':
+        results, failures = await _fetch_consensus(symbol_pair, providers)
+        if results:
+            data = build_consensus(symbol_pair, results, max_deviation=CONSENSUS_MAX_DEVIATION)
+            # 未参与合并的数据源（失败、超时、熔断）及原因
+            data['consensus']['unavailable'] = [summary for summary, _, _ in failures]
+            return data, None
+        return await _run_blocking(_summarize_failures, symbol_pair, failures)
+
+    if strategy in ('hedged', 'parallel'):
+        data, failures = await _fetch_hedged(symbol_pair, providers, parallel=strategy == 'parallel')
+    else:
+        data, failures = await _fetch_sequential(symbol_pair, providers)
+
+    if data:
+        return data, None
+
+    return await _run_blocking(_summarize_failures, symbol_pair, failures)
+
+# 正在进行中的上游请求，同一缓存键的并发请求共享同一个任务
+_inflight = {}
+
+async def _load(key, fetch):
+    """调用 fetch() 加载并写入缓存，返回 (data, error, 数据年龄)
+
+    配置Redis时与同步版本相同：先读共享缓存（L2），取得分布式锁后才请求上游，
+    副本之间只请求一次
+    """
+    if redis_client is None:
+        data, error = await fetch()
+        if data:
+            price_cache.set(key, data)
+        return data, error, 0.0
+
+    loop = asyncio.get_running_loop()
+
+    def loader():
+        return asyncio.run_coroutine_threadsafe(fetch(), loop).result()
+
+    return await loop.run_in_executor(_load_executor, price_cache.load, key, loader)
+
+def _start_load(key, fetch):
+    task = asyncio.ensure_future(_load(key, fetch))
+    task.add_done_callback(lambda t: _inflight.pop(key, None))
+    _inflight[key] = task
+    return task
+
+async def get_cached_crypto_data(symbol_pair, strategy=None):
+    """带缓存的数据获取，同一交易对的并发请求只访问一次上游
+
+    缓存软过期后立即返回旧数据（stale 为 True）并在后台刷新，结果附带数据年龄 age
+    """
+    if strategy == 'consensus':
+        # 共识价格与单一数据源的结果分开缓存
+        key, fetch = f"{symbol_pair}@consensus", lambda: get_crypto_data(symbol_pair, strategy='consensus')
+    else:
+        key, fetch = symbol_pair, lambda: get_crypto_data(symbol_pair)
+
+    entry = price_cache.lookup(key)
+    if entry is not None:
+        data, age, stale = entry
+        if not stale:
+            price_cache.hits += 1
+            return _with_age(data, age), None
+        price_cache.stale_hits += 1
+        if key not in _inflight:
+            price_cache.revalidations += 1
+            _start_load(key, fetch)
+        return _with_age(data, age, stale=True), None
+
+    task = _inflight.get(key)
+    if task is None:
+        price_cache.misses += 1
+        task = _start_load(key, fetch)
+    else:
+        price_cache.coalesced += 1
+
+    # shield：单个请求被取消（如批量查询超时）时，共享的加载任务继续完成并写入缓存
+    data, error, age = await asyncio.shield(task)
+    if not data:
+        return data, error
+    return _with_age(data, age), None
+
+async def health_check(request):
+    """健康检查端点"""
+    return JSONResponse({
+        'status': 'healthy',
+        'service': 'crypto-price-service',
+        'mode': 'async',
+        'timestamp': datetime.now().isoformat(),
+        'worker_pid': os.getpid(),
+        'cache': price_cache.stats(),
+        'negative_cache': negative_cache.stats(),
+        'inflight': len(_inflight),
+        'fetch_strategy': FETCH_STRATEGY,
+        'providers': provider_health.stats(),
+        'provider_registry': provider_registry.stats(),
+        'rate_limits': rate_limiter.stats() if RATE_LIMIT_ENABLED else None,
+        'coingecko_index': coingecko_index.stats(),
+        'poller': market_poller.stats() if POLLER_ENABLED else None,
+        'feeds': {feed.name: feed.stats() for feed in exchange_feeds} if WS_FEED_ENABLED else None,
+        'tick_journal': tick_journal.stats() if TICK_JOURNAL_ENABLED else None,
+        'replay': replay_provider.stats() if replay_provider is not None else None
+    })
+
+async def api_crypto(request):
+    """API接口，返回JSON数据
+
+    ?mode=consensus 返回多个数据源合并后的共识价格
+    （附 consensus 字段：各数据源报价、权重、价差、数据延迟）
+    """
+    symbol = request.path_params['symbol']
+    normalized_symbol = normalize_symbol(symbol)
+
+    if normalized_symbol is None:
+        return JSONResponse({'error': f"'{symbol}' 不是有效的加密货币代码"}, status_code=400)
+
+    mode = request.query_params.get('mode')
+    if mode == 'consensus':
+        data, error = await get_cached_crypto_data(normalized_symbol, strategy='consensus')
+        if error:
+            return JSONResponse({'error': error}, status_code=400)
+        return JSONResponse(data)
+    if mode:
+        return JSONResponse({'error': f"不支持的查询模式: {mode}（可选 consensus）"}, status_code=400)
+
+    polled = get_polled_crypto_data(normalized_symbol)
+    if polled:
+        return JSONResponse(polled)
+
+    data, error = await get_cached_crypto_data(normalized_symbol)
+
+    if error:
+        return JSONResponse({'error': error}, status_code=400)
+
+    return JSONResponse(data)
+
+async def api_crypto_batch(request):
+    """批量查询API"""
+    try:
+        request_data = await request.json()
+        symbols = request_data.get('symbols', [])
+
+        if not symbols:
+            return JSONResponse({'error': '货币代码列表不能为空'}, status_code=400)
+
+        normalized = {symbol: normalize_symbol(symbol) for symbol in symbols}
+
+        prefetched = {}
+        tasks = {}
+        for symbol in symbols:
+            normalized_symbol = normalized[symbol]
+            if not normalized_symbol or symbol in tasks or normalized_symbol in prefetched:
+                continue
+            polled = get_polled_crypto_data(normalized_symbol)
+            if polled:
+                prefetched[normalized_symbol] = polled
+            else:
+                tasks[symbol] = asyncio.ensure_future(get_cached_crypto_data(normalized_symbol))
+
+        if tasks:
+            await asyncio.wait(tasks.values(), timeout=BATCH_TIMEOUT)
+
+        # 按请求顺序组装结果，超时的货币单独返回超时错误
+        results = {}
+        for symbol in symbols:
+            normalized_symbol = normalized[symbol]
+            task = tasks.get(symbol)
+            if normalized_symbol in prefetched:
+                results[symbol] = prefetched[normalized_symbol]
+            elif task is None:
+                results[symbol] = {'error': f"'{symbol}' 不是有效的加密货币代码"}
+            elif not task.done():
+                task.cancel()
+                results[symbol] = {'error': f"查询超时：{BATCH_TIMEOUT:g}秒内未获取到 '{symbol}' 的数据"}
+            else:
+                data, error = task.result()
+                results[symbol] = data if data else {'error': error}
+
+        return JSONResponse(results)
+
+    except Exception as e:
+        return JSONResponse({'error': f'批量查询失败: {str(e)}'}, status_code=500)
+
+@asynccontextmanager
+async def lifespan(app):
+    start_background_workers()
+    yield
+    # 关闭时释放所有上游连接
+    for client in list(_clients.values()):
+        await client.aclose()
+    _clients.clear()
+
+app = Starlette(
+    debug=DEBUG_MODE,
+    routes=[
+        Route('/health', health_check),
+        Route('/api/crypto/batch', api_crypto_batch, methods=['POST']),
+        Route('/api/crypto/{symbol}', api_crypto),
+    ],
+    lifespan=lifespan,
+)
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 5000))
+    print(f"🚀 加密货币价格服务（异步模式）启动在端口 {port}")
+    print(f"🌐 API地址: http://localhost:{port}/api/crypto/<symbol>")
+    print(f"💊 健康检查: http://localhost:{port}/health")
+    uvicorn.run(app, host='0.0.0.0', port=port)
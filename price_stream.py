@@ -0,0 +1,174 @@
+"""
+行情推送
+多个客户端订阅同一交易对时共享一次上游轮询，价格变化时推送给所有订阅者
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+
+# 批量获取函数：接收交易对列表，返回 {交易对: 结果字典}
+FetchMany = Callable[[List[str]], Dict[str, Dict[str, Any]]]
+
+
+class Subscription:
+    """一个客户端连接的订阅
+
+    待推送的更新按交易对合并，只保留每个交易对的最新值：
+    消费慢的客户端不会无限堆积消息，也不会阻塞轮询线程。
+    """
+
+    def __init__(self, hub: 'PriceStreamHub', symbol_pairs: List[str]):
+        self.hub = hub
+        self.symbol_pairs = symbol_pairs
+        self._pending: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._cond = threading.Condition()
+        self.closed = False
+
+        # 统计计数器
+        self.delivered = 0
+        self.conflated = 0
+
+    def offer(self, symbol_pair: str, data: Dict[str, Any]):
+        """由轮询线程调用，放入一条更新（不阻塞）"""
+        with self._cond:
+            if symbol_pair in self._pending:
+                # 上一条还没被取走，直接用新值覆盖
+                self.conflated += 1
+                del self._pending[symbol_pair]
+            self._pending[symbol_pair] = data
+            self._cond.notify()
+
+    def get(self, timeout: float) -> List[Tuple[str, Dict[str, Any]]]:
+        """取走所有待推送的更新，超时仍没有更新时返回空列表"""
+        with self._cond:
+            if not self._pending and not self.closed:
+                self._cond.wait(timeout)
+            updates = list(self._pending.items())
+            self._pending.clear()
+            self.delivered += len(updates)
+            return updates
+
+    def close(self):
+        """取消订阅（重复调用无副作用）"""
+        with self._cond:
+            if self.closed:
+                return
+            self.closed = True
+            self._cond.notify_all()
+        self.hub.unsubscribe(self)
+
+
+class PriceStreamHub:
+    """按交易对管理订阅，后台线程统一轮询所有被订阅的交易对
+
+    - 同一交易对无论有多少订阅者，每轮只获取一次
+    - 只有价格变化时才推送；新订阅者立即收到已有的最新值
+    - 轮询线程在首次订阅时启动，没有订阅时空闲等待
+    """
+
+    def __init__(self, fetch_many: FetchMany, interval: float = 2.0):
+        self.fetch_many = fetch_many
+        self.interval = interval
+
+        self._topics: Dict[str, Set[Subscription]] = {}  # 交易对 -> 订阅集合
+        self._latest: Dict[str, Tuple[float, Dict[str, Any]]] = {}  # 交易对 -> (获取时间, 数据)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+        # 统计计数器
+        self.connections = 0
+        self.polls = 0
+        self.published = 0
+        self.errors = 0
+        self.last_error = None
+
+    def subscribe(self, symbol_pairs: Iterable[str]) -> Subscription:
+        """订阅一组交易对，返回订阅对象"""
+        subscription = Subscription(self, list(dict.fromkeys(symbol_pairs)))
+        with self._lock:
+            for symbol_pair in subscription.symbol_pairs:
+                self._topics.setdefault(symbol_pair, set()).add(subscription)
+                entry = self._latest.get(symbol_pair)
+                if entry is not None:
+                    subscription.offer(symbol_pair, entry[1])
+            self.connections += 1
+            self._ensure_started_locked()
+        # 有新交易对时立即轮询，不必等到下一个周期
+        self._wakeup.set()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """移除订阅，没有订阅者的交易对不再轮询"""
+        with self._lock:
+            for symbol_pair in subscription.symbol_pairs:
+                subscribers = self._topics.get(symbol_pair)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[symbol_pair]
+                    self._latest.pop(symbol_pair, None)
+            self.connections -= 1
+
+    def poll_once(self):
+        """获取所有被订阅交易对的最新数据，并推送发生变化的部分"""
+        with self._lock:
+            symbol_pairs = list(self._topics)
+        if not symbol_pairs:
+            return
+
+        try:
+            results = self.fetch_many(symbol_pairs)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            for symbol_pair, data in results.items():
+                subscribers = self._topics.get(symbol_pair)
+                if not subscribers:
+                    continue
+                previous = self._latest.get(symbol_pair)
+                self._latest[symbol_pair] = (now, data)
+                if previous is not None and previous[1].get('price') == data.get('price'):
+                    continue
+                for subscription in subscribers:
+                    subscription.offer(symbol_pair, data)
+                self.published += 1
+        self.polls += 1
+        missing = len(symbol_pairs) - len(results)
+        self.last_error = f"{missing} 个交易对本轮未获取到数据" if missing else None
+
+    def _run(self):
+        while True:
+            self._wakeup.clear()
+            self.poll_once()
+            self._wakeup.wait(self.interval)
+
+    def _ensure_started_locked(self):
+        # 线程不会跨fork保留，多进程部署时由每个worker在首次订阅时启动
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='price-stream', daemon=True)
+        self._thread.start()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回推送统计信息"""
+        with self._lock:
+            subscriptions = {sub for subscribers in self._topics.values() for sub in subscribers}
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'connections': self.connections,
+                'topics': len(self._topics),
+                'interval': self.interval,
+                'polls': self.polls,
+                'published': self.published,
+                'conflated': sum(sub.conflated for sub in subscriptions),
+                'errors': self.errors,
+                'last_error': self.last_error,
+            }
@@ -0,0 +1,165 @@
+"""
+数据源健康度跟踪
+为每个上游数据源维护熔断器，并按观测到的延迟与错误率动态调整数据源顺序
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """单个数据源的熔断器
+
+    - closed: 正常放行，记录滚动窗口内的成功/失败与延迟
+    - open: 错误率或p95延迟超过阈值后打开，冷却期内直接跳过该数据源
+    - half_open: 冷却期结束后只放行一个探测请求，成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, window: float = 60.0, min_requests: int = 5, error_rate_threshold: float = 0.5,
+                 p95_latency_threshold: float = 5.0, cooldown: float = 30.0):
+        self.window = window
+        self.min_requests = min_requests
+        self.error_rate_threshold = error_rate_threshold
+        self.p95_latency_threshold = p95_latency_threshold
+        self.cooldown = cooldown
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe_in_flight = False
+        self._samples = deque(maxlen=200)  # (timestamp, success, latency)
+        self._lock = threading.Lock()
+
+    def _prune_locked(self, now: float):
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+    def _error_rate_locked(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, success, _ in self._samples if not success) / len(self._samples)
+
+    def _p95_locked(self) -> Optional[float]:
+        if not self._samples:
+            return None
+        latencies = sorted(latency for _, _, latency in self._samples)
+        return latencies[max(0, math.ceil(len(latencies) * 0.95) - 1)]
+
+    def _open_locked(self, now: float):
+        self.state = OPEN
+        self.opened_at = now
+        self.trips += 1
+
+    def allow_request(self) -> bool:
+        """是否允许向该数据源发起请求（半开状态下占用唯一的探测名额）"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    return False
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def release(self):
+        """请求被取消、没有结果时释放半开探测名额"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record(self, success: bool, latency: float):
+        """记录一次请求结果"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                if success:
+                    # 探测成功，丢弃熔断前的历史样本
+                    self.state = CLOSED
+                    self._samples.clear()
+                    self._samples.append((now, success, latency))
+                else:
+                    self._open_locked(now)
+                return
+
+            self._samples.append((now, success, latency))
+            self._prune_locked(now)
+
+            if self.state == CLOSED and len(self._samples) >= self.min_requests:
+                p95 = self._p95_locked()
+                if self._error_rate_locked() >= self.error_rate_threshold or p95 >= self.p95_latency_threshold:
+                    self._open_locked(now)
+
+    def health_score(self) -> Optional[float]:
+        """健康评分（越低越好）：p95延迟按成功率折算，样本不足时返回None
+
+        只看延迟会让快速失败的数据源排到前面，因此用成功率加以惩罚
+        """
+        with self._lock:
+            self._prune_locked(time.monotonic())
+            if len(self._samples) < self.min_requests:
+                return None
+            success_rate = max(1 - self._error_rate_locked(), 0.05)
+            return self._p95_locked() / success_rate
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._prune_locked(now)
+            p95 = self._p95_locked()
+            return {
+                'state': self.state,
+                'samples': len(self._samples),
+                'error_rate': round(self._error_rate_locked(), 4),
+                'p95_latency': round(p95, 4) if p95 is not None else None,
+                'trips': self.trips,
+                'open_for': round(now - self.opened_at, 1) if self.state != CLOSED else None,
+            }
+
+
+class ProviderHealth:
+    """所有数据源的熔断器集合"""
+
+    def __init__(self, **breaker_options):
+        self.breaker_options = breaker_options
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        breaker = self._breakers.get(provider)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(provider, CircuitBreaker(**self.breaker_options))
+        return breaker
+
+    def rank(self, api_sources: List[Tuple[str, Callable]]) -> List[Tuple[str, Callable]]:
+        """按健康评分重新排序数据源
+
+        有足够样本的数据源在它们占据的位置之间按评分从低到高重排；
+        样本不足的数据源（包括熔断后历史样本已过期、等待探测的）保持原有优先级位置
+        """
+        scores = [self.breaker(source_name).health_score() for source_name, _ in api_sources]
+        measured = [position for position, score in enumerate(scores) if score is not None]
+        reordered = sorted(measured, key=lambda position: (scores[position], position))
+
+        ranked = list(api_sources)
+        for slot, position in zip(measured, reordered):
+            ranked[slot] = api_sources[position]
+        return ranked
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return {provider: breaker.stats() for provider, breaker in breakers}
@@ -0,0 +1,117 @@
+"""
+数据源注册表
+每个数据源声明自己支持的能力（单个查询、多个查询、全市场批量、实时推送）和元数据
+（限流、支持的报价货币、预期延迟、优先级），调度策略按请求从注册表中选择数据源；
+新增数据源只需注册，不需要修改 get_crypto_data
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from provider_health import ProviderHealth
+from ticker import split_symbol_pair
+
+# 数据源能力
+CAPABILITIES = ('one', 'many', 'bulk', 'stream')
+
+
+class Provider:
+    """数据源及其能力声明
+
+    - fetch_one(交易对) -> (Ticker, error)
+    - fetch_many([交易对]) -> ({交易对: Ticker}, error)
+    - bulk() -> ({交易对: Ticker}, error)，全市场行情
+    - stream() -> ExchangeFeed，创建实时推送订阅
+    - rate_limit: 数据源允许的请求速率（次/秒），None 表示不限
+    - quotes: 支持的报价货币，None 表示不限
+    - expected_latency: 正常情况下的响应时间（秒），对冲请求据此决定何时启动备用数据源
+    - priority: 越小越优先；fallback 为 True 的数据源只作为最后的备用，不参与健康排序
+    - live: 是否为实时行情（回放数据源为 False，其结果不写入行情记录日志）
+    """
+
+    def __init__(self, name: str, fetch_one: Optional[Callable] = None, fetch_many: Optional[Callable] = None,
+                 bulk: Optional[Callable] = None, stream: Optional[Callable] = None,
+                 rate_limit: Optional[float] = None, quotes: Optional[Tuple[str, ...]] = None,
+                 expected_latency: float = 1.0, priority: int = 100, fallback: bool = False, live: bool = True):
+        self.name = name
+        self.fetch_one = fetch_one
+        self.fetch_many = fetch_many
+        self.bulk = bulk
+        self.stream = stream
+        self.rate_limit = rate_limit
+        self.quotes = tuple(quote.upper() for quote in quotes) if quotes else None
+        self.expected_latency = expected_latency
+        self.priority = priority
+        self.fallback = fallback
+        self.live = live
+
+    @property
+    def capabilities(self) -> List[str]:
+        functions = (self.fetch_one, self.fetch_many, self.bulk, self.stream)
+        return [capability for capability, func in zip(CAPABILITIES, functions) if func is not None]
+
+    def supports(self, symbol_pair: Optional[str] = None, capability: str = 'one') -> bool:
+        """是否支持该能力和交易对的报价货币"""
+        if capability not in self.capabilities:
+            return False
+        if symbol_pair is None or self.quotes is None:
+            return True
+        return split_symbol_pair(symbol_pair)[1] in self.quotes
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'capabilities': self.capabilities,
+            'rate_limit': self.rate_limit,
+            'quotes': list(self.quotes) if self.quotes else None,
+            'expected_latency': self.expected_latency,
+            'priority': self.priority,
+            'fallback': self.fallback,
+        }
+
+    def __repr__(self) -> str:
+        return f"Provider({self.name} {','.join(self.capabilities)})"
+
+
+class ProviderRegistry:
+    """数据源注册表
+
+    select() 按能力和报价货币筛选数据源，按优先级排列后再按观测到的健康评分调整顺序
+    （见 ProviderHealth.rank），备用数据源排在最后
+    """
+
+    def __init__(self, health: Optional[ProviderHealth] = None):
+        self.health = health
+        self._providers: Dict[str, Provider] = {}
+        self._lock = threading.Lock()
+
+    def register(self, provider: Provider) -> Provider:
+        """注册数据源，同名数据源会被替换"""
+        with self._lock:
+            providers = dict(self._providers)
+            providers[provider.name] = provider
+            self._providers = providers
+        return provider
+
+    def unregister(self, name: str):
+        with self._lock:
+            providers = dict(self._providers)
+            providers.pop(name, None)
+            self._providers = providers
+
+    def get(self, name: str) -> Optional[Provider]:
+        return self._providers.get(name)
+
+    def select(self, symbol_pair: Optional[str] = None, capability: str = 'one') -> List[Provider]:
+        """返回可以处理该请求的数据源，按调用顺序排列"""
+        candidates = sorted((provider for provider in self._providers.values()
+                             if provider.supports(symbol_pair, capability)),
+                            key=lambda provider: provider.priority)
+        primary = [provider for provider in candidates if not provider.fallback]
+        fallback = [provider for provider in candidates if provider.fallback]
+        if self.health is not None:
+            primary = [provider for _, provider in self.health.rank([(p.name, p) for p in primary])]
+        return primary + fallback
+
+    def stats(self) -> Dict[str, Any]:
+        """返回各数据源的能力声明"""
+        return {name: provider.describe() for name, provider in self._providers.items()}
@@ -0,0 +1,165 @@
+"""
+上游请求限流
+每个数据源一个令牌桶，按数据源声明的请求速率（见 provider_registry.Provider.rate_limit）补充令牌；
+配置Redis时令牌桶保存在Redis中，所有worker/副本共享同一个额度
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# 原子地补充并取出一个令牌；返回需要等待的秒数（0 表示已取得令牌）。
+# 使用Redis服务器时间，避免各副本之间的时钟偏差；返回字符串，避免Lua数值被截断为整数
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HMSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class TokenBucket:
+    """进程内令牌桶（线程安全）"""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._tokens = burst
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """尝试取出一个令牌，返回需要等待的秒数（0 表示已取得令牌，未取得时不消耗）"""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+class _ProviderStats:
+    __slots__ = ('granted', 'delayed', 'throttled', 'wait_seconds')
+
+    def __init__(self):
+        self.granted = 0
+        self.delayed = 0       # 排队等待后取得令牌
+        self.throttled = 0     # 截止时间内未取得令牌，未发出请求
+        self.wait_seconds = 0.0
+
+
+class RateLimiter:
+    """按数据源限流
+
+    - 令牌桶在首次请求时按传入的速率创建，突发容量为 burst_seconds 秒的额度（至少1个）
+    - acquire() 在 timeout 内排队等待令牌，超时返回 False，调用方改用下一个数据源
+    - 有Redis客户端时令牌桶保存在Redis中（Lua脚本保证原子性）；Redis出错时退化为进程内令牌桶，
+      客户端不支持脚本（如 memory:// 进程内替身）时直接使用进程内令牌桶
+    """
+
+    def __init__(self, redis_client=None, namespace: str = 'ratelimit', burst_seconds: float = 1.0):
+        self.namespace = namespace
+        self.burst_seconds = burst_seconds
+        self._script = None
+        if redis_client is not None and hasattr(redis_client, 'register_script'):
+            self._script = redis_client.register_script(_TOKEN_BUCKET_SCRIPT)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, _ProviderStats] = {}
+        self._lock = threading.Lock()
+
+        # Redis出错次数
+        self.backend_errors = 0
+
+    def _burst(self, rate: float) -> float:
+        return max(1.0, rate * self.burst_seconds)
+
+    def _bucket(self, name: str, rate: float) -> TokenBucket:
+        bucket = self._buckets.get(name)
+        if bucket is None or bucket.rate != rate:
+            with self._lock:
+                bucket = self._buckets.get(name)
+                if bucket is None or bucket.rate != rate:
+                    bucket = self._buckets[name] = TokenBucket(rate, self._burst(rate))
+        return bucket
+
+    def _provider_stats(self, name: str) -> _ProviderStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(name, _ProviderStats())
+        return stats
+
+    def try_acquire(self, name: str, rate: Optional[float]) -> float:
+        """尝试为数据源取出一个令牌，返回需要等待的秒数（0 表示已取得；rate 为 None 时不限流）"""
+        if not rate:
+            return 0.0
+        if self._script is not None:
+            try:
+                key = f"crypto:{self.namespace}:{name}"
+                return float(self._script(keys=[key], args=[rate, self._burst(rate)]))
+            except Exception:
+                self.backend_errors += 1
+        return self._bucket(name, rate).try_acquire()
+
+    def record(self, name: str, granted: bool, waited: float = 0.0):
+        """记录一次限流结果（供自行等待的调用方使用，如异步服务）"""
+        stats = self._provider_stats(name)
+        if granted:
+            stats.granted += 1
+            if waited > 0:
+                stats.delayed += 1
+        else:
+            stats.throttled += 1
+        stats.wait_seconds += waited
+
+    def acquire(self, name: str, rate: Optional[float], timeout: float = 0.0) -> bool:
+        """在 timeout 秒内取得令牌返回 True，否则返回 False（不发出请求）"""
+        if not rate:
+            return True
+        deadline = time.monotonic() + timeout
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(name, rate)
+            if wait <= 0:
+                self.record(name, True, waited)
+                return True
+            if time.monotonic() + wait > deadline:
+                # 截止时间前等不到令牌，不再排队
+                self.record(name, False, waited)
+                return False
+            time.sleep(wait)
+            waited += wait
+
+    def stats(self) -> Dict[str, Any]:
+        """返回各数据源的限流统计"""
+        with self._lock:
+            items = list(self._stats.items())
+        return {
+            'backend': 'redis' if self._script is not None else 'local',
+            'backend_errors': self.backend_errors,
+            'providers': {
+                name: {
+                    'granted': stats.granted,
+                    'delayed': stats.delayed,
+                    'throttled': stats.throttled,
+                    'wait_seconds': round(stats.wait_seconds, 3),
+                }
+                for name, stats in items
+            },
+        }
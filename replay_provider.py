@@ -0,0 +1,171 @@
+"""
+回放数据源
+从录制的行情（行情记录日志或交易所推送消息的fixture文件）中按回放时钟返回行情，
+接口与其他数据源相同，可以加入 get_crypto_data 的数据源列表，用于压测和离线开发
+"""
+
+import bisect
+import time
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from tick_journal import JournalRecord, TickJournalReader
+from ticker import Ticker
+
+# 解析一条录制消息：返回 {交易对: Ticker}
+ParseMessage = Callable[[str], Dict[str, Ticker]]
+
+Observation = Union[Ticker, JournalRecord]
+
+
+class ReplayProvider:
+    """按回放时钟返回录制行情的数据源
+
+    - 回放时间 = 录制开始时间 + 实际经过时间 × speed；speed <= 0 时固定返回每个交易对最后一条行情
+    - loop 为 True 时回放到结尾后从头开始，否则停在最后一条
+    - 查询返回回放时间点之前最近的一条行情，updated_at 为查询时间，字段与录制时完全一致
+    - latency 为每次查询固定的模拟延迟（秒），压测时得到确定的上游延迟
+    """
+
+    def __init__(self, observations: Iterable[Tuple[float, Observation]], name: str = 'Replay', speed: float = 1.0,
+                 loop: bool = True, latency: float = 0.0, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.speed = speed
+        self.loop = loop
+        self.latency = latency
+        self.clock = clock
+
+        self._times: Dict[str, array] = {}
+        self._entries: Dict[str, List[Observation]] = {}
+        records = 0
+        for timestamp, observation in sorted(observations, key=lambda item: item[0]):
+            symbol = observation.symbol
+            if symbol not in self._times:
+                self._times[symbol] = array('d')
+                self._entries[symbol] = []
+            self._times[symbol].append(timestamp)
+            self._entries[symbol].append(observation)
+            records += 1
+
+        self.records = records
+        self.start_time = min((times[0] for times in self._times.values()), default=0.0)
+        self.end_time = max((times[-1] for times in self._times.values()), default=0.0)
+        self._started = clock()
+        self._reader = None
+
+        # 统计计数器
+        self.requests = 0
+        self.misses = 0
+
+    @classmethod
+    def from_journal(cls, directory: str, symbols: Optional[Iterable[str]] = None, start: Optional[float] = None,
+                     end: Optional[float] = None, **kwargs) -> 'ReplayProvider':
+        """从行情记录日志加载，按观测时间回放；记录保持映射在内存中，查询命中时才解析"""
+        reader = TickJournalReader(directory)
+        if symbols:
+            records = (record for symbol in symbols for record in reader.read(symbol, start, end))
+        else:
+            records = reader.read(start=start, end=end)
+        provider = cls(((record.timestamp, record) for record in records), **kwargs)
+        provider._reader = reader
+        return provider
+
+    @classmethod
+    def from_messages(cls, path: str, parse_message: ParseMessage, **kwargs) -> 'ReplayProvider':
+        """从录制的交易所推送消息（每行一条，与 test/ws_replay_server.py 使用的格式相同）加载
+
+        按数据源自身的行情时间戳回放；解析失败的行（订阅确认、心跳等）跳过
+        """
+        observations = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                for ticker in parse_message(line).values():
+                    observations.append((ticker.source_time or ticker.updated_at, ticker))
+        return cls(observations, **kwargs)
+
+    def replay_time(self) -> float:
+        """当前回放到的录制时间（Unix秒）"""
+        duration = self.end_time - self.start_time
+        if self.speed <= 0 or duration <= 0:
+            return self.end_time
+        elapsed = (self.clock() - self._started) * self.speed
+        if self.loop:
+            elapsed %= duration
+        return self.start_time + min(elapsed, duration)
+
+    def reset(self):
+        """从录制开始时间重新回放"""
+        self._started = self.clock()
+
+    def _at(self, symbol_pair: str, replay_time: float) -> Optional[Ticker]:
+        times = self._times.get(symbol_pair)
+        if times is None:
+            return None
+        position = bisect.bisect_right(times, replay_time) - 1
+        if position < 0:
+            return None
+        observation = self._entries[symbol_pair][position]
+        ticker = observation.to_ticker() if isinstance(observation, JournalRecord) else observation
+        # 复制一份，获取时间改为当前时间，缓存和数据延迟按实时行情处理
+        fields = {slot: getattr(ticker, slot) for slot in Ticker.__slots__}
+        fields.update(updated_at=time.time(), source_time=None)
+        return Ticker(**fields)
+
+    def get(self, symbol_pair: str) -> Tuple[Optional[Ticker], Optional[str]]:
+        """单个交易对，接口与 get_crypto_data_okx 等数据源函数相同"""
+        if self.latency:
+            time.sleep(self.latency)
+        return self.lookup(symbol_pair)
+
+    def lookup(self, symbol_pair: str) -> Tuple[Optional[Ticker], Optional[str]]:
+        """与 get() 相同但不模拟延迟（异步服务自行等待）"""
+        self.requests += 1
+        ticker = self._at(symbol_pair, self.replay_time())
+        if ticker is None:
+            self.misses += 1
+            return None, f"{self.name}: 未找到交易对 {symbol_pair}"
+        return ticker, None
+
+    def get_many(self, symbol_pairs: List[str]) -> Tuple[Optional[Dict[str, Ticker]], Optional[str]]:
+        """多个交易对，返回 ({交易对: Ticker}, error)"""
+        if self.latency:
+            time.sleep(self.latency)
+        self.requests += 1
+        replay_time = self.replay_time()
+        results = {}
+        for symbol_pair in symbol_pairs:
+            ticker = self._at(symbol_pair, replay_time)
+            if ticker is not None:
+                results[symbol_pair] = ticker
+        if not results:
+            self.misses += 1
+            return None, f"{self.name}: 未找到交易对 {', '.join(symbol_pairs)}"
+        return results, None
+
+    def bulk(self) -> Tuple[Optional[Dict[str, Ticker]], Optional[str]]:
+        """全部交易对，接口与 get_bulk_tickers_okx 等批量加载函数相同"""
+        return self.get_many(list(self._times))
+
+    def stats(self) -> Dict[str, Any]:
+        """返回回放统计信息"""
+        return {
+            'name': self.name,
+            'records': self.records,
+            'symbols': len(self._times),
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'replay_time': self.replay_time(),
+            'speed': self.speed,
+            'loop': self.loop,
+            'latency': self.latency,
+            'requests': self.requests,
+            'misses': self.misses,
+        }
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
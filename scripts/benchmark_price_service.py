@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+价格服务压测脚本
+对运行中的价格服务发起并发请求，统计吞吐量与延迟分布，用于对比不同启动方式
+
+用法:
+    python scripts/benchmark_price_service.py --url http://localhost:5000/health --concurrency 32 --duration 10
+"""
+
+import argparse
+import threading
+import time
+
+import requests
+
+
+def run_benchmark(url, concurrency, duration):
+    """在指定时长内以固定并发数循环请求，返回统计结果"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        session = requests.Session()
+        local_latencies = []
+        local_errors = 0
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                response = session.get(url, timeout=30)
+                if response.status_code >= 500:
+                    local_errors += 1
+            except requests.RequestException:
+                local_errors += 1
+            local_latencies.append(time.monotonic() - started)
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="价格服务压测")
+    parser.add_argument('--url', default='http://localhost:5000/health', help="压测地址")
+    parser.add_argument('--concurrency', type=int, default=32, help="并发连接数")
+    parser.add_argument('--duration', type=float, default=10, help="压测时长（秒）")
+    args = parser.parse_args()
+
+    print(f"🔍 压测 {args.url}（并发 {args.concurrency}，持续 {args.duration:g} 秒）")
+    result = run_benchmark(args.url, args.concurrency, args.duration)
+    print(f"📊 请求数: {result['requests']}  错误: {result['errors']}")
+    print(f"⚡ 吞吐量: {result['rps']:.1f} req/s")
+    print(f"⏱️  延迟: p50 {result['p50_ms']:.1f}ms  p95 {result['p95_ms']:.1f}ms  p99 {result['p99_ms']:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
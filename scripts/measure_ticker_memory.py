@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+行情记录内存占用测量
+对比原先的结果字典、Ticker（__slots__）和列式行情表（MarketTable）中每条行情占用的内存
+
+用法:
+    python scripts/measure_ticker_memory.py --count 5000
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from market_table import MarketTable  # noqa: E402
+from price_service import _parse_binance_ticker, _parse_okx_ticker  # noqa: E402
+
+
+def make_raw_tickers(count):
+    """构造与批量行情接口相同格式的原始数据"""
+    rng = random.Random(42)
+    okx, binance = [], []
+    for i in range(count):
+        price = rng.uniform(0.001, 50000)
+        okx.append((f"COIN{i}/USDT", {
+            'last': str(price), 'open24h': str(price * rng.uniform(0.9, 1.1)),
+            'high24h': str(price * 1.1), 'low24h': str(price * 0.9), 'vol24h': str(rng.uniform(1, 1e6)),
+        }))
+        binance.append((f"COIN{i}/USDT", {
+            'lastPrice': str(price), 'priceChangePercent': str(rng.uniform(-10, 10)),
+            'highPrice': str(price * 1.1), 'lowPrice': str(price * 0.9), 'volume': str(rng.uniform(1, 1e6)),
+        }))
+    return okx, binance
+
+
+def build_table(tickers):
+    table = MarketTable()
+    table.update(tickers)
+    return table
+
+
+def measure(build):
+    """返回 build() 结果保持存活时新增的内存（字节）"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="行情记录内存占用测量")
+    parser.add_argument('--count', type=int, default=5000, help="每个数据源的交易对数量")
+    args = parser.parse_args()
+
+    okx, binance = make_raw_tickers(args.count)
+    for name, parse, raws in (("OKX", _parse_okx_ticker, okx), ("Binance", _parse_binance_ticker, binance)):
+        # 字典为原先的结果格式（格式化字段在解析时生成），与 to_dict() 的输出一致
+        dict_bytes = measure(lambda: [parse(pair, raw).to_dict() for pair, raw in raws])
+        ticker_bytes = measure(lambda: [parse(pair, raw) for pair, raw in raws])
+        # 快照中按交易对建立索引：{交易对: 结果} 字典 vs 列式行情表
+        index_bytes = measure(lambda: {pair: parse(pair, raw) for pair, raw in raws})
+        table_bytes = measure(lambda: build_table(parse(pair, raw) for pair, raw in raws))
+        per_dict = dict_bytes / len(raws)
+        per_ticker = ticker_bytes / len(raws)
+        per_index = index_bytes / len(raws)
+        per_row = table_bytes / len(raws)
+        print(f"📊 {name}（{len(raws)} 个交易对）: 字典 {per_dict:.0f} B/条，Ticker {per_ticker:.0f} B/条，"
+              f"节省 {1 - per_ticker / per_dict:.0%}")
+        print(f"   快照索引: {{交易对: Ticker}} {per_index:.0f} B/条，列式行情表 {per_row:.0f} B/条，"
+              f"节省 {1 - per_row / per_index:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+价格服务生产环境启动脚本
+使用Gunicorn多进程运行价格服务，替代 price_service.py 中 app.run 的单进程开发服务器
+
+用法:
+    python serve.py                                  # Flask模式，worker数量按CPU核数计算
+    python serve.py --mode async                     # 异步模式（Uvicorn worker）
+    python serve.py --workers 4 --threads 16 --bind 0.0.0.0:5000
+    kill -HUP <主进程PID>                             # 平滑重载：逐个替换worker，不中断正在处理的请求
+"""
+
+import argparse
+import os
+import sys
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+
+
+def main():
+    """解析命令行参数并以Gunicorn替换当前进程"""
+    parser = argparse.ArgumentParser(description="加密货币价格服务（生产环境多进程启动）")
+    parser.add_argument('--mode', choices=['flask', 'async'], help="服务模式，默认读取 SERVICE_MODE 或 flask")
+    parser.add_argument('--workers', type=int, help="worker进程数（WEB_CONCURRENCY）")
+    parser.add_argument('--threads', type=int, help="每个worker的线程数，仅flask模式（GUNICORN_THREADS）")
+    parser.add_argument('--bind', help="监听地址，如 0.0.0.0:5000（BIND）")
+    parser.add_argument('--no-preload', action='store_true', help="不预加载应用，HUP时重新加载代码")
+    parser.add_argument('--reload', action='store_true', help="代码变更时自动重载（仅用于开发）")
+    args = parser.parse_args()
+
+    # 命令行参数通过环境变量传给 gunicorn.conf.py
+    overrides = {
+        'SERVICE_MODE': args.mode,
+        'WEB_CONCURRENCY': args.workers,
+        'GUNICORN_THREADS': args.threads,
+        'BIND': args.bind,
+        'GUNICORN_PRELOAD': 'false' if args.no_preload or args.reload else None,
+    }
+    for key, value in overrides.items():
+        if value is not None:
+            os.environ[key] = str(value)
+
+    mode = os.environ.get('SERVICE_MODE', 'flask').lower()
+    app_path = 'price_service_async:app' if mode == 'async' else 'price_service:app'
+
+    command = [sys.executable, '-m', 'gunicorn', '-c', CONFIG_PATH, app_path]
+    if args.reload:
+        command.append('--reload')
+
+    print(f"🚀 以Gunicorn启动价格服务: {app_path}")
+    try:
+        os.execv(sys.executable, command)
+    except OSError as e:
+        print(f"❌ 启动失败: {e}（请确认已安装 gunicorn: pip install -r requirements.txt）")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -123,6 +123,594 @@ class AgentIntegrationTester:
             self.log_test("API端点查询", False, str(e))
             return False
     
+    def test_price_cache(self) -> bool:
+        """测试行情缓存是否生效"""
+        try:
+            before = requests.get(f"{self.api_base_url}/health", timeout=5).json().get('cache')
+            if not before:
+                self.log_test("行情缓存", False, "健康检查中缺少缓存统计")
+                return False
+            
+            # 连续两次查询同一交易对，第二次应命中缓存
+            requests.get(f"{self.api_base_url}/api/crypto/BTC", timeout=10)
+            requests.get(f"{self.api_base_url}/api/crypto/BTC", timeout=10)
+            
+            after = requests.get(f"{self.api_base_url}/health", timeout=5).json()['cache']
+            if after['hits'] > before['hits']:
+                self.log_test("行情缓存", True, f"命中 {after['hits']} 次，未命中 {after['misses']} 次")
+                return True
+            else:
+                self.log_test("行情缓存", False, "重复查询未命中缓存")
+                return False
+                
+        except Exception as e:
+            self.log_test("行情缓存", False, str(e))
+            return False
+    
+    def test_price_stream(self) -> bool:
+        """测试行情推送接口"""
+        try:
+            # 超过单连接订阅上限应被拒绝
+            too_many = ",".join(["BTC"] * 100)
+            response = requests.get(f"{self.api_base_url}/api/stream?symbols={too_many}", timeout=5)
+            if response.status_code != 400:
+                self.log_test("行情推送", False, f"超过订阅上限未被拒绝: HTTP {response.status_code}")
+                return False
+            
+            # 订阅后应在几个轮询周期内收到第一条价格事件
+            with requests.get(f"{self.api_base_url}/api/stream?symbols=BTC", stream=True, timeout=30) as response:
+                for line in response.iter_lines(decode_unicode=True):
+                    if line and line.startswith("data:"):
+                        data = json.loads(line[len("data:"):])
+                        self.log_test("行情推送", True, f"收到推送: {data.get('symbol')} ${data.get('price')}")
+                        return True
+            
+            self.log_test("行情推送", False, "连接关闭前未收到价格事件")
+            return False
+                
+        except Exception as e:
+            self.log_test("行情推送", False, str(e))
+            return False
+    
+    def test_market_screener(self) -> bool:
+        """测试全市场概览和筛选接口"""
+        try:
+            response = requests.get(f"{self.api_base_url}/api/market/overview", timeout=30)
+            if response.status_code != 200:
+                self.log_test("全市场筛选", False, f"概览接口 HTTP {response.status_code}: {response.text[:100]}")
+                return False
+            overview = response.json()
+            
+            response = requests.get(f"{self.api_base_url}/api/market/screener",
+                                    params={'min_change': 0, 'limit': 10}, timeout=10)
+            results = response.json().get('results', [])
+            changes = [item['change_24h'] for item in results]
+            if response.status_code == 200 and all(change >= 0 for change in changes) \
+                    and changes == sorted(changes, reverse=True):
+                self.log_test("全市场筛选", True,
+                              f"{overview['pairs']} 个交易对，上涨 {overview['gainers']} 个，筛选返回 {len(results)} 个")
+                return True
+            else:
+                self.log_test("全市场筛选", False, "筛选结果不符合条件或未按涨跌幅排序")
+                return False
+                
+        except Exception as e:
+            self.log_test("全市场筛选", False, str(e))
+            return False
+    
+    def test_market_movers(self) -> bool:
+        """测试全市场涨跌幅排行榜"""
+        try:
+            gainers = requests.get(f"{self.api_base_url}/api/market/movers",
+                                   params={'by': 'change', 'limit': 5}, timeout=30).json().get('results', [])
+            losers = requests.get(f"{self.api_base_url}/api/market/movers",
+                                  params={'by': 'change', 'order': 'asc', 'limit': 5}, timeout=10).json().get('results', [])
+            
+            gainer_changes = [item['change_24h'] for item in gainers]
+            loser_changes = [item['change_24h'] for item in losers]
+            # 交易对少于 2×limit 时两个榜单会重叠，只比较两端的第一名
+            if gainers and losers and gainer_changes == sorted(gainer_changes, reverse=True) \
+                    and loser_changes == sorted(loser_changes) and gainer_changes[0] >= loser_changes[0]:
+                self.log_test("涨跌幅排行", True,
+                              f"涨幅第一 {gainers[0]['symbol']} {gainers[0]['change_formatted']}，"
+                              f"跌幅第一 {losers[0]['symbol']} {losers[0]['change_formatted']}")
+                return True
+            else:
+                self.log_test("涨跌幅排行", False, "排行榜为空或未按涨跌幅排序")
+                return False
+                
+        except Exception as e:
+            self.log_test("涨跌幅排行", False, str(e))
+            return False
+    
+    def test_consensus_price(self) -> bool:
+        """测试多数据源共识价格"""
+        try:
+            response = requests.get(f"{self.api_base_url}/api/crypto/BTC", params={'mode': 'consensus'}, timeout=30)
+            if response.status_code != 200:
+                self.log_test("共识价格", False, f"HTTP {response.status_code}: {response.text[:100]}")
+                return False
+            
+            data = response.json()
+            consensus = data.get('consensus', {})
+            if data.get('source') == 'Consensus' and consensus.get('sources_used', 0) >= 1 and data.get('price', 0) > 0:
+                self.log_test("共识价格", True,
+                              f"{data['price_formatted']}，{consensus['sources_used']} 个数据源，价差 {consensus['spread_pct']}%")
+                return True
+            else:
+                self.log_test("共识价格", False, "响应中缺少共识信息")
+                return False
+                
+        except Exception as e:
+            self.log_test("共识价格", False, str(e))
+            return False
+    
+    def test_candles(self) -> bool:
+        """测试K线查询（重复查询应由本地存储返回）"""
+        try:
+            params = {'interval': '1h', 'limit': 24}
+            first = requests.get(f"{self.api_base_url}/api/crypto/BTC/candles", params=params, timeout=30)
+            if first.status_code != 200:
+                self.log_test("K线查询", False, f"HTTP {first.status_code}: {first.text[:100]}")
+                return False
+            
+            before = requests.get(f"{self.api_base_url}/health", timeout=10).json().get('candles', {})
+            second = requests.get(f"{self.api_base_url}/api/crypto/BTC/candles", params=params, timeout=30).json()
+            after = requests.get(f"{self.api_base_url}/health", timeout=10).json().get('candles', {})
+            
+            candles = second.get('candles', [])
+            served_locally = after.get('gap_fetches') == before.get('gap_fetches')
+            if candles and all(candle['high'] >= candle['low'] for candle in candles) and served_locally:
+                self.log_test("K线查询", True, f"{len(candles)} 根小时线，区间涨跌幅 {second['change_pct']}%，重复查询未访问上游")
+                return True
+            else:
+                self.log_test("K线查询", False, f"返回 {len(candles)} 根K线，重复查询是否走本地: {served_locally}")
+                return False
+        
+        except Exception as e:
+            self.log_test("K线查询", False, str(e))
+            return False
+    
+    def test_tick_journal(self) -> bool:
+        """测试行情记录日志的写入与按交易对/时间范围读取"""
+        try:
+            import tempfile
+            from tick_journal import TickJournal, TickJournalReader
+            from ticker import Ticker
+            
+            directory = tempfile.mkdtemp()
+            journal = TickJournal(directory, segment_records=100)
+            journal.start()
+            started = time.time()
+            for i in range(500):
+                journal.append(Ticker(symbol='BTC/USDT' if i % 2 else 'ETH/USDT', name='BTC', price=100.0 + i,
+                                      change_24h=0.0, quote_currency='USDT', high_24h=0.0, low_24h=0.0,
+                                      source='OKX', volume=1.0, updated_at=started + i))
+            journal.stop()
+            
+            with TickJournalReader(directory) as reader:
+                prices = [record.to_ticker().price for record in reader.read('BTC/USDT', started + 100, started + 199)]
+            
+            expected = [100.0 + i for i in range(101, 200, 2)]
+            if prices == expected and journal.stats()['segments'] == 5:
+                self.log_test("行情记录日志", True, f"写入500条（5个分段），按时间范围读取到 {len(prices)} 条")
+                return True
+            else:
+                self.log_test("行情记录日志", False, f"读取到 {len(prices)} 条，与写入的不一致")
+                return False
+        
+        except Exception as e:
+            self.log_test("行情记录日志", False, str(e))
+            return False
+    
+    def test_replay_provider(self) -> bool:
+        """测试回放数据源（回放录制的OKX推送消息，不访问交易所）"""
+        try:
+            from price_service import _parse_recorded_message
+            from replay_provider import ReplayProvider
+            
+            fixture = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'okx_tickers.jsonl')
+            clock = [0.0]
+            provider = ReplayProvider.from_messages(fixture, _parse_recorded_message, speed=1, loop=False,
+                                                    clock=lambda: clock[0])
+            first, _ = provider.get('BTC/USDT')
+            clock[0] = provider.end_time - provider.start_time
+            last, _ = provider.get('BTC/USDT')
+            missing, error = provider.get('NOPE/USDT')
+            
+            if first and last and first.price != last.price and missing is None and "未找到" in error:
+                self.log_test("回放数据源", True, f"{provider.records} 条录制行情，BTC {first.price} -> {last.price}")
+                return True
+            else:
+                self.log_test("回放数据源", False, "回放结果与录制数据不一致")
+                return False
+        
+        except Exception as e:
+            self.log_test("回放数据源", False, str(e))
+            return False
+    
+    def test_provider_registry(self) -> bool:
+        """测试数据源注册表（按能力、报价货币、优先级和健康评分选择数据源）"""
+        try:
+            from provider_health import ProviderHealth
+            from provider_registry import Provider, ProviderRegistry
+            
+            fetch = lambda symbol_pair: (None, "未找到")
+            registry = ProviderRegistry(ProviderHealth(min_requests=3))
+            registry.register(Provider('A', fetch_one=fetch, bulk=lambda: ({}, None), priority=10))
+            registry.register(Provider('B', fetch_one=fetch, priority=20))
+            registry.register(Provider('C', fetch_one=fetch, fetch_many=fetch, quotes=('USD',), priority=30))
+            registry.register(Provider('Replay', fetch_one=fetch, priority=1, fallback=True, live=False))
+            
+            by_priority = [p.name for p in registry.select('BTC/USD')]
+            usdc_only = [p.name for p in registry.select('BTC/USDC')]
+            # A 持续失败、B 正常，健康排序后 B 排到 A 前面，备用数据源始终在最后
+            for _ in range(3):
+                registry.health.breaker('A').record(False, 2.0)
+                registry.health.breaker('B').record(True, 0.1)
+            by_health = [p.name for p in registry.select('BTC/USD')]
+            bulk = [p.name for p in registry.select(capability='bulk')]
+            
+            if (by_priority == ['A', 'B', 'C', 'Replay'] and usdc_only == ['A', 'B', 'Replay']
+                    and by_health == ['B', 'A', 'C', 'Replay'] and bulk == ['A']):
+                self.log_test("数据源注册表", True, f"健康排序后: {' -> '.join(by_health)}")
+                return True
+            else:
+                self.log_test("数据源注册表", False, f"选择结果不符合预期: {by_priority} / {usdc_only} / {by_health} / {bulk}")
+                return False
+        
+        except Exception as e:
+            self.log_test("数据源注册表", False, str(e))
+            return False
+    
+    def test_rate_limiter(self) -> bool:
+        """测试上游限流（令牌桶额度用完后跳过请求，排队等待时按速率放行）"""
+        try:
+            from rate_limiter import RateLimiter
+            
+            limiter = RateLimiter(burst_seconds=1)
+            immediate = sum(limiter.acquire('CoinGecko', 5) for _ in range(20))
+            started = time.time()
+            queued = sum(limiter.acquire('OKX', 20, timeout=2) for _ in range(30))
+            elapsed = time.time() - started
+            stats = limiter.stats()['providers']
+            
+            if immediate == 5 and stats['CoinGecko']['throttled'] == 15 and queued == 30 and elapsed >= 0.4:
+                self.log_test("上游限流", True, f"额度5次时放行5次、跳过15次；排队30次耗时 {elapsed:.2f}秒")
+                return True
+            else:
+                self.log_test("上游限流", False, f"放行 {immediate} 次，排队放行 {queued} 次，耗时 {elapsed:.2f}秒")
+                return False
+        
+        except Exception as e:
+            self.log_test("上游限流", False, str(e))
+            return False
+    
+    def test_shared_cache(self) -> bool:
+        """测试两级共享缓存（使用进程内Redis替身模拟多个副本）"""
+        try:
+            import threading
+            from price_cache import InProcessRedis, TieredTickerCache
+            
+            redis_client = InProcessRedis()
+            replicas = [TieredTickerCache(redis_client, ttl=5, namespace='test') for _ in range(3)]
+            upstream_calls = []
+            
+            def loader():
+                upstream_calls.append(1)
+                time.sleep(0.2)
+                return {'symbol': 'BTC/USDT', 'price': 1.0}, None
+            
+            # 多个副本同时未命中同一交易对，只应请求一次上游
+            threads = [threading.Thread(target=replica.get_or_load, args=('BTC/USDT', loader))
+                       for replica in replicas for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            
+            if len(upstream_calls) == 1:
+                self.log_test("共享缓存", True, "3个副本并发未命中只请求了1次上游")
+                return True
+            else:
+                self.log_test("共享缓存", False, f"请求了 {len(upstream_calls)} 次上游")
+                return False
+                
+        except Exception as e:
+            self.log_test("共享缓存", False, str(e))
+            return False
+    
+    def test_stale_while_revalidate(self) -> bool:
+        """测试缓存软过期后立即返回旧数据并在后台刷新"""
+        try:
+            from concurrent.futures import ThreadPoolExecutor
+            from price_cache import TickerCache
+            
+            cache = TickerCache(ttl=1, stale_ttl=5)
+            executor = ThreadPoolExecutor(max_workers=1)
+            versions = []
+            
+            def loader():
+                versions.append(len(versions) + 1)
+                time.sleep(0.3)
+                return {'symbol': 'BTC/USDT', 'price': versions[-1]}, None
+            
+            cache.get_or_revalidate('BTC/USDT', loader, executor)
+            time.sleep(1.2)
+            started = time.time()
+            stale, _, age, is_stale = cache.get_or_revalidate('BTC/USDT', loader, executor)
+            elapsed = time.time() - started
+            # 等待后台刷新完成后再读取（不再传入 executor，软过期时会同步加载并被计入上游调用次数）
+            executor.shutdown(wait=True)
+            fresh, _, _, fresh_is_stale = cache.get_or_revalidate('BTC/USDT', loader)
+            
+            if (is_stale and stale['price'] == 1 and elapsed < 0.1 and age >= 1
+                    and fresh['price'] == 2 and not fresh_is_stale and len(versions) == 2):
+                self.log_test("缓存后台刷新", True, f"旧数据 {elapsed * 1000:.1f}ms 返回（age {age:.2f}秒），后台刷新后返回新数据")
+                return True
+            else:
+                self.log_test("缓存后台刷新", False, f"返回 {stale}（stale={is_stale}），刷新后 {fresh}，上游调用 {len(versions)} 次")
+                return False
+        
+        except Exception as e:
+            self.log_test("缓存后台刷新", False, str(e))
+            return False
+    
+    def test_upstream_errors(self) -> bool:
+        """测试上游限流/5xx不会被当作"交易对不存在"写入负缓存，只有交易所确认不存在才写入"""
+        try:
+            import price_service
+            
+            class FakeResponse:
+                def __init__(self, status_code, body):
+                    self.status_code = status_code
+                    self.body = body
+                
+                def json(self):
+                    return self.body
+            
+            class FakeSession:
+                def __init__(self, response):
+                    self.response = response
+                
+                def get(self, url, params=None, timeout=None):
+                    return self.response
+            
+            def summarize(symbol_pair, okx_response, binance_response):
+                sessions = {'OKX': FakeSession(okx_response), 'Binance': FakeSession(binance_response)}
+                original = price_service.provider_sessions.get
+                price_service.provider_sessions.get = sessions.get
+                try:
+                    failures = [price_service._call_source('OKX', price_service.get_crypto_data_okx, symbol_pair)[1],
+                                price_service._call_source('Binance', price_service.get_crypto_data_binance, symbol_pair)[1]]
+                finally:
+                    price_service.provider_sessions.get = original
+                price_service._summarize_failures(symbol_pair, failures)
+                return [not_found for _, _, not_found in failures], price_service.negative_cache.get(symbol_pair)
+            
+            busy = summarize('ERRTEST/USDT', FakeResponse(503, {'code': '50001', 'msg': 'Service temporarily unavailable'}),
+                             FakeResponse(429, {'code': -1003, 'msg': 'Too many requests'}))
+            unknown = summarize('NOTEXIST/USDT', FakeResponse(200, {'code': '51001', 'msg': 'Instrument ID does not exist'}),
+                                FakeResponse(400, {'code': -1121, 'msg': 'Invalid symbol.'}))
+            
+            if busy == ([False, False], None) and unknown[0] == [True, True] and unknown[1]:
+                self.log_test("上游错误分类", True, "503/429 未写入负缓存，51001/-1121 写入负缓存")
+                return True
+            else:
+                self.log_test("上游错误分类", False, f"503/429: {busy}，交易对不存在: {unknown}")
+                return False
+        
+        except Exception as e:
+            self.log_test("上游错误分类", False, str(e))
+            return False
+    
+    def test_circuit_breaker(self) -> bool:
+        """测试上游返回5xx时熔断器打开，冷却后半开探测成功即恢复"""
+        try:
+            import price_service
+            
+            class FakeResponse:
+                def __init__(self, status_code, body):
+                    self.status_code = status_code
+                    self.body = body
+                
+                def json(self):
+                    return self.body
+            
+            ticker = {'last': '43250.1', 'open24h': '42800', 'high24h': '43500', 'low24h': '42600', 'vol24h': '12345.6'}
+            responses = {'next': FakeResponse(503, {'code': '50001', 'msg': 'Service temporarily unavailable'})}
+            upstream_calls = []
+            
+            class FakeSession:
+                def get(self, url, params=None, timeout=None):
+                    upstream_calls.append(url)
+                    return responses['next']
+            
+            breaker = price_service.provider_health.breaker('BreakerTest')
+            breaker.cooldown = 0.2
+            original = price_service.provider_sessions.get
+            price_service.provider_sessions.get = lambda provider: FakeSession()
+            try:
+                def call():
+                    return price_service._call_source('BreakerTest', price_service.get_crypto_data_okx, 'BTC/USDT')
+                
+                for _ in range(breaker.min_requests):
+                    call()
+                opened = breaker.state
+                calls_before_skip = len(upstream_calls)
+                call()
+                skipped = len(upstream_calls) == calls_before_skip
+                
+                time.sleep(0.3)
+                responses['next'] = FakeResponse(200, {'code': '0', 'data': [ticker]})
+                data, _ = call()
+                recovered = breaker.state
+            finally:
+                price_service.provider_sessions.get = original
+            
+            if opened == 'open' and skipped and data and data.price == 43250.1 and recovered == 'closed':
+                self.log_test("数据源熔断", True, f"连续 {breaker.min_requests} 次503后熔断，冷却后探测成功恢复")
+                return True
+            else:
+                self.log_test("数据源熔断", False, f"熔断状态 {opened}，熔断期间跳过 {skipped}，恢复后状态 {recovered}")
+                return False
+        
+        except Exception as e:
+            self.log_test("数据源熔断", False, str(e))
+            return False
+    
+    def test_batch_deadline(self) -> bool:
+        """测试批量查询：慢数据源在整批截止时间到达时单独返回超时，结果按请求顺序返回"""
+        try:
+            import price_service
+            
+            def fake_cached(symbol_pair, strategy=None):
+                if symbol_pair == 'SLOW/USDT':
+                    time.sleep(1.5)
+                return {'symbol': symbol_pair, 'price': 1.0}, None
+            
+            symbols = ['ETH', 'OKX', 'SLOW', 'BTC', 'binance']
+            patched = {'get_cached_crypto_data': fake_cached, 'BATCH_TIMEOUT': 0.5, 'SNAPSHOT_ENABLED': False}
+            originals = {name: getattr(price_service, name) for name in patched}
+            for name, value in patched.items():
+                setattr(price_service, name, value)
+            try:
+                started = time.time()
+                response = price_service.app.test_client().post('/api/crypto/batch', json={'symbols': symbols})
+                elapsed = time.time() - started
+            finally:
+                for name, value in originals.items():
+                    setattr(price_service, name, value)
+            
+            results = json.loads(response.get_data(as_text=True))
+            if (list(results) == symbols and elapsed < 1.0
+                    and results['ETH']['price'] == 1.0 and results['BTC']['price'] == 1.0
+                    and "不是有效" in results['OKX']['error'] and "不是有效" in results['binance']['error']
+                    and "超时" in results['SLOW']['error']):
+                self.log_test("批量查询截止时间", True, f"{elapsed:.2f}秒返回，慢数据源单独超时，结果保持请求顺序")
+                return True
+            else:
+                self.log_test("批量查询截止时间", False, f"{elapsed:.2f}秒返回: {results}")
+                return False
+        
+        except Exception as e:
+            self.log_test("批量查询截止时间", False, str(e))
+            return False
+    
+    def test_hedged_fetch(self) -> bool:
+        """测试对冲请求：首选数据源超过对冲延迟未返回时，采用后启动的数据源的结果"""
+        try:
+            import price_service
+            from provider_registry import Provider
+            
+            def slow(symbol_pair):
+                time.sleep(1.0)
+                return {'symbol': symbol_pair, 'price': 1.0, 'source': 'HedgeSlow'}, None
+            
+            def fast(symbol_pair):
+                return {'symbol': symbol_pair, 'price': 2.0, 'source': 'HedgeFast'}, None
+            
+            providers = [Provider('HedgeSlow', fetch_one=slow, expected_latency=0.05),
+                         Provider('HedgeFast', fetch_one=fast, expected_latency=0.05)]
+            started = time.time()
+            data, failures = price_service._fetch_hedged('BTC/USDT', providers)
+            elapsed = time.time() - started
+            
+            if data and data['source'] == 'HedgeFast' and not failures and elapsed < 0.5:
+                self.log_test("对冲请求", True, f"首选数据源未返回，{elapsed * 1000:.0f}ms 后采用对冲请求的结果")
+                return True
+            else:
+                self.log_test("对冲请求", False, f"{elapsed:.2f}秒返回 {data}，失败 {failures}")
+                return False
+        
+        except Exception as e:
+            self.log_test("对冲请求", False, str(e))
+            return False
+    
+    def test_async_service(self) -> bool:
+        """测试异步服务的接口（Starlette TestClient，上游请求使用替身）"""
+        try:
+            from starlette.testclient import TestClient
+            import price_service_async
+            from ticker import Ticker
+            
+            async def fake_fetch(symbol_pair, strategy=None):
+                if symbol_pair == 'ASYNCNONE/USDT':
+                    return None, "没有找到 'ASYNCNONE'"
+                return Ticker(symbol_pair, symbol_pair.split('/')[0], 3.0, 1.5, 'USDT', 3.1, 2.9, 'Fake'), None
+            
+            original = price_service_async.get_crypto_data
+            price_service_async.get_crypto_data = fake_fetch
+            try:
+                client = TestClient(price_service_async.app)
+                health = client.get('/health')
+                single = client.get('/api/crypto/ASYNCONE')
+                missing = client.get('/api/crypto/ASYNCNONE')
+                batch = client.post('/api/crypto/batch', json={'symbols': ['ASYNCTWO', 'OKX', 'ASYNCONE']})
+            finally:
+                price_service_async.get_crypto_data = original
+            
+            results = batch.json()
+            if (health.status_code == 200 and health.json().get('mode') == 'async'
+                    and single.status_code == 200 and single.json()['price'] == 3.0 and 'age' in single.json()
+                    and missing.status_code == 400
+                    and list(results) == ['ASYNCTWO', 'OKX', 'ASYNCONE']
+                    and results['ASYNCTWO']['price'] == 3.0 and 'error' in results['OKX']):
+                self.log_test("异步服务", True, "/health、单个查询、批量查询均正常")
+                return True
+            else:
+                self.log_test("异步服务", False,
+                              f"health {health.status_code}，单个 {single.json()}，未找到 {missing.status_code}，批量 {results}")
+                return False
+        
+        except Exception as e:
+            self.log_test("异步服务", False, str(e))
+            return False
+    
+    def test_exchange_feed(self) -> bool:
+        """测试交易所行情订阅（本地回放录制的OKX推送消息）"""
+        try:
+            from exchange_feed import ExchangeFeed
+            from price_service import _okx_feed_subscribe, _parse_okx_feed_message
+            from ws_replay_server import ReplayServer, load_messages
+            
+            fixture = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'okx_tickers.jsonl')
+            server = ReplayServer(load_messages(fixture), interval=0.05).start()
+            feed = ExchangeFeed('OKX', server.url, _okx_feed_subscribe, _parse_okx_feed_message,
+                                ['BTC/USDT', 'ETH/USDT'], stale_after=1.0, ping_interval=0.3,
+                                ping_message='ping', reconnect_delay=0.1)
+            feed.start()
+            try:
+                time.sleep(0.5)
+                entry = feed.get('BTC/USDT')
+                if entry is None or entry[0]['source'] != 'OKX':
+                    self.log_test("交易所行情订阅", False, "未收到回放的行情数据")
+                    return False
+                
+                # 断线后应自动重连并重新订阅
+                server.drop_connections()
+                time.sleep(1.0)
+                if len(server.received) < 2 or feed.get('ETH/USDT') is None:
+                    self.log_test("交易所行情订阅", False, f"断线后未重新订阅: {feed.stats()['last_error']}")
+                    return False
+                
+                # 连接还在但没有行情推送时，数据应判定为过期并触发重连
+                server.paused.set()
+                time.sleep(2.0)
+                if feed.get('BTC/USDT') is not None or feed.stats()['stale_reconnects'] == 0:
+                    self.log_test("交易所行情订阅", False, "停止推送后未判定数据过期")
+                    return False
+                
+                self.log_test("交易所行情订阅", True, f"重连 {feed.stats()['reconnects']} 次，订阅消息 {len(server.received)} 条")
+                return True
+            finally:
+                feed.stop()
+                server.stop()
+                
+        except Exception as e:
+            self.log_test("交易所行情订阅", False, str(e))
+            return False
+    
     def test_mcp_server(self) -> bool:
         """测试MCP服务器"""
         try:
@@ -251,6 +839,24 @@ class AgentIntegrationTester:
             ("价格服务", self.test_price_service),
             ("基础Agent功能", self.test_crypto_agent),
             ("API端点", self.test_api_endpoints),
+            ("行情缓存", self.test_price_cache),
+            ("共享缓存", self.test_shared_cache),
+            ("缓存后台刷新", self.test_stale_while_revalidate),
+            ("全市场筛选", self.test_market_screener),
+            ("涨跌幅排行", self.test_market_movers),
+            ("共识价格", self.test_consensus_price),
+            ("K线查询", self.test_candles),
+            ("行情推送", self.test_price_stream),
+            ("交易所行情订阅", self.test_exchange_feed),
+            ("行情记录日志", self.test_tick_journal),
+            ("回放数据源", self.test_replay_provider),
+            ("数据源注册表", self.test_provider_registry),
+            ("上游限流", self.test_rate_limiter),
+            ("上游错误分类", self.test_upstream_errors),
+            ("数据源熔断", self.test_circuit_breaker),
+            ("批量查询截止时间", self.test_batch_deadline),
+            ("对冲请求", self.test_hedged_fetch),
+            ("异步服务", self.test_async_service),
             ("自然语言处理", self.test_natural_language),
             ("MCP服务器", self.test_mcp_server),
             ("集成功能", self.test_integrations),
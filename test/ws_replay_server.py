@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+WebSocket行情回放服务器
+按固定间隔向客户端推送录制好的交易所消息（每行一条原始消息），用于在本地测试交易所行情订阅：
+断线重连、重新订阅、数据过期等场景都可以在不访问交易所的情况下复现。只依赖标准库。
+
+用法:
+    python test/ws_replay_server.py --file test/fixtures/okx_tickers.jsonl --port 8765
+    WS_FEED_ENABLED=true WS_FEED_PROVIDERS=OKX WS_FEED_OKX_URL=ws://localhost:8765 python price_service.py
+"""
+
+import argparse
+import base64
+import hashlib
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+
+def _send_frame(sock, payload, opcode=OPCODE_TEXT):
+    """发送一个未分片、不加掩码的服务端帧"""
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 65536:
+        header += bytes([126]) + struct.pack('!H', length)
+    else:
+        header += bytes([127]) + struct.pack('!Q', length)
+    sock.sendall(header + payload)
+
+
+def _recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("客户端已断开")
+        data += chunk
+    return data
+
+
+def _recv_frame(sock):
+    """读取一个客户端帧，返回 (opcode, payload)"""
+    first, second = _recv_exact(sock, 2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', _recv_exact(sock, 2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', _recv_exact(sock, 8))[0]
+    mask = _recv_exact(sock, 4) if second & 0x80 else b'\x00\x00\x00\x00'
+    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(_recv_exact(sock, length)))
+    return first & 0x0F, payload
+
+
+class _ReplayHandler(socketserver.BaseRequestHandler):
+    """单个客户端连接：握手后等待第一条订阅消息，然后开始回放"""
+
+    def handle(self):
+        server = self.server
+        sock = self.request
+        if not self._handshake(sock):
+            return
+
+        subscribed = threading.Event()
+        with server.lock:
+            server.connections.append(sock)
+        sender = threading.Thread(target=self._replay, args=(sock, subscribed), daemon=True)
+        sender.start()
+
+        try:
+            while True:
+                opcode, payload = _recv_frame(sock)
+                if opcode == OPCODE_CLOSE:
+                    break
+                if opcode == OPCODE_PING:
+                    with server.send_lock:
+                        _send_frame(sock, payload, OPCODE_PONG)
+                    continue
+                if opcode != OPCODE_TEXT:
+                    continue
+
+                message = payload.decode('utf-8')
+                if message == 'ping':
+                    with server.send_lock:
+                        _send_frame(sock, b'pong')
+                    continue
+                with server.lock:
+                    server.received.append(message)
+                subscribed.set()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with server.lock:
+                if sock in server.connections:
+                    server.connections.remove(sock)
+            subscribed.set()
+
+    def _handshake(self, sock):
+        request = b''
+        while b'\r\n\r\n' not in request:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return False
+            request += chunk
+
+        headers = {}
+        for line in request.decode('latin-1').split('\r\n')[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        key = headers.get('sec-websocket-key')
+        if not key:
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        sock.sendall((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        return True
+
+    def _replay(self, sock, subscribed):
+        server = self.server
+        subscribed.wait()
+        index = 0
+        while index < len(server.messages) or server.loop:
+            if server.paused.is_set():
+                time.sleep(server.interval)
+                continue
+            message = server.messages[index % len(server.messages)]
+            try:
+                with server.send_lock:
+                    _send_frame(sock, message.encode('utf-8'))
+            except OSError:
+                return
+            index += 1
+            time.sleep(server.interval)
+
+
+class ReplayServer(socketserver.ThreadingTCPServer):
+    """回放服务器，测试中可以在后台线程运行
+
+    - received: 收到的客户端消息（订阅消息），用于检查重连后是否重新订阅
+    - drop_connections(): 断开所有客户端，模拟交易所断线
+    - paused: 设置后停止推送但保持连接，模拟连接假死
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, messages, host='127.0.0.1', port=0, interval=0.1, loop=True):
+        super().__init__((host, port), _ReplayHandler)
+        self.messages = [message for message in messages if message.strip()]
+        self.interval = interval
+        self.loop = loop
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.paused = threading.Event()
+        self.connections = []
+        self.received = []
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"ws://{host}:{port}"
+
+    def start(self):
+        """在后台线程中运行"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def drop_connections(self):
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for sock in connections:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+                sock.close()
+            except OSError:
+                pass
+
+    def stop(self):
+        self.drop_connections()
+        self.shutdown()
+        self.server_close()
+
+
+def load_messages(path):
+    """读取录制文件，每行一条原始消息"""
+    with open(path, encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket行情回放服务器")
+    parser.add_argument('--file', required=True, help="录制的消息文件（每行一条）")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址")
+    parser.add_argument('--port', type=int, default=8765, help="监听端口")
+    parser.add_argument('--interval', type=float, default=0.5, help="消息间隔（秒）")
+    parser.add_argument('--once', action='store_true', help="只回放一遍，不循环")
+    args = parser.parse_args()
+
+    server = ReplayServer(load_messages(args.file), host=args.host, port=args.port,
+                          interval=args.interval, loop=not args.once)
+    print(f"📼 回放 {args.file}（{len(server.messages)} 条消息）: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
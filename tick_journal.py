@@ -0,0 +1,393 @@
+"""
+行情记录日志（tick journal）
+把数据源返回的每一条行情按固定长度的二进制记录追加写入分段文件，用于回放某个交易日和回测：
+- 每个分段文件预分配固定容量并内存映射（mmap），写满后封存并生成时间索引，再新建下一个分段
+- 请求线程只把行情放入队列，由后台线程批量写入并统一刷盘（group commit），不阻塞请求处理
+- 读取时按交易对和时间范围定位，记录直接从映射内存中按需解析，不复制数据
+"""
+
+import heapq
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ticker import Ticker, split_symbol_pair
+
+# 分段文件头：魔数、记录长度、容量（记录数）、已提交记录数
+HEADER = struct.Struct('<8sIIQ')
+HEADER_SIZE = 64
+MAGIC = b'TICKJ001'
+
+# 行情记录：观测时间、数据源时间、交易对、数据源、价格、24h涨跌幅、最高、最低、成交量、市值（缺失为NaN）
+RECORD = struct.Struct('<dd20s12sdddddd')
+SYMBOL_OFFSET = 16
+SYMBOL_SIZE = 20
+
+# 时间索引的块大小：每块记录数，索引保存每块的最小/最大观测时间
+INDEX_BLOCK = 256
+
+NAN = float('nan')
+
+
+def _encode(text: str, size: int) -> bytes:
+    return text.encode('utf-8')[:size].ljust(size, b'\0')
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if value != value else value  # NaN 表示缺失
+
+
+class JournalRecord:
+    """映射内存中的一条记录（不复制数据，读取字段时才解析）
+
+    记录只在读取器打开期间有效，需要长期保存时使用 to_ticker()
+    """
+
+    __slots__ = ('_buf', '_offset')
+
+    def __init__(self, buf: memoryview, offset: int):
+        self._buf = buf
+        self._offset = offset
+
+    @property
+    def timestamp(self) -> float:
+        return struct.unpack_from('<d', self._buf, self._offset)[0]
+
+    @property
+    def symbol(self) -> str:
+        raw = self._buf[self._offset + SYMBOL_OFFSET:self._offset + SYMBOL_OFFSET + SYMBOL_SIZE]
+        return bytes(raw).rstrip(b'\0').decode('utf-8')
+
+    def unpack(self) -> tuple:
+        return RECORD.unpack_from(self._buf, self._offset)
+
+    def to_ticker(self) -> Ticker:
+        (timestamp, source_time, symbol, source, price, change_24h, high_24h, low_24h,
+         volume, market_cap) = self.unpack()
+        symbol = symbol.rstrip(b'\0').decode('utf-8')
+        base_symbol, quote_symbol = split_symbol_pair(symbol)
+        return Ticker(
+            symbol=symbol,
+            name=base_symbol,
+            price=price,
+            change_24h=change_24h,
+            quote_currency=quote_symbol,
+            high_24h=high_24h,
+            low_24h=low_24h,
+            volume=_optional(volume),
+            market_cap=_optional(market_cap),
+            source=source.rstrip(b'\0').decode('utf-8'),
+            updated_at=timestamp,
+            source_time=_optional(source_time)
+        )
+
+    def __repr__(self) -> str:
+        return f"JournalRecord({self.symbol} {self.timestamp})"
+
+
+class _Segment:
+    """单个分段文件（写入端）"""
+
+    def __init__(self, path: str, capacity: int):
+        self.path = path
+        self.capacity = capacity
+        self.count = 0
+        self.index = array('d')  # 每块的 (最小时间, 最大时间)
+        # 独占创建：同名分段已存在时报错，不会截断已记录的行情
+        with open(path, 'x+b') as f:
+            f.truncate(HEADER_SIZE + capacity * RECORD.size)
+            self.mm = mmap.mmap(f.fileno(), 0)
+        self._write_header()
+
+    def _write_header(self):
+        HEADER.pack_into(self.mm, 0, MAGIC, RECORD.size, self.capacity, self.count)
+
+    def append(self, ticker: Ticker):
+        timestamp = ticker.updated_at
+        RECORD.pack_into(
+            self.mm, HEADER_SIZE + self.count * RECORD.size,
+            timestamp,
+            ticker.source_time if ticker.source_time is not None else NAN,
+            _encode(ticker.symbol, SYMBOL_SIZE),
+            _encode(ticker.source, 12),
+            ticker.price, ticker.change_24h, ticker.high_24h, ticker.low_24h,
+            ticker.volume if ticker.volume is not None else NAN,
+            ticker.market_cap if ticker.market_cap is not None else NAN
+        )
+        if self.count % INDEX_BLOCK == 0:
+            self.index.extend((timestamp, timestamp))
+        else:
+            self.index[-2] = min(self.index[-2], timestamp)
+            self.index[-1] = max(self.index[-1], timestamp)
+        self.count += 1
+
+    def commit(self, sync: bool):
+        # 先写入记录再更新记录数，读取方只会看到完整的记录
+        self._write_header()
+        if sync:
+            self.mm.flush()
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def seal(self):
+        """封存：写入时间索引文件并关闭映射"""
+        self.commit(sync=True)
+        with open(self.path + '.idx', 'wb') as f:
+            self.index.tofile(f)
+        self.mm.close()
+
+
+class TickJournal:
+    """行情记录日志（写入端）
+
+    - append() 只把行情放入队列，队列已满时丢弃并计数，不阻塞调用方
+    - 后台线程每 commit_interval 秒（或攒够 batch_size 条）批量写入一次，写入后刷盘
+    - 每个进程写入自己的分段文件（文件名带进程号），多个worker可以共用同一个目录
+    """
+
+    def __init__(self, directory: str, segment_records: int = 65536, commit_interval: float = 0.05,
+                 batch_size: int = 4096, max_pending: int = 100000, sync: bool = True):
+        self.directory = directory
+        self.segment_records = segment_records
+        self.commit_interval = commit_interval
+        self.batch_size = batch_size
+        self.sync = sync
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._segment = None
+        self._sequence = 0
+        self._writer = None
+        self._thread = None
+        self._stop = threading.Event()
+
+        # 统计计数器
+        self.appended = 0
+        self.dropped = 0
+        self.committed = 0
+        self.commits = 0
+        self.segments = 0
+        self.last_error = None
+
+    def append(self, ticker: Ticker):
+        """记录一条行情（非阻塞）"""
+        try:
+            self._queue.put_nowait(ticker)
+            self.appended += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def append_many(self, tickers: Iterable[Ticker]):
+        for ticker in tickers:
+            self.append(ticker)
+
+    def _open_segment(self):
+        self._sequence += 1
+        path = os.path.join(self.directory, f"{self._writer}-{self._sequence:06d}.seg")
+        self._segment = _Segment(path, self.segment_records)
+        self.segments += 1
+
+    def _write_batch(self, batch: List[Ticker]):
+        for ticker in batch:
+            if self._segment is None or self._segment.full:
+                if self._segment is not None:
+                    self._segment.seal()
+                self._open_segment()
+            self._segment.append(ticker)
+        self._segment.commit(self.sync)
+        self.committed += len(batch)
+        self.commits += 1
+
+    def _drain(self, timeout: Optional[float]) -> List[Ticker]:
+        """取出一批待写入的行情：等待第一条，然后取走队列中已有的（最多 batch_size 条）"""
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._drain(timeout=0.5)
+            if not batch:
+                continue
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                self.last_error = f"写入失败: {e}"
+            # 攒批：两次提交之间至少间隔 commit_interval
+            self._stop.wait(self.commit_interval)
+
+        # 停止前写入剩余的行情
+        batch = self._drain(timeout=0)
+        while batch:
+            self._write_batch(batch)
+            batch = self._drain(timeout=0)
+
+    def start(self):
+        """启动后台写入线程（重复调用无副作用）
+
+        线程不会跨fork保留，多进程部署时由每个worker在fork之后调用，写入以当前进程号命名的分段文件
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # 随机后缀：同一进程在同一秒内 stop() 后再 start() 也不会与之前的分段重名
+        self._writer = f"{os.getpid()}-{int(time.time())}-{os.urandom(3).hex()}"
+        self._segment = None
+        self._sequence = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='tick-journal', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台写入线程，写入剩余行情并封存当前分段"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._segment is not None:
+            self._segment.seal()
+            self._segment = None
+
+    def stats(self) -> Dict[str, Any]:
+        """返回日志统计信息"""
+        return {
+            'directory': self.directory,
+            'running': self._thread is not None and self._thread.is_alive(),
+            'appended': self.appended,
+            'dropped': self.dropped,
+            'pending': self._queue.qsize(),
+            'committed': self.committed,
+            'commits': self.commits,
+            'segments': self.segments,
+            'last_error': self.last_error,
+        }
+
+
+class _SegmentReader:
+    """单个分段文件（只读映射）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buf = memoryview(self.mm)
+        magic, record_size, self.capacity, _ = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"不是有效的行情日志分段文件: {path}")
+        self._index = None
+        self._indexed = 0
+
+    @property
+    def count(self) -> int:
+        # 写入端仍在追加时记录数会增长
+        return HEADER.unpack_from(self.buf, 0)[3]
+
+    def index(self, count: int) -> array:
+        """每块的 (最小时间, 最大时间)；封存的分段读取索引文件，正在写入的分段扫描时间字段"""
+        if self._index is None and os.path.exists(self.path + '.idx'):
+            self._index = array('d')
+            with open(self.path + '.idx', 'rb') as f:
+                self._index.frombytes(f.read())
+            self._indexed = count
+        if self._index is None:
+            self._index = array('d')
+        # 只补充新增的完整块和最后一个未满的块
+        start_block = self._indexed // INDEX_BLOCK
+        if self._indexed < count:
+            del self._index[start_block * 2:]
+            for block in range(start_block, (count + INDEX_BLOCK - 1) // INDEX_BLOCK):
+                times = [struct.unpack_from('<d', self.buf, HEADER_SIZE + row * RECORD.size)[0]
+                         for row in range(block * INDEX_BLOCK, min(count, (block + 1) * INDEX_BLOCK))]
+                self._index.extend((min(times), max(times)))
+            self._indexed = count
+        return self._index
+
+    def scan(self, symbol: Optional[bytes], start: float, end: float) -> Iterator[JournalRecord]:
+        count = self.count
+        index = self.index(count)
+        buf = self.buf
+        for block in range(len(index) // 2):
+            if index[block * 2 + 1] < start or index[block * 2] > end:
+                continue  # 整块都不在时间范围内
+            for row in range(block * INDEX_BLOCK, min(count, (block + 1) * INDEX_BLOCK)):
+                offset = HEADER_SIZE + row * RECORD.size
+                if symbol is not None and buf[offset + SYMBOL_OFFSET:offset + SYMBOL_OFFSET + SYMBOL_SIZE] != symbol:
+                    continue
+                timestamp = struct.unpack_from('<d', buf, offset)[0]
+                if start <= timestamp <= end:
+                    yield JournalRecord(buf, offset)
+
+    def close(self):
+        self.buf.release()
+        self.mm.close()
+
+
+class TickJournalReader:
+    """行情记录日志（读取端）
+
+    按交易对和时间范围读取记录；多个写入进程的分段按观测时间归并。
+    返回的 JournalRecord 引用映射内存，读取器关闭后不能再访问
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._segments: Dict[str, _SegmentReader] = {}
+
+    def _writers(self) -> Dict[str, List[_SegmentReader]]:
+        """按写入进程分组的分段（按序号排列），每次读取时发现新的分段"""
+        writers: Dict[str, List[_SegmentReader]] = {}
+        if not os.path.isdir(self.directory):
+            return writers
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.seg'):
+                continue
+            if name not in self._segments:
+                self._segments[name] = _SegmentReader(os.path.join(self.directory, name))
+            writer = name.rsplit('-', 1)[0]
+            writers.setdefault(writer, []).append(self._segments[name])
+        return writers
+
+    def read(self, symbol: Optional[str] = None, start: Optional[float] = None,
+             end: Optional[float] = None) -> Iterator[JournalRecord]:
+        """读取 [start, end]（Unix秒）内的记录，symbol 为空时读取所有交易对"""
+        symbol_key = _encode(symbol, SYMBOL_SIZE) if symbol else None
+        start = float('-inf') if start is None else start
+        end = float('inf') if end is None else end
+
+        streams = []
+        for segments in self._writers().values():
+            streams.append(record for segment in segments for record in segment.scan(symbol_key, start, end))
+        if len(streams) == 1:
+            return streams[0]
+        return heapq.merge(*streams, key=lambda record: record.timestamp)
+
+    def time_range(self) -> Optional[Tuple[float, float]]:
+        """日志覆盖的时间范围（最早、最晚的观测时间），没有记录时返回None"""
+        bounds = [segment.index(segment.count) for segments in self._writers().values() for segment in segments]
+        bounds = [index for index in bounds if index]
+        if not bounds:
+            return None
+        return min(min(index[0::2]) for index in bounds), max(max(index[1::2]) for index in bounds)
+
+    def close(self):
+        for segment in self._segments.values():
+            segment.close()
+        self._segments = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
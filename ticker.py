@@ -0,0 +1,105 @@
+"""
+行情记录
+各数据源的解析结果统一使用 Ticker 表示：使用 __slots__ 存储原始字段，
+格式化字段（price_formatted、change_formatted、last_updated）在读取时才生成，
+序列化统一通过 to_dict()，输出与原先的结果字典完全一致。
+"""
+
+import time
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# 价格按美元格式显示的报价货币
+USD_QUOTES = ('USDT', 'USD')
+
+
+def split_symbol_pair(symbol_pair: str) -> Tuple[str, str]:
+    """交易对 BTC/USDT -> (BTC, USDT)，未指定报价货币时默认为USDT"""
+    base_symbol, _, quote_symbol = symbol_pair.partition('/')
+    return base_symbol, quote_symbol or 'USDT'
+
+
+class Ticker(Mapping):
+    """单个交易对的行情
+
+    实现只读映射接口（ticker['price']、ticker.get(...)、dict(ticker)），
+    原先按字典使用结果的代码无需修改；缓存和快照中大量保存时比字典节省内存。
+    """
+
+    __slots__ = ('symbol', 'name', 'price', 'change_24h', 'quote_currency', 'high_24h', 'low_24h',
+                 'volume', 'market_cap', 'source', 'updated_at', 'source_time')
+
+    def __init__(self, symbol: str, name: str, price: float, change_24h: float, quote_currency: str,
+                 high_24h: float, low_24h: float, source: str, volume: Optional[float] = None,
+                 market_cap: Optional[float] = None, updated_at: Optional[float] = None,
+                 source_time: Optional[float] = None):
+        self.symbol = symbol
+        self.name = name
+        self.price = price
+        self.change_24h = change_24h
+        self.quote_currency = quote_currency
+        self.high_24h = high_24h
+        self.low_24h = low_24h
+        self.volume = volume
+        self.market_cap = market_cap
+        self.source = source
+        self.updated_at = time.time() if updated_at is None else updated_at
+        # 数据源自身的行情时间戳（Unix秒），不参与序列化，用于判断数据源的数据延迟
+        self.source_time = source_time
+
+    @property
+    def price_formatted(self) -> str:
+        if self.quote_currency in USD_QUOTES:
+            return f"${self.price:,.2f}"
+        return f"{self.price:,.6f} {self.quote_currency}"
+
+    @property
+    def change_formatted(self) -> str:
+        return f"{self.change_24h:+.2f}%"
+
+    @property
+    def last_updated(self) -> str:
+        return datetime.fromtimestamp(self.updated_at).strftime('%Y-%m-%d %H:%M:%S')
+
+    @property
+    def staleness(self) -> float:
+        """数据源行情时间距今的秒数（数据源未提供时间戳时按获取时间计算）"""
+        return max(0.0, time.time() - (self.source_time or self.updated_at))
+
+    def _keys(self):
+        # 交易所数据源返回成交量，CoinGecko返回市值
+        if self.market_cap is None:
+            return _EXCHANGE_KEYS
+        return _COINGECKO_KEYS
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为API返回的JSON结构（唯一的序列化入口）"""
+        return {key: getattr(self, key) for key in self._keys()}
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._keys():
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys())
+
+    def __len__(self) -> int:
+        return len(self._keys())
+
+    def __repr__(self) -> str:
+        return f"Ticker({self.symbol} {self.price} {self.source})"
+
+
+_EXCHANGE_KEYS = ('symbol', 'name', 'price', 'price_formatted', 'change_24h', 'change_formatted',
+                  'quote_currency', 'last_updated', 'high_24h', 'low_24h', 'volume', 'source')
+_COINGECKO_KEYS = ('symbol', 'name', 'price', 'price_formatted', 'change_24h', 'change_formatted',
+                   'quote_currency', 'last_updated', 'high_24h', 'low_24h', 'market_cap', 'source')
+
+
+def to_json_default(obj: Any) -> Any:
+    """json.dumps 的 default 参数：将 Ticker 序列化为字典"""
+    if isinstance(obj, Ticker):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")